@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Engagement analytics benchmark
+
+Fills a post history and an engagement snapshot file with synthetic data
+(several snapshots per post, as repeated syncs produce) and times the steps
+behind `main.py analytics` and the context bandit: loading the snapshots,
+picking each tweet's latest one, joining to history, each breakdown and a
+bandit rebuild. Nothing here talks to OpenAI or Twitter.
+
+Usage:
+    python benchmarks/analytics.py [--posts 50000] [--snapshots-per-post 6]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from content_generator import ContentGenerator
+from engagement import ContextBandit, EngagementAnalytics, EngagementStore
+from history_store import PostHistoryStore
+
+HASHTAGS = ["#buildinpublic", "#ai", "#startups", "#embedded", "#sf", "#students", "#evals", "#shipping"]
+
+def fill(history: PostHistoryStore, engagement: EngagementStore, posts: int, snapshots_per_post: int, seed: int):
+    """Synthetic history and snapshots where some context types do better than others"""
+    rng = random.Random(seed)
+    context_types = ContentGenerator.CONTEXT_TYPES
+    boost = {context_type: rng.uniform(0.5, 2.0) for context_type in context_types}
+    start = datetime(2024, 1, 1)
+    entries, tweets = [], []
+    for i in range(posts):
+        tweet_id = 1_800_000_000_000_000_000 + i
+        context_type = rng.choice(context_types)
+        entries.append({
+            "timestamp": (start + timedelta(hours=i * 3, minutes=rng.randrange(60))).isoformat(),
+            "content": f"Post {i} " + " ".join(rng.sample(HASHTAGS, rng.randrange(3))),
+            "tweet_id": str(tweet_id),
+            "url": f"https://twitter.com/user/status/{tweet_id}",
+            "context_type": context_type
+        })
+        likes = int(rng.expovariate(1 / 20) * boost[context_type])
+        tweets.append({"id": tweet_id, "public_metrics": {
+            "like_count": likes, "retweet_count": likes // 5, "reply_count": likes // 8,
+            "quote_count": likes // 20, "impression_count": likes * 40
+        }})
+
+    with history.lock, history.conn:
+        history.conn.executemany(
+            "INSERT INTO posts (timestamp, content, tweet_id, url, context_type) "
+            "VALUES (:timestamp, :content, :tweet_id, :url, :context_type)",
+            entries
+        )
+    for snapshot in range(snapshots_per_post):
+        engagement.append(tweets, taken_at=1_700_000_000 + snapshot * 86400)
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000:>8.1f}ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engagement analytics")
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--snapshots-per-post', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        history = PostHistoryStore(os.path.join(workdir, "post_history.db"))
+        engagement = EngagementStore(os.path.join(workdir, "engagement.bin"))
+        fill(history, engagement, args.posts, args.snapshots_per_post, args.seed)
+        print(f"{args.posts} posts, {args.posts * args.snapshots_per_post} snapshots "
+              f"({os.path.getsize(engagement.path) / 1024 / 1024:.1f}MB)\n")
+
+        print(f"{'step':<36} {'time':>10}")
+        print("-" * 47)
+        timed("load snapshots", engagement.load)
+        latest = timed("latest snapshot per tweet", engagement.latest)
+        posts = timed("read post history", lambda: history.recent(limit=None))
+        analytics = timed("join on tweet_id", lambda: EngagementAnalytics(latest, posts))
+        for dimension in EngagementAnalytics.DIMENSIONS:
+            timed(f"by {dimension}", lambda: analytics.by(dimension))
+        rewards = timed("context rewards", analytics.context_rewards)
+        bandit = ContextBandit(ContentGenerator.CONTEXT_TYPES, rewards)
+        timed("1000 bandit choices", lambda: [bandit.choose() for _ in range(1000)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark of hedged generation against a long-tailed OpenAI stand-in
+
+Runs the same number of generations twice against the OpenAI stub, once
+with a single model and once hedged to a second one, with a fraction of
+completions taking --slow-latency instead of --openai-latency. Reports
+p50/p95/p99/max generation time, hedges fired and won, and the extra
+tokens the losing attempts cost next to the tokens spent overall.
+
+Usage:
+    python benchmarks/hedging.py [--requests 200] [--slow-rate 0.08] [--slow-latency 8]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from pipeline import DUMMY_ENV, percentile
+from stub_servers import start_openai_stub
+
+def run(models: str, requests: int, concurrency: int, args) -> dict:
+    """Generate `requests` tweets with OPENAI_MODELS=models, returning latencies and metric deltas"""
+    from config import Config
+    from content_generator import ContentGenerator
+    from metrics import HEDGE_EXTRA_TOKENS, HEDGES, OPENAI_TOKENS
+
+    # Both runs stream, so they differ only in hedging
+    config = Config(OPENAI_MODELS=models, OPENAI_STREAMING=True,
+                    HEDGE_INITIAL_DELAY=args.initial_delay, HEDGE_BUDGET=args.budget)
+    generator = ContentGenerator(config, "user_context.json")
+    events = ("fired", "hedge_won", "primary_won", "failover", "over_budget")
+    before = {event: HEDGES.value(event=event) for event in events}
+    tokens_before = sum(OPENAI_TOKENS.value(kind=kind) for kind in ("prompt", "completion"))
+    extra_before = sum(HEDGE_EXTRA_TOKENS.value(kind=kind) for kind in ("prompt", "completion"))
+
+    def timed(_):
+        start = time.perf_counter()
+        content = generator.generate_tweet_content("general")
+        return time.perf_counter() - start, content is not None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(requests)))
+    time.sleep(args.slow_latency)  # let cancelled losers report their tokens
+
+    return {
+        "latencies": [latency for latency, ok in results if ok],
+        "failed": sum(not ok for _, ok in results),
+        "events": {event: HEDGES.value(event=event) - before[event] for event in events},
+        "tokens": sum(OPENAI_TOKENS.value(kind=kind) for kind in ("prompt", "completion")) - tokens_before,
+        "extra": sum(HEDGE_EXTRA_TOKENS.value(kind=kind) for kind in ("prompt", "completion")) - extra_before
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hedged generation against a long-tailed OpenAI stand-in")
+    parser.add_argument('--requests', type=int, default=200, help='Generations per run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Generations in flight at once')
+    parser.add_argument('--openai-latency', type=float, default=1.5, help='Stub seconds to the first token')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Uniform +/- stub latency jitter in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.08, help='Fraction of completions that are slow')
+    parser.add_argument('--slow-latency', type=float, default=8.0, help='Seconds to the first token when slow')
+    parser.add_argument('--token-interval', type=float, default=0.005, help='Seconds between streamed tokens')
+    parser.add_argument('--initial-delay', type=float, default=3.0, help='HEDGE_INITIAL_DELAY for the hedged run')
+    parser.add_argument('--budget', type=float, default=0.2, help='HEDGE_BUDGET for the hedged run')
+    parser.add_argument('--models', default='gpt-4.1-mini,gpt-4.1-nano', help='OPENAI_MODELS for the hedged run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_openai_stub(
+        latency=args.openai_latency, latency_jitter=args.jitter, seed=args.seed, token_interval=args.token_interval,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency
+    )
+    os.environ.update(DUMMY_ENV)
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+
+    workdir = tempfile.mkdtemp(prefix="bot-hedging-")
+    cwd = os.getcwd()
+    try:
+        shutil.copy(os.path.join(REPO_DIR, "user_context.json"), workdir)
+        os.chdir(workdir)
+        logging.basicConfig(level=logging.ERROR, handlers=[logging.NullHandler()])
+
+        primary = args.models.split(',')[0]
+        print(f"{'run':<10} {'ok':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'hedges':>7} {'won':>5} {'extra tokens':>16}")
+        print("-" * 82)
+        for name, models in (("single", primary), ("hedged", args.models)):
+            result = run(models, args.requests, args.concurrency, args)
+            latencies = result["latencies"]
+            events = result["events"]
+            share = result["extra"] / result["tokens"] * 100 if result["tokens"] else 0.0
+            print(
+                f"{name:<10} {len(latencies):>5} {percentile(latencies, 50):>7.2f}s {percentile(latencies, 95):>7.2f}s "
+                f"{percentile(latencies, 99):>7.2f}s {max(latencies, default=0):>7.2f}s "
+                f"{events['fired'] + events['failover']:>7.0f} {events['hedge_won']:>5.0f} "
+                f"{result['extra']:>8.0f} ({share:>4.1f}%)"
+            )
+        print(f"\nstub: {server.behavior.requests} requests, {server.behavior.streamed_tokens} tokens streamed")
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
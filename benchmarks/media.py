@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of chunked media upload against a bandwidth-limited Twitter stand-in
+
+Writes --files random files of --size-mb each and uploads them as one
+tweet's attachments three ways: one chunk after another (concurrency 1,
+files in turn), in parallel (MediaUploader.upload_all), and again in
+parallel once the media cache knows them. The stub reads each request body
+at --bandwidth MB/s, like one connection limited by its round trip, and
+adds --latency to every request. Reports elapsed time, MB/s, requests and
+the peak Python heap. Most of that heap is the in-process stub holding the
+bodies it reads; the uploader sends chunks straight out of the
+memory-mapped files, so its own share stays well under a megabyte.
+
+Usage:
+    python benchmarks/media.py [--files 4] [--size-mb 8] [--chunk-mb 1] [--concurrency 4] [--bandwidth 4]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from pipeline import DUMMY_ENV
+from stub_servers import start_twitter_stub
+
+def run(client, paths, cache_path: str, chunk_size: int, concurrency: int, parallel: bool, server) -> dict:
+    """Upload paths with a fresh uploader, returning elapsed time, requests and peak heap"""
+    from media import MediaCache, MediaUploader
+
+    uploader = MediaUploader(client, cache=MediaCache(cache_path), chunk_size=chunk_size, concurrency=concurrency)
+    requests_before = server.behavior.requests
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        media_ids = uploader.upload_all(paths) if parallel else [uploader.upload(path) for path in paths]
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        uploader.close()
+    return {"media_ids": media_ids, "elapsed": elapsed, "peak": peak,
+            "requests": server.behavior.requests - requests_before}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunked media upload against a bandwidth-limited stand-in")
+    parser.add_argument('--files', type=int, default=4, help='Attachments per tweet (at most 4)')
+    parser.add_argument('--size-mb', type=float, default=8.0, help='Size of each file in MB')
+    parser.add_argument('--chunk-mb', type=float, default=1.0, help='MEDIA_CHUNK_SIZE in MB')
+    parser.add_argument('--concurrency', type=int, default=4, help='MEDIA_UPLOAD_CONCURRENCY for the parallel run')
+    parser.add_argument('--bandwidth', type=float, default=4.0, help='MB/s the stub reads one request body at')
+    parser.add_argument('--latency', type=float, default=0.1, help='Stub seconds per request')
+    args = parser.parse_args()
+
+    server = start_twitter_stub(latency=args.latency, upload_bandwidth=args.bandwidth * 1e6)
+    os.environ.update(DUMMY_ENV)
+    os.environ["TWITTER_API_BASE_URL"] = server.url
+    os.environ["HTTP_POOL_SIZE"] = str(max(10, args.concurrency * args.files))
+    os.environ["DISPATCHER_WORKERS"] = str(max(8, args.concurrency * args.files))
+
+    workdir = tempfile.mkdtemp(prefix="bot-media-")
+    try:
+        logging.basicConfig(level=logging.ERROR, handlers=[logging.NullHandler()])
+        paths = []
+        for i in range(args.files):
+            paths.append(os.path.join(workdir, f"chart{i}.png"))
+            with open(paths[-1], 'wb') as f:
+                f.write(os.urandom(int(args.size_mb * 1e6)))
+        total_mb = args.files * args.size_mb
+
+        from twitter_client import TwitterClient
+        client = TwitterClient()
+        client.user_id  # authenticate before timing
+        chunk_size = int(args.chunk_mb * 1e6)
+
+        print(f"{args.files} x {args.size_mb:.0f} MB in {args.chunk_mb:g} MB chunks, stub at {args.bandwidth:g} MB/s "
+              f"per request and {args.latency * 1000:.0f} ms latency\n")
+        print(f"{'run':<10} {'elapsed':>9} {'MB/s':>7} {'requests':>9} {'peak heap':>10}")
+        print("-" * 50)
+        runs = (
+            ("serial", os.path.join(workdir, "serial.db"), 1, False),
+            ("parallel", os.path.join(workdir, "parallel.db"), args.concurrency, True),
+            ("cached", os.path.join(workdir, "parallel.db"), args.concurrency, True)
+        )
+        for name, cache_path, concurrency, parallel in runs:
+            result = run(client, paths, cache_path, chunk_size, concurrency, parallel, server)
+            print(f"{name:<10} {result['elapsed']:>8.2f}s {total_mb / result['elapsed']:>7.1f} "
+                  f"{result['requests']:>9} {result['peak'] / 1e6:>8.2f}MB")
+
+        tweet = client.post_tweet("Benchmark charts", media_ids=result["media_ids"])
+        attached = next(t["media_ids"] for t in server.handler.tweets if t["id"] == tweet["id"])
+        print(f"\ntweet {tweet['id']} posted with {len(attached)} media ids; "
+              f"stub received {server.behavior.uploaded_bytes / 1e6:.0f} MB")
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the mention responder under a burst of mentions
+
+Starts the OpenAI and Twitter stubs, has a burst of tweets mention the stub
+account at once, and runs MentionResponder cycles until every mention is
+answered. Reports mention-to-reply latency (p50/p99/max), how many replies
+made the latency target, and replies per second, so concurrency and batch
+size can be sized against the OpenAI latency.
+
+Usage:
+    python benchmarks/mentions.py [--mentions 300] [--concurrency 8] [--openai-latency 0.5] [--target 60]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from pipeline import DUMMY_ENV, percentile
+from stub_servers import start_openai_stub, start_twitter_stub
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mention responder against a burst of mentions")
+    parser.add_argument('--mentions', type=int, default=300, help='Mentions in the burst')
+    parser.add_argument('--authors', type=int, default=0, help='Distinct authors (default: one per mention)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Replies generated and posted at the same time')
+    parser.add_argument('--batch-size', type=int, default=50, help='Mentions taken per cycle')
+    parser.add_argument('--target', type=float, default=60.0, help='Mention-to-reply latency target in seconds')
+    parser.add_argument('--openai-latency', type=float, default=0.5, help='Stub seconds per completion')
+    parser.add_argument('--twitter-latency', type=float, default=0.05, help='Stub seconds per Twitter request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- stub latency jitter in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    openai_server = start_openai_stub(latency=args.openai_latency, latency_jitter=args.jitter, seed=args.seed)
+    twitter_server = start_twitter_stub(latency=args.twitter_latency, latency_jitter=args.jitter, seed=args.seed)
+    os.environ.update(DUMMY_ENV)
+    os.environ["OPENAI_BASE_URL"] = f"{openai_server.url}/v1"
+    os.environ["TWITTER_API_BASE_URL"] = twitter_server.url
+    os.environ["HTTP_POOL_SIZE"] = str(max(10, args.concurrency))
+
+    workdir = tempfile.mkdtemp(prefix="bot-mentions-")
+    cwd = os.getcwd()
+    try:
+        shutil.copy(os.path.join(REPO_DIR, "user_context.json"), workdir)
+        os.chdir(workdir)
+        logging.basicConfig(level=logging.ERROR, handlers=[logging.NullHandler()])
+
+        from bot import TwitterBot
+        from mentions import MentionResponder, MentionStore
+        bot = TwitterBot(history_path=os.path.join(workdir, "post_history.db"))
+        store = MentionStore(os.path.join(workdir, "mentions.db"))
+        responder = MentionResponder(bot, store, concurrency=args.concurrency,
+                                     latency_target=args.target, batch_size=args.batch_size)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot.twitter_client.user_id  # authenticate before the burst
+            twitter_server.add_mentions(args.mentions, authors=args.authors or None)
+            start = time.perf_counter()
+            cycles = 0
+            while True:
+                results = responder.run_once()
+                cycles += 1
+                # Done, or nothing is getting through (pending mentions are not retried here)
+                if not any(result.get("reply_id") for result in results):
+                    break
+            elapsed = time.perf_counter() - start
+
+        rows = store.conn.execute(
+            "SELECT replied_at - created_at FROM mentions WHERE status = 'replied'"
+        ).fetchall()
+        latencies = [row[0] for row in rows]
+        stats = store.stats()
+        on_time = sum(latency <= args.target for latency in latencies)
+
+        print(f"mentions: {args.mentions} in the burst, {stats['replied']} replied, {stats['superseded']} superseded, "
+              f"{stats['failed']} failed, {stats['expired']} expired in {cycles} cycles")
+        print(f"elapsed: {elapsed:.2f}s ({len(latencies) / elapsed:.1f} replies/sec at concurrency {args.concurrency})")
+        if latencies:
+            print(f"latency: p50 {percentile(latencies, 50):.2f}s, p99 {percentile(latencies, 99):.2f}s, "
+                  f"max {max(latencies):.2f}s")
+            print(f"on target: {on_time}/{len(latencies)} within {args.target:.0f}s")
+        print(f"stub requests: openai {openai_server.behavior.requests}, twitter {twitter_server.behavior.requests}")
+    finally:
+        os.chdir(cwd)
+        openai_server.stop()
+        twitter_server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the posting pipeline against local stand-in servers
+
+Starts the OpenAI and Twitter stubs from stub_servers.py, points the bot at
+them and pushes posts through TwitterBot's real generate, post and history
+stages. Reports posts per second, p50/p99 latency per stage, and peak
+traced memory of the post, history and schedule paths. Everything runs
+offline in a scratch directory and every random choice is seeded, so two
+runs with the same arguments do the same work.
+
+Usage:
+    python benchmarks/pipeline.py [--posts 200] [--openai-latency 0.05] [--error-rate 0.02]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from stub_servers import start_openai_stub, start_twitter_stub
+
+# Dummy credentials so the config validates without real keys
+DUMMY_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "TWITTER_BEARER_TOKEN": "bench",
+    "TWITTER_CONSUMER_KEY": "bench",
+    "TWITTER_CONSUMER_SECRET": "bench",
+    "TWITTER_ACCESS_TOKEN": "bench",
+    "TWITTER_ACCESS_TOKEN_SECRET": "bench",
+    "CONTENT_BUFFER_ENABLED": "false",
+    "RETRY_BASE_DELAY": "0.01",
+    "RETRY_MAX_DELAY": "0.05"
+}
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+def timed(samples: list, func, *args, **kwargs):
+    """Call func, appending its wall time in seconds to samples"""
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        samples.append(time.perf_counter() - start)
+
+def run_pipeline(bot, posts: int) -> dict:
+    """Post `posts` tweets stage by stage, returning per-stage latency samples"""
+    stages = {"generate": [], "post": [], "history": [], "total": []}
+    posted = failed = 0
+    context_types = bot.content_generator.CONTEXT_TYPES
+
+    start = time.perf_counter()
+    for i in range(posts):
+        post_start = time.perf_counter()
+        context_type = context_types[i % len(context_types)]
+        content = timed(stages["generate"], bot.generate_content, context_type)
+        result = content and timed(stages["post"], bot.twitter_client.post_tweet, content)
+        if result:
+            timed(stages["history"], bot._log_post, content, result, context_type)
+            posted += 1
+        else:
+            failed += 1
+        stages["total"].append(time.perf_counter() - post_start)
+    elapsed = time.perf_counter() - start
+
+    return {"stages": stages, "posted": posted, "failed": failed, "elapsed": elapsed}
+
+def measure_memory(func, *args) -> tuple:
+    """Peak traced memory in bytes of one call, and the call's result"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, result
+
+def history_path(workdir: str, entries: int) -> int:
+    """Append entries to a fresh history store and read the newest page back"""
+    from history_store import PostHistoryStore
+    store = PostHistoryStore(os.path.join(workdir, "memory_history.db"))
+    base = datetime(2025, 1, 1)
+    for i in range(entries):
+        store.append({
+            "timestamp": (base + timedelta(minutes=i)).isoformat(),
+            "content": f"Benchmark post number {i} about shipping things",
+            "tweet_id": str(10 ** 17 + i),
+            "url": f"https://twitter.com/user/status/{10 ** 17 + i}",
+            "context_type": "general"
+        })
+    page = store.recent(100)
+    store.close()
+    return len(page)
+
+def schedule_path(jobs: int) -> int:
+    """Schedule jobs daily slots on a TimerScheduler and run a day of them on a fake clock"""
+    from timer_scheduler import TimerScheduler
+    now = [datetime(2025, 1, 1).timestamp()]
+    scheduler = TimerScheduler(clock=lambda: now[0])
+    for i in range(jobs):
+        scheduler.every_day_at(lambda: None, f"{(i // 60) % 24:02d}:{i % 60:02d}", tz="UTC", name=f"job-{i}")
+    now[0] += 86400
+    return scheduler.run_pending()
+
+def report_stages(stages: dict):
+    print(f"{'stage':<10} {'count':>7} {'p50':>10} {'p99':>10} {'mean':>10}")
+    print("-" * 51)
+    for name, samples in stages.items():
+        if not samples:
+            continue
+        print(
+            f"{name:<10} {len(samples):>7} {percentile(samples, 50) * 1000:>8.2f}ms "
+            f"{percentile(samples, 99) * 1000:>8.2f}ms {statistics.mean(samples) * 1000:>8.2f}ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the posting pipeline against local stand-in servers")
+    parser.add_argument('--posts', type=int, default=200, help='Posts to push through the pipeline')
+    parser.add_argument('--openai-latency', type=float, default=0.0, help='Stub seconds per completion')
+    parser.add_argument('--twitter-latency', type=float, default=0.0, help='Stub seconds per Twitter request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- stub latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub requests answered with 503')
+    parser.add_argument('--rate-limit', type=int, default=0, help='Twitter requests per endpoint per window (0 = unlimited)')
+    parser.add_argument('--history-entries', type=int, default=10000, help='Posts appended for the history memory check')
+    parser.add_argument('--schedule-jobs', type=int, default=10000, help='Jobs scheduled for the schedule memory check')
+    parser.add_argument('--stream', action='store_true', help='Generate with OPENAI_STREAMING')
+    parser.add_argument('--token-interval', type=float, default=0.0, help='Seconds between streamed stub tokens')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    openai_server = start_openai_stub(
+        latency=args.openai_latency, latency_jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+        token_interval=args.token_interval
+    )
+    twitter_server = start_twitter_stub(
+        latency=args.twitter_latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, seed=args.seed
+    )
+    os.environ.update(DUMMY_ENV)
+    os.environ["OPENAI_BASE_URL"] = f"{openai_server.url}/v1"
+    os.environ["TWITTER_API_BASE_URL"] = twitter_server.url
+    os.environ["OPENAI_STREAMING"] = "true" if args.stream else "false"
+
+    # Run in a scratch directory so history databases and logs stay out of the repo
+    workdir = tempfile.mkdtemp(prefix="bot-pipeline-")
+    cwd = os.getcwd()
+    try:
+        shutil.copy(os.path.join(REPO_DIR, "user_context.json"), workdir)
+        os.chdir(workdir)
+        # Claim the root logger first so the bot's per-post logging is not measured on a terminal
+        logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+        from bot import TwitterBot
+        bot = TwitterBot(history_path=os.path.join(workdir, "post_history.db"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot.twitter_client.user_id  # authenticate outside the timed loop
+            run = run_pipeline(bot, args.posts)
+            post_peak, _ = measure_memory(run_pipeline, bot, min(args.posts, 50))
+
+        history_peak, _ = measure_memory(history_path, workdir, args.history_entries)
+        schedule_peak, ran = measure_memory(schedule_path, args.schedule_jobs)
+
+        print(f"posts: {run['posted']} posted, {run['failed']} failed in {run['elapsed']:.2f}s "
+              f"({run['posted'] / run['elapsed']:.1f} posts/sec)")
+        print(f"stub requests: openai {openai_server.behavior.requests}, twitter {twitter_server.behavior.requests}")
+        print()
+        report_stages(run["stages"])
+        print()
+        print(f"{'memory path':<36} {'peak':>10}")
+        print("-" * 47)
+        print(f"{f'post ({min(args.posts, 50)} posts)':<36} {post_peak / 1024:>8.0f}KB")
+        print(f"{f'history ({args.history_entries} appends)':<36} {history_peak / 1024:>8.0f}KB")
+        print(f"{f'schedule ({args.schedule_jobs} jobs, {ran} ran)':<36} {schedule_peak / 1024:>8.0f}KB")
+    finally:
+        os.chdir(cwd)
+        openai_server.stop()
+        twitter_server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the CLI
+
+Runs every main.py command's startup path in a fresh interpreter and reports
+the median wall time, so regressions in import cost or eager client creation
+show up as numbers. Nothing here talks to OpenAI or Twitter: commands that
+would are measured up to the point where the first API call would happen.
+
+Usage:
+    python benchmarks/startup.py [--runs 10]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dummy credentials so the config validates without real keys
+DUMMY_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "TWITTER_BEARER_TOKEN": "bench",
+    "TWITTER_CONSUMER_KEY": "bench",
+    "TWITTER_CONSUMER_SECRET": "bench",
+    "TWITTER_ACCESS_TOKEN": "bench",
+    "TWITTER_ACCESS_TOKEN_SECRET": "bench",
+    "CONTENT_BUFFER_ENABLED": "false"
+}
+
+CASES = [
+    ("python (baseline)", ["-c", "pass"]),
+    ("main.py --help", [os.path.join(REPO_DIR, "main.py"), "--help"]),
+    ("main.py history", [os.path.join(REPO_DIR, "main.py"), "history", "--limit", "10"]),
+    ("post/test: TwitterBot()", ["-c", "from bot import TwitterBot; TwitterBot()"]),
+    ("schedule: BotScheduler()", ["-c", "from scheduler import BotScheduler; BotScheduler()"]),
+    ("engine: import", ["-c", "import engine"]),
+    ("first OpenAI use: import openai", ["-c", "import openai"]),
+    ("first Twitter use: import tweepy", ["-c", "import tweepy"]),
+]
+
+def time_command(args: list, cwd: str, env: dict) -> float:
+    """Wall time of one fresh interpreter running args"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable] + args,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True
+    )
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup cost per command")
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command (median is reported)')
+    args = parser.parse_args()
+
+    env = dict(os.environ, **DUMMY_ENV)
+    env["PYTHONPATH"] = REPO_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    # Run in a scratch directory so history databases and logs stay out of the repo
+    workdir = tempfile.mkdtemp(prefix="bot-startup-")
+    try:
+        for name in ("user_context.json", "post_history.json"):
+            if os.path.exists(os.path.join(REPO_DIR, name)):
+                shutil.copy(os.path.join(REPO_DIR, name), workdir)
+
+        print(f"{'command':<36} {'median':>10} {'min':>10}")
+        print("-" * 58)
+        for label, command in CASES:
+            # One warm-up run so bytecode compilation is not counted
+            time_command(command, workdir, env)
+            samples = [time_command(command, workdir, env) for _ in range(args.runs)]
+            print(f"{label:<36} {statistics.median(samples) * 1000:>8.1f}ms {min(samples) * 1000:>8.1f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
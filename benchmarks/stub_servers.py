@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the OpenAI and Twitter APIs
+
+Both servers speak just enough of the real protocols for ContentGenerator
+and TwitterClient: chat completions (plain or streamed) on the OpenAI side, and the v2 users/me,
+tweets, users/:id/tweets, users/:id/mentions and chunked media/upload endpoints on the Twitter
+side. Latency, error rate, rate limits and upload bandwidth are configurable, and every random choice comes from a
+seeded generator so runs are repeatable.
+
+Point the bot at them with OPENAI_BASE_URL and TWITTER_API_BASE_URL, or run
+them on their own:
+    python benchmarks/stub_servers.py --openai-port 8001 --twitter-port 8002
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "shipping building founders scaling agents embedded latency prototype users "
+    "feedback demo launch evals retrieval sensors firmware pipeline startup coffee "
+    "whiteboard roadmap benchmark refactor deploy hackathon mentor investor seed"
+).split()
+
+
+class StubBehavior:
+    """Latency, failure and rate-limit settings shared by a stub server's handlers"""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: int = 0, rate_window: float = 900.0, seed: int = 0, token_interval: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 0.0, upload_bandwidth: float = 0.0):
+        self.latency = latency
+        self.upload_bandwidth = upload_bandwidth  # Bytes per second one request body is read at, 0 = unlimited
+        self.slow_rate = slow_rate  # Fraction of requests that take slow_latency instead, for a long tail
+        self.slow_latency = slow_latency
+        self.token_interval = token_interval  # Seconds between streamed tokens
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows = {}  # endpoint -> (window reset epoch, requests used)
+        self.requests = 0
+        self.streamed_tokens = 0  # Tokens actually sent before the stream ended or the client hung up
+        self.uploaded_bytes = 0  # Media bytes received in APPEND requests
+
+    def delay(self) -> float:
+        with self.lock:
+            self.requests += 1
+            jitter = self.random.uniform(-self.latency_jitter, self.latency_jitter) if self.latency_jitter else 0.0
+            if self.slow_rate and self.random.random() < self.slow_rate:
+                return max(0.0, self.slow_latency + jitter)
+        return max(0.0, self.latency + jitter)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def take(self, endpoint: str):
+        """Spend one request of an endpoint's window, returning (allowed, headers)"""
+        if not self.rate_limit:
+            return True, {}
+        with self.lock:
+            now = time.time()
+            reset_at, used = self.windows.get(endpoint, (now + self.rate_window, 0))
+            if now >= reset_at:
+                reset_at, used = now + self.rate_window, 0
+            allowed = used < self.rate_limit
+            if allowed:
+                used += 1
+            self.windows[endpoint] = (reset_at, used)
+        return allowed, {
+            "x-rate-limit-limit": str(self.rate_limit),
+            "x-rate-limit-remaining": str(self.rate_limit - used),
+            "x-rate-limit-reset": str(int(reset_at))
+        }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    behavior: StubBehavior = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self, endpoint: str, defer_delay: bool = False):
+        """Apply latency, rate limits and random failures; returns headers, or None if answered
+
+        With defer_delay the latency is left in self.delay for the caller to
+        sleep, e.g. between a stream's headers and its first token.
+        """
+        self.delay = self.behavior.delay()
+        if not defer_delay:
+            time.sleep(self.delay)
+        allowed, headers = self.behavior.take(endpoint)
+        if not allowed:
+            self._send_json(429, {"title": "Too Many Requests", "detail": "Too Many Requests"}, headers)
+            return None
+        if self.behavior.should_fail():
+            self._send_json(503, {"title": "Service Unavailable", "detail": "Injected failure"}, headers)
+            return None
+        return headers
+
+
+class OpenAIStubHandler(_StubHandler):
+    """POST /v1/chat/completions, GET /v1/models/:id"""
+
+    ids = itertools.count(1)
+
+    def _tweet_text(self) -> str:
+        rng = self.behavior.random
+        with self.behavior.lock:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(18, 34))]
+            hashtags = " ".join(f"#{rng.choice(WORDS)}" for _ in range(rng.randint(0, 3)))
+        return f"{' '.join(words).capitalize()}. {hashtags}".strip()
+
+    def _send_event(self, payload) -> bool:
+        """Write one server-sent event as an HTTP chunk; False once the client has hung up"""
+        data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+        try:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return False
+
+    def _stream(self, request: dict, texts: list, headers: dict):
+        """Send the completions word by word as chat.completion.chunk events"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.flush()
+        time.sleep(self.delay)  # like the real API, headers go out before the first token
+
+        base = {
+            "id": f"chatcmpl-stub-{next(self.ids)}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub")
+        }
+        tokens = [re.findall(r'\S+\s*', text) for text in texts]
+        for position in range(max(len(words) for words in tokens) + 1):
+            for index, words in enumerate(tokens):
+                if position < len(words):
+                    delta, finish_reason = {"content": words[position]}, None
+                elif position == len(words):
+                    delta, finish_reason = {}, "stop"
+                else:
+                    continue
+                if not self._send_event(dict(base, choices=[{"index": index, "delta": delta, "finish_reason": finish_reason}])):
+                    return
+                if delta:
+                    with self.behavior.lock:
+                        self.behavior.streamed_tokens += 1
+            if self.behavior.token_interval:
+                time.sleep(self.behavior.token_interval)
+
+        if (request.get("stream_options") or {}).get("include_usage"):
+            prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+            completion_tokens = sum(len(words) for words in tokens)
+            self._send_event(dict(base, choices=[], usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }))
+        if self._send_event("[DONE]"):
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+    def do_GET(self):
+        match = re.search(r'/models/([^/?]+)', self.path)
+        if not match:
+            self._send_json(404, {"error": {"message": "Unknown endpoint"}})
+            return
+        self._send_json(200, {"id": match.group(1), "object": "model", "created": 0, "owned_by": "stub"})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Unknown endpoint"}})
+            return
+        request = self._read_json()
+        headers = self._simulate("chat.completions", defer_delay=bool(request.get("stream")))
+        if headers is None:
+            return
+        if request.get("stream"):
+            self._stream(request, [self._tweet_text() for _ in range(request.get("n", 1))], headers)
+            return
+
+        choices = [
+            {
+                "index": index,
+                "message": {"role": "assistant", "content": self._tweet_text()},
+                "finish_reason": "stop"
+            }
+            for index in range(request.get("n", 1))
+        ]
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+        completion_tokens = sum(len(c["message"]["content"]) for c in choices) // 4
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{next(self.ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }, headers)
+
+
+class TwitterStubHandler(_StubHandler):
+    """GET /2/users/me, POST /2/tweets, GET /2/users/:id/tweets, GET /2/users/:id/mentions, GET /2/tweets,
+    POST and GET /2/media/upload"""
+
+    USER = {"id": "1000", "name": "Stub Account", "username": "stub_account"}
+    ids = itertools.count(1900000000000000000)
+    tweets = []  # newest last
+    mentions = []  # newest last, added with StubServer.add_mentions
+    media = {}  # media id -> upload state
+    tweets_lock = threading.Lock()
+
+    def _read_body(self) -> bytes:
+        """Read the request body, no faster than upload_bandwidth"""
+        length = int(self.headers.get("Content-Length") or 0)
+        bandwidth = self.behavior.upload_bandwidth
+        blocks = []
+        received = 0
+        start = time.perf_counter()
+        while received < length:
+            block = self.rfile.read(min(65536, length - received))
+            if not block:
+                break
+            blocks.append(block)
+            received += len(block)
+            if bandwidth:
+                time.sleep(max(0.0, start + received / bandwidth - time.perf_counter()))
+        return b"".join(blocks)
+
+    def _read_form(self) -> dict:
+        """Fields of a urlencoded or multipart/form-data body; file parts come back as bytes"""
+        body = self._read_body()
+        content_type = self.headers.get("Content-Type", "")
+        match = re.search(r"boundary=([^;]+)", content_type)
+        if not match:
+            return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        fields = {}
+        for part in body.split(b"--" + match.group(1).strip('"').encode())[1:-1]:
+            head, _, value = part[2:].partition(b"\r\n\r\n")
+            name = re.search(rb'name="([^"]+)"', head).group(1).decode()
+            value = value[:-2]  # the CRLF before the next boundary
+            fields[name] = value if b"filename=" in head else value.decode()
+        return fields
+
+    def _media_upload(self, form: dict):
+        """One INIT, APPEND or FINALIZE command of a chunked upload"""
+        command = form.get("command")
+        if command == "INIT":
+            headers = self._simulate("media/upload")
+            if headers is None:
+                return
+            media_id = str(next(self.ids))
+            category = form.get("media_category", "tweet_image")
+            with self.tweets_lock:
+                self.media[media_id] = {"total": int(form.get("total_bytes", 0)), "segments": {},
+                                        "category": category, "state": None}
+            self._send_json(202, {"data": {"id": media_id, "media_key": f"3_{media_id}",
+                                           "expires_after_secs": 86400}}, headers)
+            return
+
+        upload = self.media.get(form.get("media_id"))
+        if upload is None:
+            self._send_json(400, {"title": "Invalid Request", "detail": "Unknown media_id"})
+            return
+        headers = self._simulate("media/upload")
+        if headers is None:
+            return
+
+        if command == "APPEND":
+            data = form.get("media", b"")
+            with self.tweets_lock:
+                upload["segments"][int(form.get("segment_index", 0))] = len(data)
+                self.behavior.uploaded_bytes += len(data)
+            self.send_response(204)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+        elif command == "FINALIZE":
+            segments = upload["segments"]
+            if sorted(segments) != list(range(len(segments))) or sum(segments.values()) != upload["total"]:
+                self._send_json(400, {"title": "Invalid Request",
+                                      "detail": f"Got {sum(segments.values())} of {upload['total']} bytes"})
+                return
+            data = {"id": form["media_id"], "media_key": f"3_{form['media_id']}", "size": upload["total"],
+                    "expires_after_secs": 86400}
+            if upload["category"] != "tweet_image":
+                # Video and GIFs are processed after upload; the first STATUS check finds them done
+                upload["state"] = "pending"
+                data["processing_info"] = {"state": "pending", "check_after_secs": 1}
+            else:
+                upload["state"] = "succeeded"
+            self._send_json(200, {"data": data}, headers)
+        else:
+            self._send_json(400, {"title": "Invalid Request", "detail": f"Unknown command {command}"})
+
+    def _tweet_payload(self, tweet: dict) -> dict:
+        return {
+            "id": tweet["id"],
+            "text": tweet["text"],
+            "edit_history_tweet_ids": [tweet["id"]],
+            "created_at": tweet["created_at"],
+            "public_metrics": {
+                "retweet_count": 0, "reply_count": 0, "like_count": 0,
+                "quote_count": 0, "impression_count": 0
+            }
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/2/users/me":
+            headers = self._simulate("users/me")
+            if headers is not None:
+                self._send_json(200, {"data": self.USER}, headers)
+            return
+
+        match = re.fullmatch(r"/2/users/(\d+)/tweets", url.path)
+        if match:
+            headers = self._simulate("users/:id/tweets")
+            if headers is None:
+                return
+            since_id = int(query.get("since_id", 0))
+            limit = int(query.get("max_results", 10))
+            with self.tweets_lock:
+                newer = [t for t in reversed(self.tweets) if int(t["id"]) > since_id]
+            offset = int(query.get("pagination_token", 0))
+            page = newer[offset:offset + limit]
+            meta = {"result_count": len(page)}
+            if offset + limit < len(newer):
+                meta["next_token"] = str(offset + limit)
+            payload = {"meta": meta}
+            if page:
+                payload["data"] = [self._tweet_payload(t) for t in page]
+            self._send_json(200, payload, headers)
+            return
+
+        match = re.fullmatch(r"/2/users/(\d+)/mentions", url.path)
+        if match:
+            headers = self._simulate("users/:id/mentions")
+            if headers is None:
+                return
+            since_id = int(query.get("since_id", 0))
+            limit = int(query.get("max_results", 10))
+            with self.tweets_lock:
+                newer = [m for m in reversed(self.mentions) if int(m["id"]) > since_id]
+            offset = int(query.get("pagination_token", 0))
+            page = newer[offset:offset + limit]
+            meta = {"result_count": len(page)}
+            if offset + limit < len(newer):
+                meta["next_token"] = str(offset + limit)
+            payload = {"meta": meta}
+            if page:
+                payload["data"] = [{key: value for key, value in m.items() if key != "user"} for m in page]
+                users = {m["user"]["id"]: m["user"] for m in page}
+                payload["includes"] = {"users": list(users.values())}
+            self._send_json(200, payload, headers)
+            return
+
+        if url.path == "/2/media/upload" and query.get("command") == "STATUS":
+            upload = self.media.get(query.get("media_id"))
+            if upload is None:
+                self._send_json(400, {"title": "Invalid Request", "detail": "Unknown media_id"})
+                return
+            headers = self._simulate("media/upload/status")
+            if headers is None:
+                return
+            upload["state"] = "succeeded"
+            self._send_json(200, {"data": {"id": query["media_id"], "processing_info": {"state": "succeeded"}}}, headers)
+            return
+
+        if url.path == "/2/tweets":
+            headers = self._simulate("tweets/lookup")
+            if headers is None:
+                return
+            wanted = set(query.get("ids", "").split(","))
+            with self.tweets_lock:
+                found = [self._tweet_payload(t) for t in self.tweets if t["id"] in wanted]
+            self._send_json(200, {"data": found} if found else {"meta": {"result_count": 0}}, headers)
+            return
+
+        self._send_json(404, {"title": "Not Found Error", "detail": self.path})
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/2/media/upload":
+            self._media_upload(self._read_form())
+            return
+        if urlparse(self.path).path != "/2/tweets":
+            self._send_json(404, {"title": "Not Found Error", "detail": self.path})
+            return
+        request = self._read_json()
+        headers = self._simulate("tweets/create")
+        if headers is None:
+            return
+        tweet = {
+            "id": str(next(self.ids)),
+            "text": request.get("text", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "in_reply_to": (request.get("reply") or {}).get("in_reply_to_tweet_id"),
+            "media_ids": (request.get("media") or {}).get("media_ids")
+        }
+        with self.tweets_lock:
+            self.tweets.append(tweet)
+        self._send_json(201, {"data": {"id": tweet["id"], "text": tweet["text"], "edit_history_tweet_ids": [tweet["id"]]}}, headers)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The bot hangs up on streams it no longer needs, which is not an error
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Runs a stub handler on a local port in a background thread"""
+
+    def __init__(self, handler_class, behavior: StubBehavior = None, port: int = 0):
+        self.behavior = behavior or StubBehavior()
+        handler = type(handler_class.__name__, (handler_class,), {"behavior": self.behavior})
+        if hasattr(handler_class, "tweets"):
+            handler.tweets = []
+            handler.mentions = []
+            handler.media = {}
+        self.handler = handler
+        self.httpd = _Server(("127.0.0.1", port), handler)
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def add_mentions(self, count: int, authors: int = None) -> list:
+        """Have `count` new tweets mention the stub account, from `authors` distinct users (default: one each)"""
+        rng = self.behavior.random
+        added = []
+        now = time.time()
+        with self.handler.tweets_lock:
+            for i in range(count):
+                author = i % authors if authors else next(self.handler.ids) % 10**9
+                tweet_id = str(next(self.handler.ids))
+                text = f"@{self.handler.USER['username']} " + " ".join(rng.choice(WORDS) for _ in range(8))
+                added.append({
+                    "id": tweet_id,
+                    "text": text + ("?" if rng.random() < 0.3 else ""),
+                    "author_id": str(author + 1),
+                    "conversation_id": tweet_id,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{int(now % 1 * 1000):03d}Z",
+                    "edit_history_tweet_ids": [tweet_id],
+                    "user": {
+                        "id": str(author + 1),
+                        "name": f"User {author + 1}",
+                        "username": f"user{author + 1}",
+                        "public_metrics": {"followers_count": int(rng.paretovariate(1.2) * 50)}
+                    }
+                })
+            self.handler.mentions.extend(added)
+        return added
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_openai_stub(port: int = 0, **behavior) -> StubServer:
+    """Start a chat-completions stand-in; use f"{server.url}/v1" as OPENAI_BASE_URL"""
+    return StubServer(OpenAIStubHandler, StubBehavior(**behavior), port).start()
+
+def start_twitter_stub(port: int = 0, **behavior) -> StubServer:
+    """Start a Twitter v2 stand-in; use server.url as TWITTER_API_BASE_URL"""
+    return StubServer(TwitterStubHandler, StubBehavior(**behavior), port).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local OpenAI and Twitter stand-in servers")
+    parser.add_argument('--openai-port', type=int, default=8001)
+    parser.add_argument('--twitter-port', type=int, default=8002)
+    parser.add_argument('--openai-latency', type=float, default=0.5, help='Seconds per completion (to the first token when streaming)')
+    parser.add_argument('--token-interval', type=float, default=0.0, help='Seconds between streamed tokens')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fraction of completions that take --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=8.0, help='Seconds per slow completion')
+    parser.add_argument('--twitter-latency', type=float, default=0.1, help='Seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- latency jitter in seconds')
+    parser.add_argument('--upload-bandwidth', type=float, default=0.0,
+                        help='Megabytes per second one media upload request is read at (0 = unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--rate-limit', type=int, default=0, help='Twitter requests per endpoint per window (0 = unlimited)')
+    parser.add_argument('--rate-window', type=float, default=900.0, help='Rate-limit window in seconds')
+    parser.add_argument('--mentions', type=int, default=0, help='Mentions of the stub account to start with')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    openai_server = start_openai_stub(
+        args.openai_port, latency=args.openai_latency, latency_jitter=args.jitter,
+        error_rate=args.error_rate, seed=args.seed, token_interval=args.token_interval,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency
+    )
+    twitter_server = start_twitter_stub(
+        args.twitter_port, latency=args.twitter_latency, latency_jitter=args.jitter,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, rate_window=args.rate_window, seed=args.seed,
+        upload_bandwidth=args.upload_bandwidth * 1e6
+    )
+    print(f"OPENAI_BASE_URL={openai_server.url}/v1")
+    twitter_server.add_mentions(args.mentions)
+    print(f"TWITTER_API_BASE_URL={twitter_server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        openai_server.stop()
+        twitter_server.stop()
+
+if __name__ == "__main__":
+    main()
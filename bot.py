@@ -1,69 +1,243 @@
-import json
+import contextvars
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, List, Optional
 from content_generator import ContentGenerator
 from twitter_client import TwitterClient
+from history_store import PostHistoryStore
+from dedupe import DuplicateIndex
+from ranking import CandidateRanker
+from metrics import FAILURES, POSTS, STAGE_SECONDS
+from log_setup import log_context, setup_logging
 from config import Config
 
 class TwitterBot:
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, config: Config = None, context_path: str = 'user_context.json',
+                 history_path: str = 'post_history.db', name: str = None, openai_client=None):
+        self.config = config or Config()
         self.config.validate_config()
+        self.name = name
+        self.history_path = history_path
+        self.history = PostHistoryStore(history_path)
+        self._duplicates = None
         
-        self.content_generator = ContentGenerator()
-        self.twitter_client = TwitterClient()
+        self.content_generator = ContentGenerator(self.config, context_path, client=openai_client)
+        self.twitter_client = TwitterClient(self.config)
+        self._context_selector = None
+        if self.config.CONTEXT_SELECTION == "bandit":
+            self.content_generator.context_selector = self._choose_context_type
         
         self._setup_logging()
     
+    @property
+    def duplicates(self) -> DuplicateIndex:
+        """Near-duplicate index over post history, built on first use"""
+        if self._duplicates is None:
+            self._duplicates = DuplicateIndex.from_history(self.history, threshold=self.config.DUPLICATE_THRESHOLD)
+        return self._duplicates
+    
+    def _choose_context_type(self) -> Optional[str]:
+        """Context type picked by the engagement bandit, or None to use the fixed weights"""
+        if not os.path.exists(self.config.ENGAGEMENT_FILE):
+            return None
+        try:
+            if self._context_selector is None:
+                from engagement import ContextSelector, EngagementStore
+                self._context_selector = ContextSelector(
+                    self.history,
+                    EngagementStore(self.config.ENGAGEMENT_FILE),
+                    self.content_generator.CONTEXT_TYPES,
+                    min_posts=self.config.BANDIT_MIN_POSTS
+                )
+            return self._context_selector.choose()
+        except Exception as e:
+            FAILURES.inc(stage="context_select", cause=type(e).__name__)
+            self.logger.error(f"Context bandit failed, using the fixed weights: {e}")
+            return None
+    
     def _setup_logging(self):
         """Setup logging for the bot"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('bot.log'),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        setup_logging(self.config)
+        self.logger = logging.getLogger(f"{__name__}.{self.name}" if self.name else __name__)
     
-    def generate_and_post(self, context_type: str = None, dry_run: bool = False) -> Optional[dict]:
-        """Generate content and post to Twitter"""
+    def generate_and_post(self, context_type: str = None, dry_run: bool = False,
+                          media: List[str] = None) -> Optional[dict]:
+        """Generate content and post to Twitter, with media files attached if given"""
         try:
             # Generate content
             if not context_type:
-                context_type = self.content_generator.get_random_context_type()
+                with STAGE_SECONDS.time(stage="context_select"):
+                    context_type = self.content_generator.get_random_context_type()
+            
+            with log_context(account=self.name, context_type=context_type):
+                # Dry runs may reuse an identical earlier completion; live posts never do
+                use_cache = dry_run and self.config.RESPONSE_CACHE_ENABLED
+                content = self.generate_content(context_type, use_cache=use_cache)
+                
+                if not content:
+                    self.logger.error("Failed to generate content")
+                    return None
+                
+                if dry_run:
+                    self.logger.info("Dry run mode - not posting to Twitter")
+                    return {"content": content, "dry_run": True}
+                
+                return self.post_content(content, context_type, media=media)
+            
+        except Exception as e:
+            self.logger.error(f"Error in generate_and_post: {e}", extra={"account": self.name})
+            return None
+    
+    def generate_batch(self, count: int, context_type: str = None, dry_run: bool = False,
+                       concurrency: int = None) -> Iterator[dict]:
+        """Generate count tweets on a bounded thread pool, posting each one unless dry_run
+        
+        Results are yielded as drafts finish, each tagged with its index in
+        the batch. Drafts that nearly duplicate an earlier one in the batch are
+        dropped. Posting happens one tweet at a time on the calling thread.
+        The response cache is never used, since every request in a batch is
+        the same one.
+        """
+        concurrency = max(1, min(count, concurrency or self.config.BATCH_CONCURRENCY))
+        context_types = [context_type or self.content_generator.get_random_context_type() for _ in range(count)]
+        self.duplicates  # Build the index once, before the workers share it
+        
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+            futures = {}
+            for index, item_type in enumerate(context_types):
+                context = contextvars.copy_context()
+                futures[executor.submit(context.run, self._generate_draft, item_type)] = (index, item_type)
             
+            for future in as_completed(futures):
+                index, item_type = futures[future]
+                record = {"index": index, "context_type": item_type, "content": future.result()}
+                with log_context(account=self.name, context_type=item_type):
+                    if not record["content"]:
+                        record["error"] = "generation_failed"
+                    elif self.is_duplicate(record["content"]):
+                        FAILURES.inc(stage="dedupe", cause="batch_duplicate")
+                        self.logger.warning(f"Dropping draft {index}, it duplicates an earlier one in the batch")
+                        record["error"] = "near_duplicate"
+                    elif dry_run:
+                        record["dry_run"] = True
+                        self.duplicates.add(f"draft:{index}", record["content"])
+                    else:
+                        result = self.post_content(record["content"], item_type)
+                        if result:
+                            record.update(id=result["id"], url=result["url"])
+                        else:
+                            record["error"] = "post_failed"
+                yield record
+    
+    def _generate_draft(self, context_type: str) -> Optional[str]:
+        """generate_content for a batch worker thread, never raising"""
+        with log_context(account=self.name, context_type=context_type):
+            try:
+                return self.generate_content(context_type)
+            except Exception as e:
+                FAILURES.inc(stage="generate", cause=type(e).__name__)
+                self.logger.error(f"Error generating {context_type} draft: {e}")
+                return None
+    
+    def generate_content(self, context_type: str, use_cache: bool = False) -> Optional[str]:
+        """Generate tweet content for a context type without posting it
+        
+        Candidates that nearly duplicate an earlier post are regenerated up to
+        MAX_REGENERATE_ATTEMPTS times and rejected after that. With
+        CANDIDATES_PER_REQUEST above 1, each request returns that many
+        candidates and the best one is picked locally. use_cache lets the first
+        request be answered from the response cache; regenerations never are.
+        """
+        if self.config.CANDIDATES_PER_REQUEST > 1:
+            return self._generate_ranked(context_type, self.config.CANDIDATES_PER_REQUEST, use_cache)
+        
+        for attempt in range(1 + self.config.MAX_REGENERATE_ATTEMPTS):
             self.logger.info(f"Generating {context_type} content...")
-            content = self.content_generator.generate_tweet_content(context_type)
+            content = self.content_generator.generate_tweet_content(
+                context_type, use_cache=use_cache and attempt == 0
+            )
             
             if not content:
-                self.logger.error("Failed to generate content")
                 return None
             
-            self.logger.info(f"Generated content: {content}")
+            with STAGE_SECONDS.time(stage="dedupe"):
+                match = self.duplicates.find(content)
+            if not match:
+                self.logger.info(f"Generated content: {content}")
+                return content
             
-            if dry_run:
-                self.logger.info("Dry run mode - not posting to Twitter")
-                return {"content": content, "dry_run": True}
+            tweet_id, similarity = match
+            FAILURES.inc(stage="dedupe", cause="near_duplicate")
+            self.logger.warning(
+                f"Generated content is a near-duplicate of tweet {tweet_id} "
+                f"(similarity {similarity:.2f}), regenerating: {content}"
+            )
+        
+        FAILURES.inc(stage="generate", cause="all_duplicates")
+        self.logger.error("Rejected content: every attempt was a near-duplicate")
+        return None
+    
+    def _generate_ranked(self, context_type: str, n: int, use_cache: bool = False) -> Optional[str]:
+        """Request n candidates at a time and return the best acceptable one"""
+        for attempt in range(1 + self.config.MAX_REGENERATE_ATTEMPTS):
+            self.logger.info(f"Generating {n} {context_type} candidates...")
+            candidates = self.content_generator.generate_candidates(
+                context_type, n, use_cache=use_cache and attempt == 0
+            )
+            
+            if not candidates:
+                return None
             
-            # Post to Twitter
-            result = self.twitter_client.post_tweet(content)
+            with STAGE_SECONDS.time(stage="rank"):
+                ranker = CandidateRanker.from_context(
+                    self.content_generator.user_context, self.config, duplicates=self.duplicates
+                )
+                ranked = ranker.rank(candidates)
+            if ranked:
+                score, content = ranked[0]
+                self.logger.info(f"Picked the best of {len(ranked)} acceptable candidates (score {score:.2f}): {content}")
+                return content
+            
+            for candidate in candidates:
+                FAILURES.inc(stage="rank", cause=ranker.rejection(candidate).split(':')[0])
+            self.logger.warning(f"All {len(candidates)} {context_type} candidates were rejected, regenerating")
+        
+        FAILURES.inc(stage="generate", cause="all_rejected")
+        self.logger.error("Rejected content: no acceptable candidate")
+        return None
+    
+    def is_duplicate(self, content: str) -> bool:
+        """Whether content nearly duplicates an earlier post"""
+        return self.duplicates.is_duplicate(content)
+    
+    def post_content(self, content: str, context_type: str, media: List[str] = None) -> Optional[dict]:
+        """Post already generated content to Twitter, uploading any media files first, and record it"""
+        with log_context(account=self.name, context_type=context_type):
+            start = time.perf_counter()
+            media_ids = None
+            if media:
+                try:
+                    media_ids = self.twitter_client.upload_media(media)
+                except Exception as e:
+                    self.logger.error(f"Media upload failed, not posting: {e}")
+                    return None
+            result = self.twitter_client.post_tweet(content, media_ids=media_ids)
             
             if result:
                 # Log the successful post
                 self._log_post(content, result, context_type)
-                self.logger.info(f"Successfully posted tweet: {result['url']}")
-            
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"Error in generate_and_post: {e}")
-            return None
+                self.logger.info(
+                    f"Successfully posted tweet: {result['url']}",
+                    extra={"tweet_id": result["id"], "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+                )
+        
+        return result
     
     def _log_post(self, content: str, result: dict, context_type: str):
-        """Log successful posts to a file"""
+        """Log successful posts to the history store"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "content": content,
@@ -73,43 +247,42 @@ class TwitterBot:
         }
         
         try:
-            # Read existing logs
-            try:
-                with open('post_history.json', 'r') as f:
-                    history = json.load(f)
-            except FileNotFoundError:
-                history = []
-            
-            # Add new entry
-            history.append(log_entry)
-            
-            # Keep only last 100 posts
-            history = history[-100:]
-            
-            # Write back to file
-            with open('post_history.json', 'w') as f:
-                json.dump(history, f, indent=2)
-                
+            with STAGE_SECONDS.time(stage="history_write"):
+                self.history.append(log_entry)
+                self.duplicates.add(log_entry["tweet_id"], content)
+            POSTS.inc(context_type=context_type)
         except Exception as e:
+            FAILURES.inc(stage="history_write", cause=type(e).__name__)
             self.logger.error(f"Error logging post: {e}")
     
-    def get_post_history(self, limit: int = 10) -> list:
-        """Get recent post history"""
+    def get_post_history(self, limit: int = 10, context_type: str = None,
+                         since: str = None, until: str = None) -> list:
+        """Get recent post history, optionally filtered by context type and time range"""
         try:
-            with open('post_history.json', 'r') as f:
-                history = json.load(f)
-                return history[-limit:]
-        except FileNotFoundError:
-            return []
+            return self.history.recent(limit, context_type=context_type, since=since, until=until)
         except Exception as e:
             self.logger.error(f"Error reading post history: {e}")
             return []
     
+    def warm_up(self):
+        """Get everything a post needs ready: connections, credentials, prompts and the duplicate index"""
+        start = time.perf_counter()
+        try:
+            self.duplicates
+            self.content_generator.warm_up()
+            self.twitter_client.warm_up()
+            self.logger.info(f"Warmed up in {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            FAILURES.inc(stage="warm_up", cause=type(e).__name__)
+            self.logger.warning(f"Warm-up failed, the next post starts cold: {e}")
+    
     def test_connection(self) -> bool:
         """Test connections to both OpenAI and Twitter"""
         try:
-            # Test OpenAI
-            test_content = self.content_generator.generate_tweet_content("general")
+            # Test OpenAI; a cached answer means an identical request recently succeeded
+            test_content = self.content_generator.generate_tweet_content(
+                "general", use_cache=self.config.RESPONSE_CACHE_ENABLED
+            )
             if not test_content:
                 self.logger.error("OpenAI connection test failed")
                 return False
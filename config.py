@@ -6,6 +6,13 @@ load_dotenv()
 class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Override to use a local stand-in server
+    OPENAI_STREAMING = os.getenv("OPENAI_STREAMING", "false").lower() == "true"  # Stop bad completions mid-stream
+    OPENAI_MODELS = os.getenv("OPENAI_MODELS", "gpt-4.1-mini")  # Primary first; more (model or model@base_url) enable hedging
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))  # Hedge once the primary is slower than this
+    HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "8"))  # Seconds, until 20 latencies are known
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1"))  # Seconds
+    HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))  # Fraction of requests that may send a hedge
     
     # Twitter API Configuration
     TWITTER_BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN")
@@ -13,11 +20,154 @@ class Config:
     TWITTER_CONSUMER_SECRET = os.getenv("TWITTER_CONSUMER_SECRET")
     TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
     TWITTER_ACCESS_TOKEN_SECRET = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
+    TWITTER_API_BASE_URL = os.getenv("TWITTER_API_BASE_URL") or None  # Override to use a local stand-in server
     
     # Bot Configuration
     POSTING_SCHEDULE = os.getenv("POSTING_SCHEDULE", "09:00,14:00,19:00")  # Default times
-    MAX_TWEET_LENGTH = 280
-    
+    MAX_TWEET_LENGTH = 280  # Weighted the way Twitter counts it (URLs 23, CJK and emoji 2)
+    MAX_THREAD_PARTS = int(os.getenv("MAX_THREAD_PARTS", "4"))  # Longer output is posted as a thread; 1 trims instead
+    POSTING_TIMEZONE = os.getenv("POSTING_TIMEZONE") or None  # e.g. America/Los_Angeles, default local time
+    POSTING_JITTER_SECONDS = float(os.getenv("POSTING_JITTER_SECONDS", "0"))  # Random delay added to each slot
+    SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+
+    # Timeout, retry and circuit breaker Configuration
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))  # Seconds per request
+    TWITTER_TIMEOUT = float(os.getenv("TWITTER_TIMEOUT", "10"))  # Seconds per request
+    RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))  # Total attempts per call
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RECOVERY_SECONDS = float(os.getenv("BREAKER_RECOVERY_SECONDS", "60"))
+
+    # Connection pool Configuration (shared by every account in the process)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))  # Kept-alive connections per API host
+    HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "120"))  # Idle time before OpenAI connections close
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"  # For OpenAI, when the h2 package is installed
+    WARMUP_MINUTES_BEFORE_SLOT = int(os.getenv("WARMUP_MINUTES_BEFORE_SLOT", "1"))  # Open connections before each slot, 0 disables
+
+    # Twitter rate limit Configuration
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))  # Seconds a call may queue before failing fast
+    DISPATCHER_WORKERS = int(os.getenv("DISPATCHER_WORKERS", "8"))
+
+    # Timeline sync Configuration
+    TIMELINE_DB_FILE = os.getenv("TIMELINE_DB_FILE", "timeline.db")
+    TIMELINE_METRICS_REFRESH_DAYS = int(os.getenv("TIMELINE_METRICS_REFRESH_DAYS", "7"))  # 0 disables
+
+    # Context selection Configuration
+    CONTEXT_SELECTION = os.getenv("CONTEXT_SELECTION", "bandit")  # bandit (learn from engagement) or fixed
+    ENGAGEMENT_FILE = os.getenv("ENGAGEMENT_FILE", "engagement.bin")  # Metrics snapshots written by `main.py sync`
+    BANDIT_MIN_POSTS = int(os.getenv("BANDIT_MIN_POSTS", "20"))  # Posts with metrics before the bandit takes over
+
+    # Near-duplicate detection Configuration
+    DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))  # Estimated Jaccard similarity
+    MAX_REGENERATE_ATTEMPTS = int(os.getenv("MAX_REGENERATE_ATTEMPTS", "2"))
+
+    # Response cache Configuration (used by dry runs and connection tests, never by live posts)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", "response_cache.db")
+    RESPONSE_CACHE_TTL_HOURS = float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "24"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+
+    # Batch generation Configuration (main.py post --count)
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # Drafts generated at the same time
+
+    # Candidate ranking Configuration
+    CANDIDATES_PER_REQUEST = int(os.getenv("CANDIDATES_PER_REQUEST", "1"))  # Above 1, rank n completions per request
+
+    # Logging Configuration
+    LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate at this size, 0 disables
+    LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))  # Rotate at this age, 0 disables
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+    # Metrics Configuration
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve Prometheus metrics on this port, 0 disables
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_DUMP_FILE = os.getenv("METRICS_DUMP_FILE", "")  # Periodically write metrics here, empty disables
+    METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "60"))  # Seconds
+
+    # Multi-account engine Configuration
+    ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "accounts.json")
+    ENGINE_MAX_WORKERS = int(os.getenv("ENGINE_MAX_WORKERS", "16"))  # Threads shared by all accounts
+
+    # Job queue Configuration (scheduled posts run on `main.py worker` processes)
+    JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true"
+    JOB_QUEUE_FILE = os.getenv("JOB_QUEUE_FILE", "jobs.db")
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # A crashed worker's job is re-leased after this
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "5"))  # Seconds
+
+    # Mention responder Configuration (`main.py mentions`, or alongside the scheduler)
+    MENTIONS_ENABLED = os.getenv("MENTIONS_ENABLED", "false").lower() == "true"  # Answer mentions while scheduling
+    MENTIONS_DB_FILE = os.getenv("MENTIONS_DB_FILE", "mentions.db")
+    MENTION_POLL_SECONDS = float(os.getenv("MENTION_POLL_SECONDS", "60"))  # While no mentions are pending
+    MENTION_CONCURRENCY = int(os.getenv("MENTION_CONCURRENCY", "8"))  # Replies generated and posted at the same time
+    MENTION_BATCH_SIZE = int(os.getenv("MENTION_BATCH_SIZE", "50"))  # Mentions taken per cycle
+    MENTION_LATENCY_TARGET_SECONDS = float(os.getenv("MENTION_LATENCY_TARGET_SECONDS", "300"))  # Mention to reply
+    MENTION_MAX_AGE_HOURS = float(os.getenv("MENTION_MAX_AGE_HOURS", "24"))  # Older mentions are not answered
+
+    # Media upload Configuration (`main.py post --media`)
+    MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(4 * 1024 * 1024)))  # Bytes per APPEND request
+    MEDIA_UPLOAD_CONCURRENCY = int(os.getenv("MEDIA_UPLOAD_CONCURRENCY", "4"))  # APPEND requests in flight per upload
+    MEDIA_CACHE_FILE = os.getenv("MEDIA_CACHE_FILE", "media_cache.db")  # Media ids by content hash, until they expire
+
+    # Content buffer Configuration
+    CONTENT_BUFFER_ENABLED = os.getenv("CONTENT_BUFFER_ENABLED", "true").lower() == "true"
+    CONTENT_BUFFER_FILE = os.getenv("CONTENT_BUFFER_FILE", "content_buffer.json")
+    CONTENT_BUFFER_SIZE = int(os.getenv("CONTENT_BUFFER_SIZE", "2"))  # Ready tweets kept per context type
+    CONTENT_BUFFER_REFILL_INTERVAL = int(os.getenv("CONTENT_BUFFER_REFILL_INTERVAL", "300"))  # Seconds
+    CONTENT_BUFFER_MAX_AGE_HOURS = int(os.getenv("CONTENT_BUFFER_MAX_AGE_HOURS", "72"))  # Drop stale drafts
+
+    # Data files an entry in ACCOUNTS_FILE keeps to itself, by default under accounts/<name>/
+    ACCOUNT_FILES = [
+        "TIMELINE_DB_FILE",
+        "ENGAGEMENT_FILE",
+        "RESPONSE_CACHE_FILE",
+        "JOB_QUEUE_FILE",
+        "MENTIONS_DB_FILE",
+        "MEDIA_CACHE_FILE",
+        "CONTENT_BUFFER_FILE"
+    ]
+
+    # Settings an entry in ACCOUNTS_FILE may override
+    ACCOUNT_VARS = ACCOUNT_FILES + [
+        "OPENAI_API_KEY",
+        "TWITTER_BEARER_TOKEN",
+        "TWITTER_CONSUMER_KEY",
+        "TWITTER_CONSUMER_SECRET",
+        "TWITTER_ACCESS_TOKEN",
+        "TWITTER_ACCESS_TOKEN_SECRET",
+        "POSTING_SCHEDULE",
+        "POSTING_TIMEZONE"
+    ]
+
+    def __init__(self, **overrides):
+        for key, value in overrides.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def for_account(cls, account: dict) -> "Config":
+        """Build the config for one entry of ACCOUNTS_FILE
+
+        Each setting is read from the entry itself (lowercase key), then from
+        the environment under the entry's env_prefix, and otherwise falls back
+        to the process-wide value. Data files fall back to the process-wide
+        file name in accounts/<name>/ instead, so personas never share them.
+        """
+        prefix = account.get("env_prefix", "")
+        overrides = {}
+        for var in cls.ACCOUNT_VARS:
+            value = account.get(var.lower())
+            if value is None and prefix:
+                value = os.getenv(f"{prefix}{var}")
+            if value is None and var in cls.ACCOUNT_FILES:
+                value = os.path.join("accounts", account["name"], os.path.basename(getattr(cls, var)))
+            if value is not None:
+                overrides[var] = value
+        return cls(**overrides)
+
     def validate_config(self):
         """Validate that all required configuration is present"""
         required_vars = [
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+class ContentBuffer:
+    """Bounded, persisted queue of ready-to-post tweets per context type
+
+    A background producer keeps every context type topped up with generated
+    tweets so that a scheduled slot only has to pop one and post it. The queue
+    is written to disk after every change, so drafts survive restarts.
+    """
+
+    def __init__(self, bot, path: str = None, size_per_type: int = None,
+                 refill_interval: int = None, max_age_hours: int = None):
+        config = bot.config
+        self.bot = bot
+        self.path = path or config.CONTENT_BUFFER_FILE
+        self.size_per_type = size_per_type or config.CONTENT_BUFFER_SIZE
+        self.refill_interval = refill_interval or config.CONTENT_BUFFER_REFILL_INTERVAL
+        self.max_age = timedelta(hours=max_age_hours or config.CONTENT_BUFFER_MAX_AGE_HOURS)
+        self.context_types = list(bot.content_generator.CONTEXT_TYPES)
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+        self.queues: Dict[str, List[dict]] = self._load()
+
+    def _load(self) -> Dict[str, List[dict]]:
+        """Load the persisted queues, dropping stale drafts"""
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            stored = {}
+        except Exception as e:
+            self.logger.error(f"Error reading content buffer, starting empty: {e}")
+            stored = {}
+
+        cutoff = datetime.now() - self.max_age
+        return {
+            context_type: [
+                item for item in stored.get(context_type, [])
+                if datetime.fromisoformat(item["created_at"]) >= cutoff
+            ]
+            for context_type in self.context_types
+        }
+
+    def _expire(self) -> int:
+        """Drop drafts older than max_age, returning how many (caller holds the lock)"""
+        cutoff = datetime.now() - self.max_age
+        dropped = 0
+        for context_type, items in self.queues.items():
+            fresh = [item for item in items if datetime.fromisoformat(item["created_at"]) >= cutoff]
+            dropped += len(items) - len(fresh)
+            self.queues[context_type] = fresh
+        return dropped
+
+    def _save(self):
+        """Atomically persist the queues (caller holds the lock)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.queues, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of ready tweets per context type"""
+        with self.lock:
+            return {context_type: len(items) for context_type, items in self.queues.items()}
+
+    def push(self, context_type: str, content: str, front: bool = False, created_at: str = None):
+        """Add a ready tweet, at the front when returning an unposted draft
+
+        A returned draft keeps the created_at it was popped with, so it still
+        expires max_age after it was generated.
+        """
+        item = {"content": content, "created_at": created_at or datetime.now().isoformat()}
+        with self.lock:
+            queue = self.queues.setdefault(context_type, [])
+            if front:
+                queue.insert(0, item)
+            else:
+                queue.append(item)
+            self._save()
+
+    def pop(self, context_type: str = None) -> Optional[Tuple[str, str, str]]:
+        """Take the oldest ready tweet, returning (context_type, content, created_at)
+
+        Without a context type the usual weighted pick is tried first, falling
+        back to whichever type has the most drafts ready. Stale drafts are
+        dropped first.
+        """
+        if not context_type:
+            context_type = self.bot.content_generator.get_random_context_type()
+
+        with self.lock:
+            dropped = self._expire()
+            if dropped:
+                self.logger.info(f"Dropped {dropped} stale drafts from the content buffer")
+            queue = self.queues.get(context_type)
+            if not queue:
+                available = [ct for ct, items in self.queues.items() if items]
+                if not available:
+                    if dropped:
+                        self._save()
+                    return None
+                context_type = max(available, key=lambda ct: len(self.queues[ct]))
+                queue = self.queues[context_type]
+
+            item = queue.pop(0)
+            self._save()
+
+        # Let the producer replace what was just taken
+        self.wakeup.set()
+        return context_type, item["content"], item["created_at"]
+
+    def refill_once(self) -> int:
+        """Generate drafts until every context type is full, returning how many were added
+
+        Stops at the first failed generation so an OpenAI outage is retried on
+        the next refill instead of being hammered.
+        """
+        added = 0
+        while True:
+            counts = self.counts()
+            context_type = min(self.context_types, key=lambda ct: counts.get(ct, 0))
+            if counts.get(context_type, 0) >= self.size_per_type:
+                return added
+
+            content = self.bot.generate_content(context_type)
+            if not content:
+                self.logger.warning(f"Content buffer refill failed for {context_type}, will retry later")
+                return added
+
+            self.push(context_type, content)
+            added += 1
+
+    def start(self):
+        """Start the background producer thread"""
+        if self.running:
+            return
+        self.running = True
+
+        def produce():
+            while self.running:
+                try:
+                    added = self.refill_once()
+                    if added:
+                        self.logger.info(f"Content buffer refilled with {added} drafts: {self.counts()}")
+                except Exception as e:
+                    self.logger.error(f"Error refilling content buffer: {e}")
+                self.wakeup.wait(self.refill_interval)
+                self.wakeup.clear()
+
+        self.thread = threading.Thread(target=produce, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background producer thread"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
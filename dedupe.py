@@ -0,0 +1,159 @@
+import re
+import threading
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+
+class DuplicateIndex:
+    """MinHash/LSH index of posted tweets for near-duplicate detection
+
+    Each tweet is reduced to character shingles and summarised by a one
+    permutation MinHash signature: every shingle is hashed once and the hash
+    picks one of NUM_BINS bins, each keeping its minimum. Signatures are split
+    into LSH bands so a query only compares against tweets sharing at least one
+    band, which keeps lookups well under a millisecond with tens of thousands of
+    indexed tweets. The fraction of matching bins estimates Jaccard similarity.
+    """
+
+    NUM_BINS = 64
+    BANDS = 16
+    ROWS = NUM_BINS // BANDS
+    BIN_BITS = 6  # log2(NUM_BINS)
+    EMPTY = 0xFFFFFFFF
+
+    URL_PATTERN = re.compile(r'https?://\S+')
+    NON_WORD_PATTERN = re.compile(r'[^\w#@]+')
+
+    def __init__(self, threshold: float = 0.6, shingle_size: int = 5):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.keys: List[str] = []
+        self.signatures: List[array] = []
+        # Band hash -> index of a single tweet, or a list once several share it
+        self.buckets: Dict[int, Union[int, List[int]]] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, history, **kwargs) -> "DuplicateIndex":
+        """Build an index over every post in a PostHistoryStore
+
+        Signatures are cached in the store, so only posts added since the last
+        build have to be shingled and hashed again.
+        """
+        index = cls(**kwargs)
+        missing = []
+        for post_id, tweet_id, content, blob in history.signature_rows(index.version):
+            if blob is None:
+                signature = index.signature(content)
+                missing.append((post_id, signature.tobytes()))
+            else:
+                signature = array('I')
+                signature.frombytes(blob)
+            index.add_signature(tweet_id, signature)
+        if missing:
+            history.save_signatures(missing)
+        return index
+
+    @property
+    def version(self) -> str:
+        """Identifies the signature layout so cached signatures can be invalidated"""
+        return f"oph-{self.NUM_BINS}-{self.shingle_size}"
+
+    def _normalize(self, text: str) -> str:
+        """Lowercase and strip URLs and punctuation so trivial edits still match"""
+        text = self.URL_PATTERN.sub(' ', text.lower())
+        return ' '.join(self.NON_WORD_PATTERN.sub(' ', text).split())
+
+    def signature(self, text: str) -> array:
+        """One permutation MinHash signature of a text"""
+        data = self._normalize(text).encode()
+        size = self.shingle_size
+        crc32 = zlib.crc32
+        hashes = [crc32(data[i:i + size]) for i in range(max(1, len(data) - size + 1))]
+
+        # Within a bin the smallest hash also has the smallest value, so walking
+        # the hashes in descending order leaves each bin holding its minimum
+        mask = self.NUM_BINS - 1
+        bits = self.BIN_BITS
+        filled = {h & mask: h >> bits for h in sorted(hashes, reverse=True)}
+        bins = [filled.get(b, self.EMPTY) for b in range(self.NUM_BINS)]
+
+        # Densify: an empty bin borrows from the next filled bin so that short
+        # texts still produce comparable signatures
+        if len(filled) < self.NUM_BINS:
+            for b in range(self.NUM_BINS):
+                offset = 1
+                while bins[b] == self.EMPTY:
+                    donor = bins[(b + offset) % self.NUM_BINS]
+                    if donor <= 0x3FFFFFF:
+                        bins[b] = donor + offset * 0x4000000
+                    offset += 1
+        return array('I', bins)
+
+    def _band_keys(self, signature: array) -> List[int]:
+        """Hash each LSH band of a signature"""
+        rows = self.ROWS
+        return [
+            hash((band, signature[band * rows:(band + 1) * rows].tobytes()))
+            for band in range(self.BANDS)
+        ]
+
+    def similarity(self, a: array, b: array) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(a, b) if x == y) / self.NUM_BINS
+
+    def add(self, key: str, text: str):
+        """Index a posted tweet"""
+        self.add_signature(key, self.signature(text))
+
+    def add_signature(self, key: str, signature: array):
+        """Index a posted tweet by its precomputed signature"""
+        with self.lock:
+            position = len(self.keys)
+            self.keys.append(key)
+            self.signatures.append(signature)
+            for band_key in self._band_keys(signature):
+                bucket = self.buckets.get(band_key)
+                if bucket is None:
+                    self.buckets[band_key] = position
+                elif isinstance(bucket, list):
+                    bucket.append(position)
+                else:
+                    self.buckets[band_key] = [bucket, position]
+
+    def find(self, text: str) -> Optional[Tuple[str, float]]:
+        """Most similar indexed tweet at or above the threshold, as (key, similarity)"""
+        best = self.nearest(text)
+        return best if best and best[1] >= self.threshold else None
+
+    def nearest(self, text: str) -> Optional[Tuple[str, float]]:
+        """Most similar indexed tweet sharing an LSH band with text, as (key, similarity)
+
+        Tweets that share no band are very unlikely to be similar, so None
+        means the text is novel.
+        """
+        signature = self.signature(text)
+        candidates = set()
+        with self.lock:
+            for band_key in self._band_keys(signature):
+                bucket = self.buckets.get(band_key)
+                if bucket is None:
+                    continue
+                if isinstance(bucket, list):
+                    candidates.update(bucket)
+                else:
+                    candidates.add(bucket)
+
+            best = None
+            for position in candidates:
+                score = self.similarity(signature, self.signatures[position])
+                if best is None or score > best[1]:
+                    best = (self.keys[position], score)
+        return best
+
+    def is_duplicate(self, text: str) -> bool:
+        """Whether a text is a near-duplicate of an indexed tweet"""
+        return self.find(text) is not None
+
+    def __len__(self) -> int:
+        return len(self.keys)
@@ -0,0 +1,269 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+class RateLimited(Exception):
+    """A call would have to wait longer than the caller allows for its rate limit"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"{endpoint} is rate limited, expected wait {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Request budget of one endpoint, kept in sync with Twitter's rate-limit headers
+
+    Until the first response is seen the budget is unknown and calls go
+    straight through. Afterwards every dispatched call takes a token and each
+    response overwrites the bucket with the server's own numbers.
+    """
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+
+    def update(self, headers):
+        """Apply x-rate-limit-* headers from a response"""
+        try:
+            if "x-rate-limit-limit" in headers:
+                self.limit = int(headers["x-rate-limit-limit"])
+            if "x-rate-limit-remaining" in headers:
+                self.remaining = int(headers["x-rate-limit-remaining"])
+            if "x-rate-limit-reset" in headers:
+                self.reset_at = float(headers["x-rate-limit-reset"])
+        except (TypeError, ValueError):
+            pass
+
+    def _roll_window(self, now: float):
+        """Start a fresh window once the reset time has passed"""
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._roll_window(now)
+        if self.remaining is None or self.remaining > 0:
+            return 0.0
+        if self.reset_at is None:
+            return 0.0
+        return max(0.0, self.reset_at - now)
+
+    def take(self, now: float):
+        """Spend a token for a dispatched call"""
+        self._roll_window(now)
+        if self.remaining is not None:
+            self.remaining = max(0, self.remaining - 1)
+
+
+class _Call:
+    """A queued API call"""
+
+    def __init__(self, endpoint: str, func, args, kwargs, future: Future, max_wait: float = None):
+        self.endpoint = endpoint
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.max_wait = max_wait
+        self.rate_limited = 0  # 429s answered to this call so far
+
+
+class RateLimitDispatcher:
+    """Queues Twitter calls per endpoint and releases them as rate limits allow
+
+    Each endpoint has its own token bucket and priority queue, so a throttled
+    endpoint only holds back its own calls; everything else keeps flowing.
+    Calls run on a small thread pool instead of sleeping inside tweepy, and
+    callers can ask for the expected wait up front instead of blocking on it.
+    """
+
+    MIN_BACKOFF = 1.0  # Seconds before retrying a 429 that came without a reset time
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, max_workers: int = 8):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.queues: Dict[str, List[tuple]] = {}
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dispatch")
+        self.sequence = itertools.count()
+        self.local = threading.local()
+        self.running = False
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            bucket = self.buckets[endpoint] = TokenBucket()
+        return bucket
+
+    def expected_wait(self, endpoint: str) -> float:
+        """Seconds a call submitted now would wait before it is sent"""
+        with self.condition:
+            now = time.time()
+            bucket = self._bucket(endpoint)
+            wait = bucket.wait_time(now)
+            queued = len(self.queues.get(endpoint, []))
+            if bucket.remaining is not None and queued >= max(bucket.remaining, 0) and bucket.reset_at:
+                # Calls already queued use up what is left of this window
+                wait = max(wait, bucket.reset_at - now)
+            return wait
+
+    def submit(self, endpoint: str, func, *args, priority: int = 10, max_wait: float = None, **kwargs) -> Future:
+        """Queue a call and return a Future for its result
+
+        Lower priority values go first within an endpoint's queue. If the
+        server still answers 429 and the wait before the call could be sent
+        again is longer than max_wait seconds, the Future fails with
+        RateLimited instead of waiting.
+        """
+        future = Future()
+        future.expected_wait = self.expected_wait(endpoint)
+        call = _Call(endpoint, func, args, kwargs, future, max_wait=max_wait)
+        with self.condition:
+            self._start()
+            heapq.heappush(self.queues.setdefault(endpoint, []), (priority, next(self.sequence), call))
+            self.condition.notify()
+        return future
+
+    def call(self, endpoint: str, func, *args, max_wait: float = None, priority: int = 10, **kwargs):
+        """Run a call through the queue and wait for its result
+
+        Raises RateLimited straight away, without queueing, when the expected
+        wait is longer than max_wait seconds, and also when a 429 later in the
+        call's life pushes the wait past max_wait.
+        """
+        wait = self.expected_wait(endpoint)
+        if max_wait is not None and wait > max_wait:
+            raise RateLimited(endpoint, wait)
+        return self.submit(endpoint, func, *args, priority=priority, max_wait=max_wait, **kwargs).result()
+
+    def record_response(self, response):
+        """Update the bucket of the call running on this thread from its response headers"""
+        endpoint = getattr(self.local, "endpoint", None)
+        if endpoint is None or response is None:
+            return
+        with self.condition:
+            self._bucket(endpoint).update(response.headers)
+            self.condition.notify()
+
+    def status(self) -> Dict[str, dict]:
+        """Budget, queue length and expected wait of every known endpoint"""
+        with self.condition:
+            endpoints = list(self.buckets)
+        return {
+            endpoint: {
+                "limit": self.buckets[endpoint].limit,
+                "remaining": self.buckets[endpoint].remaining,
+                "queued": len(self.queues.get(endpoint, [])),
+                "expected_wait": self.expected_wait(endpoint)
+            }
+            for endpoint in endpoints
+        }
+
+    def _start(self):
+        """Start the dispatch thread (caller holds the condition)"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.thread.start()
+
+    def _next_call(self, now: float):
+        """Pop the highest-priority call whose endpoint has budget, else return the next wake time"""
+        best_endpoint = None
+        wake_at = None
+        for endpoint, queue in self.queues.items():
+            if not queue:
+                continue
+            wait = self._bucket(endpoint).wait_time(now)
+            if wait > 0:
+                wake_at = now + wait if wake_at is None else min(wake_at, now + wait)
+                continue
+            if best_endpoint is None or queue[0][:2] < self.queues[best_endpoint][0][:2]:
+                best_endpoint = endpoint
+
+        if best_endpoint is None:
+            return None, wake_at
+        self._bucket(best_endpoint).take(now)
+        return heapq.heappop(self.queues[best_endpoint])[2], None
+
+    def _dispatch_loop(self):
+        with self.condition:
+            while self.running:
+                call, wake_at = self._next_call(time.time())
+                if call is None:
+                    self.condition.wait(None if wake_at is None else max(0.0, wake_at - time.time()))
+                    continue
+                # A call requeued after a 429 is already marked running
+                if call.future.running() or call.future.set_running_or_notify_cancel():
+                    self.executor.submit(self._execute, call)
+
+    def _execute(self, call: _Call):
+        """Run one call, requeueing it if the server still answers 429
+
+        Without a usable reset time the endpoint backs off for MIN_BACKOFF
+        seconds, doubling with every 429 the call gets, so it is not retried
+        in a tight loop. A call whose wait would exceed its max_wait fails
+        with RateLimited instead.
+        """
+        self.local.endpoint = call.endpoint
+        try:
+            result = call.func(*call.args, **call.kwargs)
+        except Exception as e:
+            response = getattr(e, "response", None)
+            if getattr(response, "status_code", None) == 429:
+                with self.condition:
+                    now = time.time()
+                    bucket = self._bucket(call.endpoint)
+                    bucket.update(response.headers)
+                    bucket.remaining = 0
+                    call.rate_limited += 1
+                    backoff = min(self.MAX_BACKOFF, self.MIN_BACKOFF * 2 ** (call.rate_limited - 1))
+                    if bucket.reset_at is None or bucket.reset_at - now < backoff:
+                        bucket.reset_at = now + backoff
+                    wait = bucket.wait_time(now)
+                    if call.max_wait is not None and wait > call.max_wait:
+                        self.logger.warning(f"{call.endpoint} hit its rate limit, failing rather than waiting {wait:.0f}s")
+                        call.future.set_exception(RateLimited(call.endpoint, wait))
+                        return
+                    self.logger.warning(f"{call.endpoint} hit its rate limit, requeued for {wait:.0f}s")
+                    heapq.heappush(self.queues.setdefault(call.endpoint, []), (0, next(self.sequence), call))
+                    self.condition.notify()
+                return
+            call.future.set_exception(e)
+        else:
+            call.future.set_result(result)
+        finally:
+            self.local.endpoint = None
+
+    def stop(self):
+        """Stop dispatching; queued calls are cancelled"""
+        with self.condition:
+            self.running = False
+            for queue in self.queues.values():
+                for _, _, call in queue:
+                    call.future.cancel()
+                queue.clear()
+            self.condition.notify()
+        self.executor.shutdown(wait=False)
+
+
+_default_dispatcher = None
+_default_lock = threading.Lock()
+
+def get_dispatcher() -> RateLimitDispatcher:
+    """Process-wide dispatcher shared by every TwitterClient"""
+    global _default_dispatcher
+    with _default_lock:
+        if _default_dispatcher is None:
+            from config import Config
+            _default_dispatcher = RateLimitDispatcher(max_workers=Config.DISPATCHER_WORKERS)
+        return _default_dispatcher
@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ranking import CandidateRanker
+
+METRICS = ["retweet_count", "reply_count", "like_count", "quote_count", "impression_count"]
+
+# One fixed-width record per metrics snapshot; each field is a column view of the loaded array
+SNAPSHOT_DTYPE = np.dtype([("tweet_id", "<i8"), ("taken_at", "<f8")] + [(metric, "<i8") for metric in METRICS])
+
+def engagement_score(snapshots: np.ndarray) -> np.ndarray:
+    """Weighted engagement of each snapshot: a retweet or quote counts twice a like or reply"""
+    return (
+        snapshots["like_count"] + snapshots["reply_count"]
+        + 2 * (snapshots["retweet_count"] + snapshots["quote_count"])
+    ).astype(np.float64)
+
+
+class EngagementStore:
+    """Append-only engagement snapshots in a flat binary file of SNAPSHOT_DTYPE records
+
+    Every timeline sync appends one record per tweet it saw, so the file
+    keeps how each tweet's metrics grew over time. Appends write only the new
+    records; loading is a single np.fromfile, cached until the file grows, and
+    a partially written record at the end (from a crash mid-append) is ignored.
+    """
+
+    def __init__(self, path: str = 'engagement.bin'):
+        self.path = path
+        self.lock = threading.Lock()
+        self._loaded: Tuple[int, np.ndarray] = (0, np.empty(0, dtype=SNAPSHOT_DTYPE))
+
+    def append(self, tweets: List[dict], taken_at: float = None):
+        """Record a snapshot of each tweet's public_metrics"""
+        if not tweets:
+            return
+        records = np.zeros(len(tweets), dtype=SNAPSHOT_DTYPE)
+        records["tweet_id"] = [int(tweet["id"]) for tweet in tweets]
+        records["taken_at"] = taken_at or time.time()
+        for metric in METRICS:
+            records[metric] = [tweet.get("public_metrics", {}).get(metric, 0) for tweet in tweets]
+        with self.lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            with open(self.path, 'ab') as f:
+                # Drop a torn record so later appends stay aligned
+                if size % SNAPSHOT_DTYPE.itemsize:
+                    f.truncate(size - size % SNAPSHOT_DTYPE.itemsize)
+                f.write(records.tobytes())
+
+    def load(self) -> np.ndarray:
+        """Every snapshot, oldest first"""
+        with self.lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if size != self._loaded[0]:
+                count = size // SNAPSHOT_DTYPE.itemsize
+                self._loaded = (size, np.fromfile(self.path, dtype=SNAPSHOT_DTYPE, count=count))
+            return self._loaded[1]
+
+    def latest(self) -> np.ndarray:
+        """The newest snapshot of every tweet, sorted by tweet_id"""
+        snapshots = self.load()
+        if not len(snapshots):
+            return snapshots
+        snapshots = snapshots[np.lexsort((snapshots["taken_at"], snapshots["tweet_id"]))]
+        ids = snapshots["tweet_id"]
+        return snapshots[np.append(ids[1:] != ids[:-1], True)]
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+
+class EngagementAnalytics:
+    """Engagement of our posts, joined to post history by tweet_id and aggregated with NumPy
+
+    Only posts the bot made (and whose metrics have been synced) take part.
+    Each is labelled with its context type, the local hour it was posted and
+    its hashtags; by() then groups on one of those with np.bincount.
+    """
+
+    DIMENSIONS = ("context", "hour", "hashtag")
+
+    def __init__(self, latest: np.ndarray, posts: List[dict]):
+        history_ids = np.array(
+            [int(post["tweet_id"]) if str(post.get("tweet_id") or "").isdigit() else -1 for post in posts],
+            dtype=np.int64
+        )
+        positions = np.searchsorted(latest["tweet_id"], history_ids)
+        positions[positions == len(latest)] = 0
+        matched = np.flatnonzero(
+            (latest["tweet_id"][positions] == history_ids) if len(latest) else np.zeros(len(posts), dtype=bool)
+        )
+
+        self.snapshots = latest[positions[matched]]
+        self.scores = engagement_score(self.snapshots)
+        matched_posts = [posts[i] for i in matched]
+
+        self.labels = {
+            "context": np.unique([post.get("context_type") or "unknown" for post in matched_posts], return_inverse=True),
+            "hour": np.unique([int(post["timestamp"][11:13]) for post in matched_posts], return_inverse=True)
+        }
+
+        # One row per (post, hashtag) pair
+        tag_rows, tags = [], []
+        for row, post in enumerate(matched_posts):
+            for tag in CandidateRanker.HASHTAG_PATTERN.findall(post["content"]):
+                tag_rows.append(row)
+                tags.append(tag.lower())
+        self.tag_rows = np.array(tag_rows, dtype=np.int64)
+        self.labels["hashtag"] = np.unique(np.array(tags, dtype=str), return_inverse=True)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def by(self, dimension: str) -> List[dict]:
+        """Posts, mean engagement, likes and retweets per value of a dimension, best first"""
+        names, codes = self.labels[dimension]
+        rows = self.tag_rows if dimension == "hashtag" else slice(None)
+        snapshots, scores = self.snapshots[rows], self.scores[rows]
+
+        posts = np.bincount(codes, minlength=len(names))
+        totals = np.bincount(codes, weights=scores, minlength=len(names))
+        likes = np.bincount(codes, weights=snapshots["like_count"], minlength=len(names))
+        retweets = np.bincount(codes, weights=snapshots["retweet_count"], minlength=len(names))
+        means = totals / np.maximum(posts, 1)
+
+        return [
+            {
+                "key": names[i].item(),
+                "posts": int(posts[i]),
+                "mean_engagement": float(means[i]),
+                "likes": int(likes[i]),
+                "retweets": int(retweets[i])
+            }
+            for i in np.argsort(-means, kind="stable")
+        ]
+
+    def context_rewards(self) -> Dict[str, Tuple[int, int]]:
+        """(wins, posts) per context type, a win being a post above the median engagement"""
+        if not len(self):
+            return {}
+        names, codes = self.labels["context"]
+        wins = np.bincount(codes, weights=self.scores > np.median(self.scores), minlength=len(names))
+        posts = np.bincount(codes, minlength=len(names))
+        return {name.item(): (int(w), int(n)) for name, w, n in zip(names, wins, posts)}
+
+
+class ContextBandit:
+    """Thompson sampling over context types, rewarded for above-median engagement
+
+    Each context type keeps a Beta(1 + wins, 1 + losses) belief about how
+    often its posts beat the account's median; choose() samples every belief
+    and picks the highest, so types that do well get picked more while
+    untried or rarely used ones still get explored.
+    """
+
+    def __init__(self, context_types: List[str], rewards: Dict[str, Tuple[int, int]], rng=None):
+        self.context_types = list(context_types)
+        wins = np.array([rewards.get(t, (0, 0))[0] for t in self.context_types], dtype=np.float64)
+        posts = np.array([rewards.get(t, (0, 0))[1] for t in self.context_types], dtype=np.float64)
+        self.alpha = 1 + wins
+        self.beta = 1 + posts - wins
+        self.observations = int(posts.sum())
+        self.rng = rng or np.random.default_rng()
+
+    def choose(self) -> str:
+        """Sample a context type"""
+        return self.context_types[int(np.argmax(self.rng.beta(self.alpha, self.beta)))]
+
+    def probabilities(self, samples: int = 10000) -> Dict[str, float]:
+        """Estimated chance choose() picks each context type"""
+        draws = self.rng.beta(self.alpha, self.beta, size=(samples, len(self.context_types)))
+        picks = np.bincount(np.argmax(draws, axis=1), minlength=len(self.context_types))
+        return {t: picks[i] / samples for i, t in enumerate(self.context_types)}
+
+
+class ContextSelector:
+    """Picks context types with a ContextBandit built from our synced engagement
+
+    The bandit is rebuilt whenever the engagement file grows or a post is
+    added to the history. Until BANDIT_MIN_POSTS posts have metrics, choose()
+    returns None and the generator keeps its fixed weights.
+    """
+
+    def __init__(self, history, engagement: EngagementStore, context_types: List[str], min_posts: int = 20):
+        self.history = history
+        self.engagement = engagement
+        self.context_types = list(context_types)
+        self.min_posts = min_posts
+        self.lock = threading.Lock()
+        self._stamp = None
+        self._bandit: Optional[ContextBandit] = None
+        self.logger = logging.getLogger(__name__)
+
+    def bandit(self) -> Optional[ContextBandit]:
+        """Bandit over the current data, or None while there is too little of it"""
+        with self.lock:
+            stamp = (len(self.engagement), self.history.count())
+            if stamp != self._stamp:
+                analytics = EngagementAnalytics(self.engagement.latest(), self.history.recent(limit=None))
+                bandit = ContextBandit(self.context_types, analytics.context_rewards())
+                self._bandit = bandit if bandit.observations >= self.min_posts else None
+                self._stamp = stamp
+                if self._bandit:
+                    self.logger.info(f"Context bandit rebuilt from {bandit.observations} posts with engagement data")
+            return self._bandit
+
+    def choose(self) -> Optional[str]:
+        """Context type for the next post, or None to use the fixed weights"""
+        bandit = self.bandit()
+        return bandit.choose() if bandit else None
@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from bot import TwitterBot
+from content_generator import ContentGenerator
+from log_setup import log_context
+from config import Config
+from timer_scheduler import TimerScheduler
+
+class Account:
+    """A single persona driven by the engine, with its own rate limits"""
+
+    def __init__(self, name: str, bot: TwitterBot, max_concurrent_generations: int = 2,
+                 max_concurrent_posts: int = 1, min_post_interval: float = 60.0):
+        self.name = name
+        self.bot = bot
+        self.generate_slots = asyncio.Semaphore(max_concurrent_generations)
+        self.post_slots = asyncio.Semaphore(max_concurrent_posts)
+        self.min_post_interval = min_post_interval
+        self.last_post_at = None
+
+
+class MultiAccountEngine:
+    """Drive many accounts from a single process with asyncio
+
+    Blocking OpenAI and Twitter calls run on a shared thread pool, so generation
+    and posting for different accounts overlap while each account's semaphores
+    keep it within its own rate limits.
+    """
+
+    def __init__(self, accounts_path: str = None, max_workers: int = None):
+        self.accounts_path = accounts_path or Config.ACCOUNTS_FILE
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.ENGINE_MAX_WORKERS,
+            thread_name_prefix="engine"
+        )
+        self.accounts: Dict[str, Account] = {}
+        self._openai_clients = {}
+        self._stop_event = None
+        self.logger = logging.getLogger(__name__)
+
+    def _read_accounts_file(self) -> list:
+        """Read account entries from the accounts file"""
+        try:
+            with open(self.accounts_path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{self.accounts_path} not found. See accounts.example.json for the format.")
+
+        names = [entry["name"] for entry in entries]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Duplicate account names in {self.accounts_path}")
+        return entries
+
+    def _openai_client(self, api_key: str):
+        """Share one OpenAI client between all accounts using the same key"""
+        if api_key not in self._openai_clients:
+            self._openai_clients[api_key] = ContentGenerator.create_client(Config(OPENAI_API_KEY=api_key))
+        return self._openai_clients[api_key]
+
+    def _build_account(self, entry: dict) -> Account:
+        """Create the bot and limits for one account entry"""
+        name = entry["name"]
+        config = Config.for_account(entry)
+        config.validate_config()
+        history_path = entry.get("history_file", f"accounts/{name}/post_history.db")
+        for path in [history_path] + [getattr(config, var) for var in Config.ACCOUNT_FILES]:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        bot = TwitterBot(
+            config=config,
+            context_path=entry.get("user_context", f"accounts/{name}/user_context.json"),
+            history_path=history_path,
+            name=name,
+            openai_client=self._openai_client(config.OPENAI_API_KEY)
+        )
+        return Account(
+            name,
+            bot,
+            max_concurrent_generations=entry.get("max_concurrent_generations", 2),
+            max_concurrent_posts=entry.get("max_concurrent_posts", 1),
+            min_post_interval=entry.get("min_post_interval", 60.0)
+        )
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on the shared thread pool, keeping the caller's log context"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    async def load(self):
+        """Load all accounts concurrently"""
+        entries = self._read_accounts_file()
+        accounts = await asyncio.gather(
+            *(self._run_blocking(self._build_account, entry) for entry in entries)
+        )
+        self.accounts = {account.name: account for account in accounts}
+        self.logger.info(f"Loaded {len(self.accounts)} accounts: {', '.join(self.accounts)}")
+
+    async def post(self, name: str, context_type: str = None, dry_run: bool = False) -> Optional[dict]:
+        """Generate and post one tweet for an account"""
+        account = self.accounts[name]
+        bot = account.bot
+        try:
+            if not context_type:
+                context_type = bot.content_generator.get_random_context_type()
+
+            with log_context(account=name, context_type=context_type):
+                async with account.generate_slots:
+                    content = await self._run_blocking(bot.generate_content, context_type)
+
+                if not content:
+                    bot.logger.error("Failed to generate content")
+                    return None
+
+                if dry_run:
+                    return {"account": name, "content": content, "dry_run": True}
+
+                async with account.post_slots:
+                    loop = asyncio.get_running_loop()
+                    if account.last_post_at is not None:
+                        wait = account.min_post_interval - (loop.time() - account.last_post_at)
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                    result = await self._run_blocking(bot.post_content, content, context_type)
+                    account.last_post_at = loop.time()
+
+            if result:
+                result = dict(result, account=name)
+            return result
+
+        except Exception as e:
+            bot.logger.error(f"Error posting for {name}: {e}")
+            return None
+
+    async def post_all(self, dry_run: bool = False) -> Dict[str, Optional[dict]]:
+        """Generate and post one tweet for every account concurrently"""
+        names = list(self.accounts)
+        results = await asyncio.gather(*(self.post(name, dry_run=dry_run) for name in names))
+        return dict(zip(names, results))
+
+    async def run_once(self, dry_run: bool = False) -> Dict[str, Optional[dict]]:
+        """Load the accounts and post once for each of them"""
+        if not self.accounts:
+            await self.load()
+        try:
+            return await self.post_all(dry_run=dry_run)
+        finally:
+            self.executor.shutdown(wait=False)
+
+    async def _scheduled_post(self, name: str):
+        """Run one scheduled post for an account and log the outcome"""
+        result = await self.post(name)
+        if result:
+            self.logger.info(f"Scheduled post for {name} successful: {result.get('url', 'N/A')}")
+        else:
+            self.logger.error(f"Scheduled post for {name} failed")
+
+    async def run(self):
+        """Run every account's posting schedule until stop() is called"""
+        if not self.accounts:
+            await self.load()
+
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+
+        # One timer thread for all accounts; due slots hop onto the event loop
+        timer = TimerScheduler(max_workers=1)
+        for name, account in self.accounts.items():
+            config = account.bot.config
+            for time_str in config.POSTING_SCHEDULE.split(','):
+                time_str = time_str.strip()
+                self.logger.info(f"Scheduling daily post for {name} at {time_str}")
+                timer.every_day_at(
+                    lambda name=name: asyncio.run_coroutine_threadsafe(self._scheduled_post(name), loop),
+                    time_str,
+                    tz=config.POSTING_TIMEZONE,
+                    jitter=config.POSTING_JITTER_SECONDS,
+                    tags=(name,),
+                    name=f"post:{name}"
+                )
+        timer.start()
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            timer.stop()
+            self.executor.shutdown(wait=False)
+
+    def stop(self):
+        """Stop a running engine"""
+        if self._stop_event:
+            self._stop_event.set()
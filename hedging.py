@@ -0,0 +1,184 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List
+from metrics import HEDGE_EXTRA_TOKENS, HEDGES
+
+logger = logging.getLogger(__name__)
+
+class ModelTarget:
+    """A model, optionally on another OpenAI-compatible endpoint, written model or model@base_url"""
+
+    def __init__(self, model: str, base_url: str = None):
+        self.model = model
+        self.base_url = base_url
+
+    @classmethod
+    def parse_list(cls, spec: str) -> List["ModelTarget"]:
+        targets = []
+        for entry in spec.split(','):
+            model, _, base_url = entry.strip().partition('@')
+            if model:
+                targets.append(cls(model, base_url or None))
+        return targets
+
+    def __repr__(self):
+        return f"{self.model}@{self.base_url}" if self.base_url else self.model
+
+
+class Attempt:
+    """One of the requests racing for a hedged call
+
+    The request function registers how to hang up (closing its stream)
+    with on_cancel, so a loser is dropped at once even while it is still
+    waiting for its first token, and checks cancelled between streamed
+    chunks. It fills in the tokens it used (or an estimate when it was cut
+    off before the usage chunk) so a losing attempt's cost can be counted.
+    """
+
+    def __init__(self, target: ModelTarget, hedge: bool):
+        self.target = target
+        self.hedge = hedge
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._on_cancel = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Run callback when the attempt is cancelled, straight away if it already is"""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Error hanging up on {self.target}: {e}")
+
+
+class Hedger:
+    """Sends a request to the next model when the current one runs past a deadline
+
+    The primary target always goes first. If it has not produced a valid
+    result within the deadline, the 95th percentile (by default) of its
+    recent latencies, the request also goes to the next target, and so on.
+    The first valid result wins and the others are cancelled. A target that
+    fails outright hands over to the next one straight away. Hedges are
+    rationed by budget, the fraction of calls allowed to send a second
+    request, so a provider-wide slowdown does not double the spend.
+    """
+
+    def __init__(self, targets: List[ModelTarget], percentile: float = 95, initial_delay: float = 8.0,
+                 min_delay: float = 1.0, budget: float = 0.1, max_workers: int = 32, window: int = 200):
+        self.targets = targets
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget = budget
+        self.latencies = deque(maxlen=window)
+        self.tokens = 1.0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def deadline(self) -> float:
+        """Seconds to wait for the primary before hedging"""
+        with self.lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 20:
+            return self.initial_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+
+    def _may_hedge(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def call(self, request: Callable[[Attempt], object], is_valid: Callable[[object], bool] = bool):
+        """Race request(attempt) across the targets, returning the first valid result
+
+        If no attempt produces a valid result, the last result is returned,
+        or the last error raised.
+        """
+        with self.lock:
+            self.tokens = min(5.0, self.tokens + self.budget)
+        deadline = self.deadline()
+        futures = {}
+        result, error = None, None
+
+        def launch(hedge: bool):
+            attempt = Attempt(self.targets[len(futures)], hedge)
+            futures[self.executor.submit(contextvars.copy_context().run, request, attempt)] = attempt
+
+        launch(hedge=False)
+        pending = set(futures)
+        while pending or len(futures) < len(self.targets):
+            if not pending:
+                HEDGES.inc(event="failover")
+                logger.warning(f"{self.targets[len(futures) - 1]} gave no usable answer, "
+                               f"trying {self.targets[len(futures)]}")
+                launch(hedge=True)
+                pending = {future for future in futures if not future.done()}
+                continue
+            can_hedge = len(futures) < len(self.targets)
+            done, pending = wait(pending, timeout=deadline if can_hedge else None, return_when=FIRST_COMPLETED)
+            if not done:
+                if self._may_hedge():
+                    HEDGES.inc(event="fired")
+                    logger.info(f"No answer from {self.targets[len(futures) - 1]} after {deadline:.1f}s, "
+                                f"hedging with {self.targets[len(futures)]}")
+                    launch(hedge=True)
+                    pending = {future for future in futures if not future.done()}
+                else:
+                    HEDGES.inc(event="over_budget")
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    deadline = None
+                if not done:
+                    continue
+            for future in done:
+                attempt = futures[future]
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                if error is None and is_valid(result):
+                    self._finish(futures, attempt)
+                    return result
+        if error is not None:
+            raise error
+        return result
+
+    def _finish(self, futures: dict, winner: Attempt):
+        """Cancel the losing attempts and account for the call"""
+        elapsed = time.perf_counter() - winner.started
+        primary = next(attempt for attempt in futures.values() if not attempt.hedge)
+        with self.lock:
+            # A cancelled primary took at least this long, which keeps the deadline honest
+            self.latencies.append(time.perf_counter() - primary.started)
+        if len(futures) > 1:
+            HEDGES.inc(event="hedge_won" if winner.hedge else "primary_won")
+            logger.info(f"{winner.target} answered first after {elapsed:.1f}s of {len(futures)} attempts")
+        for future, attempt in futures.items():
+            if attempt is winner:
+                continue
+            attempt.cancel()
+            future.add_done_callback(lambda _, attempt=attempt: self._count_waste(attempt))
+
+    @staticmethod
+    def _count_waste(attempt: Attempt):
+        HEDGE_EXTRA_TOKENS.inc(attempt.prompt_tokens, kind="prompt")
+        HEDGE_EXTRA_TOKENS.inc(attempt.completion_tokens, kind="completion")
@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+class PostHistoryStore:
+    """Append-only post history backed by SQLite in WAL mode
+
+    Every post is one INSERT, so appends cost the same no matter how long the
+    history is, and several processes can write to the same file safely.
+    Indexes on timestamp and context_type keep history queries fast.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tweet_id TEXT UNIQUE,
+            url TEXT,
+            context_type TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_posts_context_type ON posts (context_type, timestamp);
+        CREATE TABLE IF NOT EXISTS signatures (
+            post_id INTEGER PRIMARY KEY REFERENCES posts (id),
+            signature BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    COLUMNS = ["timestamp", "content", "tweet_id", "url", "context_type"]
+
+    def __init__(self, path: str = 'post_history.db', legacy_path: str = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+        if legacy_path is None:
+            # The JSON file this database replaced, named after it so accounts sharing a directory import only their own
+            legacy_path = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(legacy_path):
+            self.migrate_json(legacy_path)
+
+    def append(self, entry: dict):
+        """Append one post entry"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO posts (timestamp, content, tweet_id, url, context_type) "
+                "VALUES (:timestamp, :content, :tweet_id, :url, :context_type)",
+                {column: entry.get(column) for column in self.COLUMNS}
+            )
+
+    def recent(self, limit: Optional[int] = 10, context_type: str = None,
+               since: str = None, until: str = None) -> List[dict]:
+        """Most recent posts matching the filters, oldest first
+
+        ``since`` and ``until`` are ISO timestamps (or dates) bounding the
+        post time; ``until`` is exclusive.
+        """
+        clauses, params = [], []
+        if context_type:
+            clauses.append("context_type = ?")
+            params.append(context_type)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(self._normalize_time(since))
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(self._normalize_time(until))
+
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM posts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def count(self) -> int:
+        """Total number of stored posts"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def signature_rows(self, version: str) -> List[tuple]:
+        """(post_id, tweet_id, content, signature) of every post, oldest first
+
+        Signatures cached under a different version are discarded, so rows
+        come back with a None signature until save_signatures() refills them.
+        """
+        key = "signature_version"
+        with self.lock, self.conn:
+            stored = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            if not stored or stored[0] != version:
+                self.conn.execute("DELETE FROM signatures")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, version))
+            return self.conn.execute(
+                "SELECT p.id, p.tweet_id, p.content, s.signature FROM posts p "
+                "LEFT JOIN signatures s ON s.post_id = p.id ORDER BY p.id"
+            ).fetchall()
+
+    def save_signatures(self, rows: List[tuple]):
+        """Cache (post_id, signature) pairs for the duplicate index"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO signatures (post_id, signature) VALUES (?, ?)",
+                rows
+            )
+
+    def migrate_json(self, legacy_path: str) -> int:
+        """Import a post_history.json file once, returning the number of posts added"""
+        key = f"migrated:{os.path.abspath(legacy_path)}"
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+
+        with open(legacy_path, 'r') as f:
+            history = json.load(f)
+
+        rows = [{column: entry.get(column) for column in self.COLUMNS} for entry in history]
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO posts (timestamp, content, tweet_id, url, context_type) "
+                "VALUES (:timestamp, :content, :tweet_id, :url, :context_type)",
+                rows
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (key, datetime.now().isoformat())
+            )
+        return added
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def _normalize_time(value: str) -> str:
+        """Bring a date or datetime string into the stored ISO format"""
+        return datetime.fromisoformat(value).isoformat()
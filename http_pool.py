@@ -0,0 +1,82 @@
+import importlib.util
+import logging
+import socket
+import threading
+
+# Process-wide connection pools, so every account's OpenAI and Twitter
+# clients reuse the same kept-alive connections instead of each opening
+# their own
+
+_default_lock = threading.Lock()
+_openai_http_client = None
+_twitter_adapter = None
+
+logger = logging.getLogger(__name__)
+
+def openai_http_library():
+    """The HTTP library the installed OpenAI SDK is built on (httpx, or httpx2 in newer releases)
+
+    DefaultHttpxClient subclasses that library's Client, so its module is the
+    one to build Limits from, whichever package name it ships under.
+    """
+    from openai import DefaultHttpxClient
+    return importlib.import_module(DefaultHttpxClient.__mro__[1].__module__.partition('.')[0])
+
+def openai_http_client(config):
+    """Shared HTTP client behind every OpenAI client, over HTTP/2 when h2 is installed
+
+    Returns None, so that each OpenAI client falls back to the SDK's own
+    default client, if the shared one cannot be built.
+    """
+    global _openai_http_client
+    with _default_lock:
+        if _openai_http_client is None:
+            try:
+                from openai import DefaultHttpxClient
+                http = openai_http_library()
+                http2 = config.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+                if config.HTTP2_ENABLED and not http2:
+                    logger.info("HTTP/2 to OpenAI needs the h2 package (pip install h2), using HTTP/1.1")
+                _openai_http_client = DefaultHttpxClient(
+                    http2=http2,
+                    limits=http.Limits(
+                        max_connections=config.HTTP_POOL_SIZE,
+                        max_keepalive_connections=config.HTTP_POOL_SIZE,
+                        keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS
+                    )
+                )
+            except Exception as e:
+                logger.warning(f"Shared OpenAI connection pool unavailable, using the SDK's default client: {e}")
+                _openai_http_client = False
+        return _openai_http_client or None
+
+def hang_up(response):
+    """Close a streaming response from another thread, waking a read that is blocked on it
+
+    Closing alone waits for the next byte, which can be the whole
+    OPENAI_TIMEOUT before a slow first token, so an HTTP/1.1 connection is
+    shut down first. An HTTP/2 connection carries other streams and is only
+    closed.
+    """
+    if response.http_version.startswith("HTTP/1"):
+        network_stream = response.extensions.get("network_stream")
+        sock = network_stream.get_extra_info("socket") if network_stream else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    response.close()
+
+def twitter_adapter(config):
+    """Shared requests adapter, and so connection pool, mounted on every tweepy session
+
+    The Twitter API only speaks HTTP/1.1 to requests, so this keeps up to
+    HTTP_POOL_SIZE connections per host alive between calls.
+    """
+    global _twitter_adapter
+    with _default_lock:
+        if _twitter_adapter is None:
+            from requests.adapters import HTTPAdapter
+            _twitter_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE, max_retries=0)
+        return _twitter_adapter
@@ -0,0 +1,213 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+# Kind of the jobs BotScheduler enqueues for each posting slot
+POST_JOB = "post"
+# Account of jobs whose payload names none, e.g. from a single-account scheduler
+DEFAULT_ACCOUNT = "default"
+# SQL for a job's account, for claim() and next_run_at() to filter on
+ACCOUNT_SQL = f"COALESCE(json_extract(payload, '$.account'), '{DEFAULT_ACCOUNT}')"
+
+class Job:
+    """A leased job; payload is a dict and may carry a checkpoint from an earlier attempt"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = json.loads(row["payload"])
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.lease_until = row["lease_until"]
+        self.checkpoint = json.loads(row["checkpoint"]) if row["checkpoint"] else None
+
+    def __repr__(self):
+        return f"Job({self.id} {self.kind}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class JobQueue:
+    """Durable job queue shared by any number of worker processes
+
+    Backed by SQLite in WAL mode, so every process on the machine can open the
+    same file. A worker claims a job with a lease; while the lease runs no
+    other worker can take it, and completions from a worker whose lease has
+    lapsed are refused. Jobs whose worker crashed become claimable again once
+    their lease expires. An optional dedupe key makes enqueueing idempotent,
+    so several schedulers (e.g. a hot standby) can enqueue the same slot and
+    it still runs once. Jobs carry the account they post for in their
+    payload, and a worker given an account only claims that account's jobs.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            run_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            leased_by TEXT,
+            lease_until REAL,
+            checkpoint TEXT,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_at);
+    """
+
+    def __init__(self, path: str = 'jobs.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        # Autocommit mode, so claim() can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def worker_id() -> str:
+        """Identifier for a worker, unique across processes and machines"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _transaction(self):
+        return _Transaction(self)
+
+    def enqueue(self, kind: str, payload: dict = None, run_at: float = None,
+                dedupe_key: str = None, max_attempts: int = 3) -> Optional[int]:
+        """Add a job, returning its id, or None if a job with dedupe_key already exists"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, run_at, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload or {}), dedupe_key, run_at or now, max_attempts, now, now)
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, worker_id: str, lease_seconds: float = 300, kinds=None, account: str = None) -> Optional[Job]:
+        """Lease the next due job, or a job whose previous lease expired
+
+        With account, only that account's jobs are considered. Jobs that have
+        used up their attempts are marked failed instead of being handed out
+        again.
+        """
+        now = time.time()
+        kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+        account_filter = f" AND {ACCOUNT_SQL} = ?" if account else ""
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE ((status = 'queued' AND run_at <= ?) "
+                    "OR (status = 'leased' AND lease_until < ?))" + kind_filter + account_filter +
+                    " ORDER BY run_at, id LIMIT 1",
+                    (now, now, *(kinds or ()), *((account,) if account else ()))
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), "
+                        "leased_by = NULL, updated_at = ? WHERE id = ?",
+                        (now, row["id"])
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', leased_by = ?, lease_until = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row["id"])
+                )
+                return Job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _update_leased(self, job_id: int, worker_id: str, assignments: str, params: tuple) -> bool:
+        """Apply an update only while worker_id still holds the job's lease"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND leased_by = ? AND lease_until >= ?",
+                (*params, time.time(), job_id, worker_id, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def extend(self, job_id: int, worker_id: str, lease_seconds: float = 300) -> bool:
+        """Renew a lease; False means it was lost and the job may run elsewhere"""
+        return self._update_leased(job_id, worker_id, "lease_until = ?", (time.time() + lease_seconds,))
+
+    def save_checkpoint(self, job_id: int, worker_id: str, checkpoint: dict) -> bool:
+        """Record progress (e.g. the generated text) that a retry should resume from"""
+        return self._update_leased(job_id, worker_id, "checkpoint = ?", (json.dumps(checkpoint),))
+
+    def complete(self, job_id: int, worker_id: str, result: dict = None) -> bool:
+        """Mark a leased job done"""
+        return self._update_leased(
+            job_id, worker_id, "status = 'done', leased_by = NULL, result = ?", (json.dumps(result),)
+        )
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float = 60) -> bool:
+        """Give a job back for a later retry, or mark it failed once its attempts are used up"""
+        return self._update_leased(
+            job_id, worker_id,
+            "status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "leased_by = NULL, run_at = ?, error = ?",
+            (time.time() + retry_delay, error)
+        )
+
+    def next_run_at(self, account: str = None) -> Optional[float]:
+        """Earliest time a queued or leased job (of account, if given) becomes claimable"""
+        account_filter = f" AND {ACCOUNT_SQL} = ?" if account else ""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(CASE status WHEN 'queued' THEN run_at ELSE lease_until END) "
+                "FROM jobs WHERE status IN ('queued', 'leased')" + account_filter,
+                (account,) if account else ()
+            ).fetchone()
+        return row[0]
+
+    def stats(self) -> dict:
+        """Number of jobs in each status"""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT under the queue's lock, rolled back on error"""
+
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.queue.lock.acquire()
+        self.queue.conn.execute("BEGIN IMMEDIATE")
+        return self.queue.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.queue.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.queue.lock.release()
+
+
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+def get_job_queue(config) -> JobQueue:
+    """Process-wide job queue at the config's JOB_QUEUE_FILE, one per file"""
+    with _queues_lock:
+        if config.JOB_QUEUE_FILE not in _queues:
+            _queues[config.JOB_QUEUE_FILE] = JobQueue(config.JOB_QUEUE_FILE)
+        return _queues[config.JOB_QUEUE_FILE]
@@ -0,0 +1,163 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Structured fields a record may carry, set with log_context() or extra={...}
+CONTEXT_FIELDS = ("account", "context_type", "tweet_id", "latency_ms", "job_id")
+
+_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields such as account and context_type to every record logged inside the block"""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log_context() fields onto each record before it is queued"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the structured fields when present"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps a record's traceback apart from its message
+
+    The stock prepare() folds the formatted traceback into msg and drops
+    exc_info, so JsonFormatter could only ever see it inside the message.
+    This keeps the traceback, already formatted, in exc_text, which the
+    text formatter appends and JsonFormatter emits as its exception field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """Rotates the log once it reaches max_bytes or is interval seconds old
+
+    Backups are numbered like RotatingFileHandler's (bot.log.1 is the newest)
+    and at most backup_count are kept.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, interval: float = 0, backup_count: int = 5):
+        super().__init__(filename, 'a', encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        started = os.path.getmtime(filename) if os.path.exists(filename) else time.time()
+        self.rollover_at = started + interval if interval else None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return os.path.exists(self.baseFilename)
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = self.rotation_filename(f"{self.baseFilename}.{i}")
+                if os.path.exists(source):
+                    os.replace(source, self.rotation_filename(f"{self.baseFilename}.{i + 1}"))
+            self.rotate(self.baseFilename, self.rotation_filename(f"{self.baseFilename}.1"))
+        else:
+            open(self.baseFilename, 'w').close()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+def setup_logging(config=None):
+    """Route every logger through a queue to the rotating log file and the console
+
+    Callers only put records on an in-memory queue; a listener thread does
+    the formatting and disk I/O. Like logging.basicConfig this does nothing
+    when the root logger already has handlers, so embedding applications
+    keep their own configuration.
+    """
+    global _listener
+    from config import Config
+    config = config or Config
+
+    with _setup_lock:
+        root = logging.getLogger()
+        if _listener is not None or root.handlers:
+            return
+
+        file_handler = SizeAndTimeRotatingFileHandler(
+            config.LOG_FILE,
+            max_bytes=config.LOG_MAX_BYTES,
+            interval=config.LOG_ROTATE_HOURS * 3600,
+            backup_count=config.LOG_BACKUP_COUNT
+        )
+        file_handler.setFormatter(
+            JsonFormatter() if config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+        )
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        records = queue.SimpleQueue()
+        queue_handler = TracebackQueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+        root.addHandler(queue_handler)
+        root.setLevel(config.LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(records, file_handler, console_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
@@ -7,32 +7,84 @@ This script provides a command-line interface to:
 2. Generate and post content manually
 3. Start the automatic scheduler
 4. View posting history
+5. Run many accounts from one process
+6. Sync our own timeline and engagement metrics
+7. Inspect the completion cache used by dry runs and tests
+8. Run queued scheduled posts as one of many worker processes
+9. Break down engagement by context type, posting hour and hashtag
+10. Reply to mentions of the account
+11. Simulate weeks of scheduled posting on a virtual clock
 """
 
 import argparse
 import sys
 import signal
 import time
-from bot import TwitterBot
-from scheduler import BotScheduler
+
+# Commands import what they need lazily so that e.g. `history` never loads
+# the OpenAI or Twitter SDKs
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     print("\nShutting down...")
     sys.exit(0)
 
+def positive_int(value: str) -> int:
+    """argparse type for counts of at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 def main():
     parser = argparse.ArgumentParser(description="Twitter Bot for automated posting")
-    parser.add_argument('command', choices=['test', 'post', 'schedule', 'history'], 
+    parser.add_argument('command', choices=['test', 'post', 'schedule', 'worker', 'history', 'analytics', 'engine', 'sync', 'cache', 'mentions', 'simulate'], 
                        help='Command to execute')
     parser.add_argument('--context', choices=['general', 'project', 'thought', 'tip', 'question', 'sf_scene', 'student_perspective', 'building_moment'],
-                       help='Context type for post generation')
+                       help='Context type for post generation (or history filter)')
     parser.add_argument('--dry-run', action='store_true',
                        help='Generate content without posting to Twitter')
+    parser.add_argument('--count', type=positive_int, default=1,
+                       help='Number of tweets to generate (and post) with the post command')
+    parser.add_argument('--concurrency', type=int, default=None,
+                       help='Drafts generated at the same time with --count (default: BATCH_CONCURRENCY)')
+    parser.add_argument('--output',
+                       help='With --count, write the results to this JSONL file instead of stdout')
+    parser.add_argument('--media', action='append', default=[],
+                       help='With the post command, an image or video to attach (repeatable, up to 4)')
     parser.add_argument('--limit', type=int, default=10,
                        help='Number of history entries to show')
+    parser.add_argument('--since',
+                       help='Only show history from this date/time on (ISO format)')
+    parser.add_argument('--until',
+                       help='Only show history before this date/time (ISO format)')
+    parser.add_argument('--by', choices=['context', 'hour', 'hashtag'], action='append',
+                       help='With the analytics command, the breakdowns to show (default: all)')
+    parser.add_argument('--accounts', default=None,
+                       help='Accounts file for the engine command (default: ACCOUNTS_FILE)')
+    parser.add_argument('--once', action='store_true',
+                       help='Post once for every account instead of running the schedule, or answer one batch of mentions')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always call OpenAI, even for dry runs and connection tests')
+    parser.add_argument('--clear', action='store_true',
+                       help='With the cache command, drop every cached completion')
+    parser.add_argument('--days', type=float, default=30,
+                       help='With the simulate command, days of schedule to simulate')
+    parser.add_argument('--slots', type=int, default=0,
+                       help='With the simulate command, replace POSTING_SCHEDULE with this many slots a day')
+    parser.add_argument('--quota', type=int, default=0,
+                       help='With the simulate command, tweets allowed per 24 hours (0 = unlimited)')
+    parser.add_argument('--outage', action='append', default=[],
+                       help='With the simulate command, an outage as openai|twitter:START/HOURS (repeatable)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='With the simulate command, seed for every random choice')
     
     args = parser.parse_args()
+    if args.command == 'post' and args.media and (args.count > 1 or args.output):
+        parser.error("--media attaches files to a single post and cannot be combined with --count or --output")
+    
+    from log_setup import setup_logging
+    setup_logging()
     
     # Setup signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
@@ -40,16 +92,48 @@ def main():
     try:
         if args.command == 'test':
             print("Testing bot connections...")
+            from bot import TwitterBot
             bot = TwitterBot()
+            if args.no_cache:
+                bot.config.RESPONSE_CACHE_ENABLED = False
             success = bot.test_connection()
             print("✅ All connections working!" if success else "❌ Connection test failed")
             
+        elif args.command == 'post' and (args.count > 1 or args.output):
+            import json
+            from bot import TwitterBot
+            from metrics import start_exporters
+            bot = TwitterBot()
+            if args.no_cache:
+                bot.config.RESPONSE_CACHE_ENABLED = False
+            start_exporters(bot.config)
+            output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+            succeeded = 0
+            try:
+                for record in bot.generate_batch(args.count, context_type=args.context,
+                                                 dry_run=args.dry_run, concurrency=args.concurrency):
+                    succeeded += "error" not in record
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+            finally:
+                if args.output:
+                    output.close()
+            verb = "Generated" if args.dry_run else "Posted"
+            print(f"{'✅' if succeeded == args.count else '❌'} {verb} {succeeded} of {args.count} tweets",
+                  file=sys.stderr if not args.output else sys.stdout)
+            
         elif args.command == 'post':
             print("Generating and posting content...")
+            from bot import TwitterBot
+            from metrics import start_exporters
             bot = TwitterBot()
+            if args.no_cache:
+                bot.config.RESPONSE_CACHE_ENABLED = False
+            start_exporters(bot.config)
             result = bot.generate_and_post(
                 context_type=args.context,
-                dry_run=args.dry_run
+                dry_run=args.dry_run,
+                media=args.media
             )
             
             if result:
@@ -63,7 +147,10 @@ def main():
                 
         elif args.command == 'schedule':
             print("Starting automated scheduler...")
+            from scheduler import BotScheduler
+            from metrics import start_exporters
             scheduler = BotScheduler()
+            start_exporters(scheduler.config)
             
             # Test connection first
             if not scheduler.bot.test_connection():
@@ -74,6 +161,8 @@ def main():
             
             print("\n🤖 Bot is now running automatically!")
             print("Scheduled times:", scheduler.config.POSTING_SCHEDULE)
+            if scheduler.queue:
+                print("Enqueueing posts for workers in:", scheduler.queue.path)
             print("Next run:", scheduler.next_run_time())
             print("\nPress Ctrl+C to stop...")
             
@@ -84,10 +173,167 @@ def main():
                 scheduler.stop()
                 print("\nBot stopped.")
                 
+        elif args.command == 'worker':
+            from bot import TwitterBot
+            from job_queue import get_job_queue
+            from metrics import start_exporters
+            from worker import QueueWorker
+            bot = TwitterBot()
+            start_exporters(bot.config)
+            worker = QueueWorker(bot, get_job_queue(bot.config))
+            print(f"Worker {worker.worker_id} waiting for jobs in {worker.queue.path}...")
+            print("\nPress Ctrl+C to stop...")
+            try:
+                worker.run()
+            except KeyboardInterrupt:
+                worker.stop()
+                print("\nWorker stopped.")
+            
+        elif args.command == 'mentions':
+            from bot import TwitterBot
+            from mentions import MentionResponder
+            from metrics import start_exporters
+            bot = TwitterBot()
+            start_exporters(bot.config)
+            responder = MentionResponder(bot)
+            
+            if args.once or args.dry_run:
+                for result in responder.run_once(dry_run=args.dry_run):
+                    mention = f"@{result['username']} ({result['mention_id']})"
+                    if not result["reply"]:
+                        print(f"❌ {mention}: no reply")
+                    elif args.dry_run:
+                        print(f"{mention}: {result['reply']}")
+                    elif result.get("url"):
+                        print(f"✅ {mention}: {result['url']} after {result['latency']:.0f}s")
+                    else:
+                        print(f"❌ {mention}: failed to post the reply")
+                stats = responder.store.stats()
+                print(f"\n{stats['pending']} mentions pending, {stats['replied']} replied")
+                return
+            
+            print(f"Answering mentions (target {responder.latency_target:.0f}s from mention to reply)...")
+            print("\nPress Ctrl+C to stop...")
+            try:
+                responder.run()
+            except KeyboardInterrupt:
+                responder.stop()
+                print("\nResponder stopped.")
+            
+        elif args.command == 'simulate':
+            from config import Config
+            from simulation import Outage, Simulation
+            from zoneinfo import ZoneInfo
+            config = Config()
+            tz = ZoneInfo(config.POSTING_TIMEZONE) if config.POSTING_TIMEZONE else None
+            simulation = Simulation(
+                config, days=args.days, slots=args.slots, quota=args.quota, seed=args.seed,
+                outages=[Outage.parse(spec, tz) for spec in args.outage]
+            )
+            print(f"Simulating {args.days:g} days from {simulation.start:%Y-%m-%d}...")
+            report = simulation.run()
+            
+            print(f"\nSchedule: {report['schedule']}")
+            print(f"Slots: {report['slots']}, posted {report['posted']}, missed {report['slots'] - report['posted']}")
+            for cause, count in sorted(report['missed'].items()):
+                print(f"  {cause}: {count}")
+            print(f"Slot to tweet: p50 {report['latency_p50']:.1f}s, p95 {report['latency_p95']:.1f}s, "
+                  f"p99 {report['latency_p99']:.1f}s, max {report['latency_max']:.1f}s")
+            if report['queued_slots']:
+                print(f"Waited for a free worker: {report['queued_slots']} slots, up to {report['queued_max']:.1f}s")
+            quota = f"{report['quota']} per {report['quota_window_hours']:g}h" if report['quota'] else "unlimited"
+            print(f"Quota ({quota}): {report['tweets']} tweets, peak {report['quota_peak']} in one window, "
+                  f"{report['quota_exhausted_windows']} windows used up, {report['rate_limited']} posts rate limited")
+            print(f"OpenAI: {report['openai_requests']} requests, {report['openai_failures']} failed")
+            print(f"\nSimulated in {report['wall_seconds']:.2f}s ({report['speedup']:,.0f}x real time)")
+            
+        elif args.command == 'engine':
+            import asyncio
+            from config import Config
+            from engine import MultiAccountEngine
+            from metrics import start_exporters
+            engine = MultiAccountEngine(args.accounts)
+            start_exporters(Config())
+            
+            if args.once:
+                print("Generating and posting content for all accounts...")
+                results = asyncio.run(engine.run_once(dry_run=args.dry_run))
+                for name, result in results.items():
+                    if not result:
+                        print(f"❌ {name}: failed to generate or post content")
+                    elif args.dry_run:
+                        print(f"{name}: {result['content']}")
+                    else:
+                        print(f"✅ {name}: {result.get('url', 'N/A')}")
+                return
+            
+            print("Starting multi-account engine...")
+            print("\nPress Ctrl+C to stop...")
+            try:
+                asyncio.run(engine.run())
+            except KeyboardInterrupt:
+                engine.stop()
+                print("\nEngine stopped.")
+                
+        elif args.command == 'sync':
+            print("Syncing timeline...")
+            from config import Config
+            from engagement import EngagementStore
+            from timeline_store import TimelineStore
+            from twitter_client import TwitterClient
+            config = Config()
+            config.validate_config()
+            store = TimelineStore(config.TIMELINE_DB_FILE)
+            stats = TwitterClient(config).sync_timeline(store, engagement=EngagementStore(config.ENGAGEMENT_FILE))
+            print(f"✅ {stats['new']} new tweets, {stats['refreshed']} refreshed "
+                  f"in {stats['requests']} requests ({store.count()} stored)")
+            
+        elif args.command == 'cache':
+            from config import Config
+            from response_cache import ResponseCache
+            cache = ResponseCache(Config.RESPONSE_CACHE_FILE)
+            if args.clear:
+                cache.clear()
+                print("Response cache cleared")
+                return
+            stats = cache.stats()
+            print(f"Response cache: {stats['entries']} entries, {stats['hits']} hits, "
+                  f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+            
+        elif args.command == 'analytics':
+            from config import Config
+            from engagement import ContextBandit, EngagementAnalytics, EngagementStore
+            from history_store import PostHistoryStore
+            start = time.perf_counter()
+            engagement = EngagementStore(Config.ENGAGEMENT_FILE)
+            analytics = EngagementAnalytics(engagement.latest(), PostHistoryStore().recent(limit=None))
+            print(f"{len(analytics)} posts with engagement data from {len(engagement)} snapshots "
+                  f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+            if not len(analytics):
+                print("Run `python main.py sync` to collect engagement metrics.")
+                return
+            
+            for dimension in args.by or EngagementAnalytics.DIMENSIONS:
+                print(f"\n{dimension:<24} {'posts':>7} {'mean eng.':>10} {'likes':>8} {'retweets':>9}")
+                for row in analytics.by(dimension)[:args.limit]:
+                    print(f"{str(row['key']):<24} {row['posts']:>7} {row['mean_engagement']:>10.1f} "
+                          f"{row['likes']:>8} {row['retweets']:>9}")
+            
+            from content_generator import ContentGenerator
+            bandit = ContextBandit(ContentGenerator.CONTEXT_TYPES, analytics.context_rewards())
+            print(f"\nBandit selection odds ({bandit.observations} posts):")
+            for context_type, odds in sorted(bandit.probabilities().items(), key=lambda item: -item[1]):
+                print(f"  {context_type:<22} {odds:>6.1%}")
+            
         elif args.command == 'history':
             print(f"Showing last {args.limit} posts...")
-            bot = TwitterBot()
-            history = bot.get_post_history(args.limit)
+            from history_store import PostHistoryStore
+            history = PostHistoryStore().recent(
+                args.limit,
+                context_type=args.context,
+                since=args.since,
+                until=args.until
+            )
             
             if not history:
                 print("No posting history found.")
@@ -0,0 +1,299 @@
+import hashlib
+import logging
+import mimetypes
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional
+from metrics import FAILURES, REGISTRY, STAGE_SECONDS
+from resilience import call_with_retries
+
+MEDIA_UPLOADS = REGISTRY.counter(
+    "bot_media_uploads_total",
+    "Media attachments uploaded, or found in the media cache",
+    ("result",)
+)
+MEDIA_UPLOAD_BYTES = REGISTRY.counter(
+    "bot_media_upload_bytes_total",
+    "Media bytes sent in APPEND requests"
+)
+
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """Media ids already uploaded, keyed by the account and the SHA-256 of the file
+
+    Twitter keeps an uploaded media id usable for expires_after_secs, so the
+    same chart or screenshot attached again within that time is not sent
+    again. Entries are dropped a margin before Twitter forgets them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media (
+            account TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            media_id TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            uploaded_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (account, sha256)
+        );
+    """
+
+    def __init__(self, path: str = 'media_cache.db', margin: float = 600):
+        self.path = path
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def get(self, account: str, sha256: str) -> Optional[str]:
+        """Media id of an earlier upload that is still usable, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT media_id FROM media WHERE account = ? AND sha256 = ? AND expires_at > ?",
+                (account, sha256, time.time() + self.margin)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, account: str, sha256: str, media_id: str, size: int, expires_after: float):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO media (account, sha256, media_id, size, uploaded_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (account, sha256, media_id, size, now, now + expires_after)
+            )
+            self.conn.execute("DELETE FROM media WHERE expires_at <= ?", (now,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Segment:
+    """Multipart body of one APPEND request, reading its chunk straight out of the mapped file
+
+    requests sends anything with read() and a length as-is, so the chunk
+    goes from the page cache to the socket in blocks without first being
+    copied into a multipart body of its own.
+    """
+
+    def __init__(self, fields: dict, chunk: memoryview):
+        boundary = uuid.uuid4().hex
+        head = "".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        )
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="media"; filename="blob"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n')
+        self.parts = [memoryview(head.encode()), chunk, memoryview(f"\r\n--{boundary}--\r\n".encode())]
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.size = sum(part.nbytes for part in self.parts)
+        self.part = 0
+        self.offset = 0
+
+    def __len__(self):
+        return self.size
+
+    def seek(self, offset: int):
+        """Rewind before a request is sent again after a retry or a 429"""
+        if offset:
+            raise ValueError("a segment can only be rewound to the start")
+        self.part = 0
+        self.offset = 0
+
+    def read(self, size: int = -1) -> memoryview:
+        while self.part < len(self.parts):
+            part = self.parts[self.part]
+            if self.offset < part.nbytes:
+                end = part.nbytes if size is None or size < 0 else min(part.nbytes, self.offset + size)
+                block = part[self.offset:end]
+                self.offset = end
+                return block
+            self.part += 1
+            self.offset = 0
+        return b""
+
+    def release(self):
+        for part in self.parts:
+            part.release()
+
+
+class MediaUploader:
+    """Uploads media with the chunked INIT/APPEND/FINALIZE flow of the v2 media endpoint
+
+    Files are memory-mapped, hashed in place and sent in chunk_size slices
+    of the mapping, so a large screenshot is never read into memory whole.
+    The APPEND requests of a file, and the files of a tweet, are sent in
+    parallel, which keeps the connection busy instead of waiting out one
+    round trip per chunk. Each request goes through the account's
+    rate-limit dispatcher and the usual retries.
+    """
+
+    UPLOAD_URL = "https://api.twitter.com/2/media/upload"
+    MAX_ATTACHMENTS = 4
+    PROCESSING_TIMEOUT = 300  # Seconds to wait for video and GIF processing
+
+    def __init__(self, twitter_client, cache: MediaCache = None, chunk_size: int = None, concurrency: int = None):
+        config = twitter_client.config
+        self.twitter_client = twitter_client
+        self.cache = cache or MediaCache(config.MEDIA_CACHE_FILE)
+        self.chunk_size = chunk_size or config.MEDIA_CHUNK_SIZE
+        self.concurrency = max(1, concurrency or config.MEDIA_UPLOAD_CONCURRENCY)
+        # Files and chunks get pools of their own, so a file never waits on its own chunks for a thread
+        self.files = ThreadPoolExecutor(max_workers=self.MAX_ATTACHMENTS, thread_name_prefix="media")
+        self.chunks = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="media-append")
+
+    def upload_all(self, paths: List[str]) -> List[str]:
+        """Upload a tweet's attachments in parallel, returning their media ids in order"""
+        if len(paths) > self.MAX_ATTACHMENTS:
+            raise ValueError(f"A tweet takes at most {self.MAX_ATTACHMENTS} attachments, got {len(paths)}")
+        self.twitter_client.client  # authenticate once, not from every file's thread
+        with STAGE_SECONDS.time(stage="media_upload"):
+            return list(self.files.map(self.upload, paths))
+
+    def upload(self, path: str) -> str:
+        """Upload one file, or reuse the media id of an identical earlier upload"""
+        size = os.path.getsize(path)
+        if not size:
+            raise ValueError(f"{path} is empty")
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        account = self.twitter_client.rate_limit_key
+        self.twitter_client.client  # authenticate before any request is queued
+
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        try:
+            sha256 = hashlib.sha256(view).hexdigest()
+            media_id = self.cache.get(account, sha256)
+            if media_id:
+                MEDIA_UPLOADS.inc(result="cached")
+                logger.info(f"Reusing media {media_id} for {os.path.basename(path)}")
+                return media_id
+
+            start = time.perf_counter()
+            media_id = self._init(media_type, size)
+            offsets = range(0, size, self.chunk_size)
+            futures = [
+                self.chunks.submit(self._append, media_id, index, view[offset:offset + self.chunk_size])
+                for index, offset in enumerate(offsets)
+            ]
+            # Let every chunk finish or fail before the mapping goes away
+            wait(futures)
+            for future in futures:
+                future.result()
+            info = self._finalize(media_id)
+        except Exception as e:
+            FAILURES.inc(stage="media_upload", cause=type(e).__name__)
+            raise
+        finally:
+            view.release()
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # a traceback still holds a slice; the mapping closes once that is collected
+
+        MEDIA_UPLOADS.inc(result="uploaded")
+        self.cache.put(account, sha256, media_id, size, info.get("expires_after_secs", 86400))
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Uploaded {os.path.basename(path)} as media {media_id}: {size / 1e6:.1f} MB in "
+            f"{len(offsets)} chunks, {size / 1e6 / max(elapsed, 1e-6):.1f} MB/s"
+        )
+        return media_id
+
+    @staticmethod
+    def media_category(media_type: str) -> str:
+        if media_type == "image/gif":
+            return "tweet_gif"
+        if media_type.startswith("video/"):
+            return "tweet_video"
+        return "tweet_image"
+
+    def _init(self, media_type: str, size: int) -> str:
+        data = self._request("POST", data={
+            "command": "INIT",
+            "media_type": media_type,
+            "total_bytes": str(size),
+            "media_category": self.media_category(media_type)
+        })
+        return str(data["id"])
+
+    def _append(self, media_id: str, index: int, chunk: memoryview):
+        segment = _Segment({"command": "APPEND", "media_id": media_id, "segment_index": index}, chunk)
+        try:
+            self._request("POST", data=segment, headers={"Content-Type": segment.content_type})
+            MEDIA_UPLOAD_BYTES.inc(chunk.nbytes)
+        finally:
+            segment.release()
+            chunk.release()
+
+    def _finalize(self, media_id: str) -> dict:
+        """Finish an upload, waiting for Twitter to process video and GIFs"""
+        info = self._request("POST", data={"command": "FINALIZE", "media_id": media_id})
+        deadline = time.time() + self.PROCESSING_TIMEOUT
+        while True:
+            processing = info.get("processing_info") or {}
+            state = processing.get("state", "succeeded")
+            if state == "succeeded":
+                return info
+            if state == "failed":
+                error = processing.get("error") or {}
+                raise RuntimeError(f"Twitter could not process media {media_id}: {error.get('message', state)}")
+            if time.time() >= deadline:
+                raise TimeoutError(f"Media {media_id} still {state} after {self.PROCESSING_TIMEOUT}s")
+            time.sleep(processing.get("check_after_secs", 1))
+            info = self._request("GET", endpoint="media_status",
+                                 params={"command": "STATUS", "media_id": media_id})
+
+    def _request(self, method: str, endpoint: str = "media_upload", **kwargs) -> dict:
+        """Send one signed request to the upload endpoint, returning its data"""
+        return call_with_retries(
+            lambda: self.twitter_client._call(endpoint, self._signed_request, method, **kwargs),
+            breaker=self.twitter_client.breaker,
+            is_retryable=self.twitter_client._is_retryable
+        )
+
+    def _signed_request(self, method: str, **kwargs) -> dict:
+        import tweepy
+
+        client = self.twitter_client.client
+        if isinstance(kwargs.get("data"), _Segment):
+            kwargs["data"].seek(0)
+        auth = tweepy.OAuth1UserHandler(
+            client.consumer_key, client.consumer_secret,
+            client.access_token, client.access_token_secret
+        ).apply_auth()
+        response = client.session.request(method, self.UPLOAD_URL, auth=auth, **kwargs)
+
+        # Raise the same errors tweepy does for its own endpoints
+        if response.status_code == 400:
+            raise tweepy.BadRequest(response)
+        if response.status_code == 401:
+            raise tweepy.Unauthorized(response)
+        if response.status_code == 403:
+            raise tweepy.Forbidden(response)
+        if response.status_code == 404:
+            raise tweepy.NotFound(response)
+        if response.status_code == 429:
+            raise tweepy.TooManyRequests(response)
+        if response.status_code >= 500:
+            raise tweepy.TwitterServerError(response)
+        if not 200 <= response.status_code < 300:
+            raise tweepy.HTTPException(response)
+        if response.status_code == 204 or not response.content:
+            return {}
+        return response.json().get("data", {})
+
+    def close(self):
+        self.files.shutdown()
+        self.chunks.shutdown()
+        self.cache.close()
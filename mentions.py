@@ -0,0 +1,344 @@
+import contextvars
+import logging
+import math
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import List, Optional
+from content_generator import AvoidedTopic
+from log_setup import log_context
+from metrics import FAILURES, REGISTRY, STAGE_SECONDS
+from resilience import CircuitOpen
+
+MENTION_REPLY_SECONDS = REGISTRY.histogram(
+    "bot_mention_reply_seconds",
+    "Time from a mention being tweeted to our reply being posted",
+    buckets=(5, 10, 30, 60, 120, 300, 600, 1800, 3600, 4 * 3600, 12 * 3600)
+)
+
+class MentionStore:
+    """Mentions of the account and what became of them, in SQLite (WAL) like the timeline
+
+    Mentions are inserted once by tweet id, so polling the same page twice
+    or overlapping polls from a restart never queue a second reply. The
+    newest mention id seen is kept as the since_id of the next poll.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mentions (
+            tweet_id INTEGER PRIMARY KEY,
+            author_id TEXT,
+            username TEXT,
+            followers INTEGER DEFAULT 0,
+            text TEXT NOT NULL,
+            conversation_id TEXT,
+            created_at REAL NOT NULL,
+            priority REAL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            reply_id TEXT,
+            reply_text TEXT,
+            replied_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_mentions_status ON mentions (status, created_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    # pending: waiting for a reply; replied, skipped (ours, a retweet or baiting an avoided topic),
+    # superseded (a newer mention in the same conversation), expired and failed (after MAX_ATTEMPTS
+    # tries) are final
+    STATUSES = ("pending", "replied", "skipped", "superseded", "expired", "failed")
+
+    def __init__(self, path: str = 'mentions.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def since_id(self) -> Optional[str]:
+        """Newest mention id seen, the since_id of the next poll"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'since_id'").fetchone()
+        return row[0] if row else None
+
+    def add(self, mentions: List[dict], user_id: str = None) -> int:
+        """Store newly polled mentions, returning how many were new
+
+        Our own tweets and retweets are stored as skipped. Of several pending
+        mentions from one author in one conversation only the newest is kept
+        pending, so a burst of follow-ups gets a single reply.
+        """
+        if not mentions:
+            return 0
+        rows = []
+        for mention in mentions:
+            own = user_id is not None and mention["author_id"] == str(user_id)
+            rows.append({
+                "tweet_id": int(mention["id"]),
+                "author_id": mention["author_id"],
+                "username": mention.get("username"),
+                "followers": mention.get("followers") or 0,
+                "text": mention["text"],
+                "conversation_id": mention.get("conversation_id"),
+                "created_at": self._timestamp(mention.get("created_at")),
+                "priority": self.priority(mention),
+                "status": "skipped" if own or mention.get("is_retweet") else "pending"
+            })
+        newest = max(int(mention["id"]) for mention in mentions)
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO mentions (tweet_id, author_id, username, followers, text, "
+                "conversation_id, created_at, priority, status) VALUES (:tweet_id, :author_id, :username, "
+                ":followers, :text, :conversation_id, :created_at, :priority, :status)",
+                rows
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute(
+                "UPDATE mentions SET status = 'superseded' WHERE status = 'pending' AND EXISTS ("
+                "SELECT 1 FROM mentions AS newer WHERE newer.status = 'pending' "
+                "AND newer.author_id = mentions.author_id AND newer.conversation_id = mentions.conversation_id "
+                "AND newer.tweet_id > mentions.tweet_id)"
+            )
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('since_id', ?) ON CONFLICT (key) DO UPDATE "
+                "SET value = excluded.value WHERE CAST(excluded.value AS INTEGER) > CAST(meta.value AS INTEGER)",
+                (str(newest),)
+            )
+        return added
+
+    @staticmethod
+    def priority(mention: dict) -> float:
+        """Higher for questions and replies in a thread (usually ours), and logarithmically for bigger accounts"""
+        score = math.log1p(mention.get("followers") or 0)
+        if "?" in mention["text"]:
+            score += 2
+        if mention.get("conversation_id") and mention["conversation_id"] != mention["id"]:
+            score += 1
+        return score
+
+    @staticmethod
+    def _timestamp(created_at: Optional[str]) -> float:
+        """Epoch seconds of an ISO timestamp, or now if Twitter did not send one"""
+        if not created_at:
+            return time.time()
+        moment = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+    def expire(self, max_age_seconds: float, now: float = None) -> int:
+        """Give up on pending mentions older than max_age_seconds"""
+        cutoff = (now or time.time()) - max_age_seconds
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "UPDATE mentions SET status = 'expired' WHERE status = 'pending' AND created_at < ?", (cutoff,)
+            ).rowcount
+
+    def next_batch(self, limit: int, deadline_seconds: float, now: float = None) -> List[dict]:
+        """Pending mentions to reply to next
+
+        Mentions that can still be answered within deadline_seconds come
+        first, highest priority then oldest first. Ones that have already
+        missed it go last, so under a burst the backlog does not make every
+        reply late.
+        """
+        cutoff = (now or time.time()) - deadline_seconds
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM mentions WHERE status = 'pending' "
+                "ORDER BY created_at < ?, priority DESC, created_at LIMIT ?",
+                (cutoff, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_replied(self, tweet_id: int, reply_id: str, reply_text: str, replied_at: float = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE mentions SET status = 'replied', reply_id = ?, reply_text = ?, replied_at = ? "
+                "WHERE tweet_id = ?",
+                (reply_id, reply_text, replied_at or time.time(), tweet_id)
+            )
+
+    def skip(self, tweet_id: int):
+        """Give up on a mention for good"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE mentions SET status = 'skipped' WHERE tweet_id = ?", (tweet_id,))
+
+    def record_failure(self, tweet_id: int, max_attempts: int):
+        """Count a failed reply, giving up after max_attempts"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE mentions SET attempts = attempts + 1, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END WHERE tweet_id = ?",
+                (max_attempts, tweet_id)
+            )
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM mentions WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Mentions per status and reply latency of the replied ones"""
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM mentions GROUP BY status").fetchall())
+            latencies = [row[0] for row in self.conn.execute(
+                "SELECT replied_at - created_at FROM mentions WHERE status = 'replied' ORDER BY 1"
+            ).fetchall()]
+        stats = {status: counts.get(status, 0) for status in self.STATUSES}
+        if latencies:
+            stats["p50_seconds"] = latencies[len(latencies) // 2]
+            stats["p99_seconds"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class MentionResponder:
+    """Polls the account's mentions and replies to them in the persona's voice
+
+    Each cycle fetches the mentions newer than the stored since_id, expires
+    the ones too old to be worth answering, and replies to the next batch on
+    a bounded thread pool: every worker generates its reply and posts it with
+    in_reply_to_tweet_id, so one slow completion never holds up the rest.
+    While pending mentions remain and replies are going out the next cycle
+    starts straight away instead of waiting for the poll interval. A cycle
+    that settles nothing waits for the poll interval, or until an open circuit
+    breaker lets calls through again, and only replies that were actually
+    attempted count against MAX_ATTEMPTS. A mention whose reply touches an
+    avoided topic is skipped for good rather than generated again. The time from mention to reply is
+    observed in bot_mention_reply_seconds and checked against latency_target.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, bot, store: MentionStore = None, concurrency: int = None,
+                 latency_target: float = None, batch_size: int = None):
+        self.bot = bot
+        self.config = bot.config
+        self.store = store or MentionStore(self.config.MENTIONS_DB_FILE)
+        self.concurrency = concurrency or self.config.MENTION_CONCURRENCY
+        self.latency_target = latency_target or self.config.MENTION_LATENCY_TARGET_SECONDS
+        self.batch_size = batch_size or self.config.MENTION_BATCH_SIZE
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mention")
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def poll(self) -> int:
+        """Fetch and store new mentions, returning how many there were"""
+        with STAGE_SECONDS.time(stage="mentions_poll"):
+            mentions = self.bot.twitter_client.get_mentions(since_id=self.store.since_id())
+        added = self.store.add(mentions, user_id=str(self.bot.twitter_client.user_id))
+        if added:
+            self.logger.info(f"Fetched {added} new mentions")
+        return added
+
+    def respond(self, dry_run: bool = False) -> List[dict]:
+        """Reply to the next batch of pending mentions, returning one result per mention"""
+        expired = self.store.expire(self.config.MENTION_MAX_AGE_HOURS * 3600)
+        if expired:
+            self.logger.warning(f"Expired {expired} mentions older than {self.config.MENTION_MAX_AGE_HOURS}h")
+
+        batch = self.store.next_batch(self.batch_size, self.latency_target)
+        futures = [
+            self.executor.submit(contextvars.copy_context().run, self._reply, mention, dry_run)
+            for mention in batch
+        ]
+        return [future.result() for future in as_completed(futures)]
+
+    def run_once(self, dry_run: bool = False) -> List[dict]:
+        """Poll once and reply to one batch"""
+        try:
+            self.poll()
+        except Exception as e:
+            FAILURES.inc(stage="mentions_poll", cause=type(e).__name__)
+            self.logger.error(f"Error polling mentions: {e}")
+        return self.respond(dry_run=dry_run)
+
+    def run(self, poll_interval: float = None):
+        """Poll and reply until stop() is called"""
+        poll_interval = poll_interval or self.config.MENTION_POLL_SECONDS
+        self.logger.info(f"Answering mentions every {poll_interval:.0f}s, {self.concurrency} at a time")
+        while not self.stopped.is_set():
+            results = self.run_once()
+            if not self.store.pending_count():
+                self.stopped.wait(poll_interval)
+            elif not any(result.get("reply_id") or result.get("error") == "avoided_topic" for result in results):
+                # Nothing was settled, so OpenAI or Twitter is down; don't spin on the same batch
+                wait = self._retry_after() or poll_interval
+                self.logger.warning(f"No replies posted, retrying in {wait:.0f}s")
+                self.stopped.wait(wait)
+        self.executor.shutdown()
+
+    def _retry_after(self) -> float:
+        """Seconds until the breakers in the reply path let calls through again, 0 if they already do"""
+        generator = self.bot.content_generator
+        openai_wait = min(generator._breaker_for(target).retry_after() for target in generator.targets)
+        return max(openai_wait, self.bot.twitter_client.breaker.retry_after())
+
+    def stop(self):
+        """Finish the current batch and stop"""
+        self.stopped.set()
+
+    def _reply(self, mention: dict, dry_run: bool) -> dict:
+        """Generate and post the reply to one mention"""
+        result = {"mention_id": str(mention["tweet_id"]), "username": mention["username"], "reply": None}
+        with log_context(account=self.bot.name, context_type="reply"):
+            try:
+                with STAGE_SECONDS.time(stage="reply_generate"):
+                    reply = self.bot.content_generator.generate_reply(mention["text"], mention["username"])
+                if not reply:
+                    # OpenAI failed; try again next cycle, up to MAX_ATTEMPTS
+                    result["error"] = "no_reply"
+                    self.store.record_failure(mention["tweet_id"], self.MAX_ATTEMPTS)
+                    return result
+                result["reply"] = reply
+                if dry_run:
+                    return result
+
+                posted = self.bot.twitter_client.post_tweet(reply, in_reply_to_tweet_id=str(mention["tweet_id"]))
+                if not posted:
+                    result["error"] = "not_posted"
+                    if not self.bot.twitter_client.breaker.retry_after():
+                        self.store.record_failure(mention["tweet_id"], self.MAX_ATTEMPTS)
+                    return result
+
+                replied_at = time.time()
+                self.store.mark_replied(mention["tweet_id"], posted["id"], reply, replied_at)
+                latency = replied_at - mention["created_at"]
+                MENTION_REPLY_SECONDS.observe(latency)
+                result.update(reply_id=posted["id"], url=posted["url"], latency=latency)
+                if latency > self.latency_target:
+                    self.logger.warning(
+                        f"Replied to {mention['tweet_id']} after {latency:.0f}s, over the "
+                        f"{self.latency_target:.0f}s target ({self.store.pending_count()} still pending)"
+                    )
+                else:
+                    self.logger.info(f"Replied to {mention['tweet_id']} in {latency:.1f}s: {posted['url']}")
+                return result
+            except AvoidedTopic as e:
+                self.logger.warning(f"Skipping mention {mention['tweet_id']}: {e}")
+                self.store.skip(mention["tweet_id"])
+                result["error"] = "avoided_topic"
+                return result
+            except CircuitOpen as e:
+                FAILURES.inc(stage="reply", cause=type(e).__name__)
+                self.logger.warning(f"Not replying to {mention['tweet_id']} yet: {e}")
+                result["error"] = "circuit_open"
+                return result
+            except Exception as e:
+                FAILURES.inc(stage="reply", cause=type(e).__name__)
+                self.logger.exception(f"Error replying to mention {mention['tweet_id']}: {e}")
+                self.store.record_failure(mention["tweet_id"], self.MAX_ATTEMPTS)
+                result["error"] = type(e).__name__
+                return result
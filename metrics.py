@@ -0,0 +1,260 @@
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(label, "") for label in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(label, "") for label in self.labelnames)
+        with self.lock:
+            return self.values.get(key, 0)
+
+    def samples(self) -> List[tuple]:
+        """(suffix, labels, value) rows for the exposition format"""
+        with self.lock:
+            items = list(self.values.items())
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram:
+    """Latency histogram with fixed buckets and optional labels
+
+    An observation is one bisect and three additions under a lock, cheap
+    enough to wrap every stage of every post.
+    """
+
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[tuple, list] = {}  # labels -> [per-bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(label, "") for label in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a with-block, including blocks that raise"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        key = tuple(labels.get(label, "") for label in self.labelnames)
+        with self.lock:
+            entry = self.values.get(key)
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[tuple]:
+        """(suffix, labels, value) rows for the exposition format"""
+        with self.lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self.values.items()]
+
+        rows = []
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                rows.append(("_bucket", {**labels, "le": "+Inf" if bound == float("inf") else repr(bound)}, cumulative))
+            rows.append(("_sum", labels, total))
+            rows.append(("_count", labels, count))
+        return rows
+
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, **kwargs)
+
+    @staticmethod
+    def _format_labels(labels: dict) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for key, value in labels.items():
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{self._format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write the rendered metrics to a file atomically"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1"):
+        """Serve GET /metrics from a daemon thread, returning the server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        return server
+
+    def start_dumper(self, path: str, interval: float) -> threading.Event:
+        """Dump the metrics to path every interval seconds and once at exit
+
+        Returns an event that stops the periodic dumps when set.
+        """
+        stopped = threading.Event()
+
+        def loop():
+            while not stopped.wait(interval):
+                self._safe_dump(path)
+
+        threading.Thread(target=loop, daemon=True, name="metrics-dump").start()
+        atexit.register(self._safe_dump, path)
+        return stopped
+
+    def _safe_dump(self, path: str):
+        try:
+            self.dump(path)
+        except OSError as e:
+            logger.error(f"Could not write metrics to {path}: {e}")
+
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline metrics shared by the bot, the content generator and the Twitter client
+STAGE_SECONDS = REGISTRY.histogram(
+    "bot_stage_seconds",
+    "Wall time of each generate-to-post pipeline stage",
+    ("stage",)
+)
+FAILURES = REGISTRY.counter(
+    "bot_failures_total",
+    "Pipeline failures by stage and cause",
+    ("stage", "cause")
+)
+STREAM_ABORTS = REGISTRY.counter(
+    "openai_stream_aborts_total",
+    "Streamed completions stopped early, by reason",
+    ("reason",)
+)
+HEDGES = REGISTRY.counter(
+    "openai_hedges_total",
+    "Hedged completion requests: fired, failover, over_budget, and which attempt won",
+    ("event",)
+)
+HEDGE_EXTRA_TOKENS = REGISTRY.counter(
+    "openai_hedge_extra_tokens_total",
+    "Tokens spent on attempts that lost a hedge, estimated for ones cut off mid-stream",
+    ("kind",)
+)
+OPENAI_TOKENS = REGISTRY.counter(
+    "openai_tokens_total",
+    "Tokens reported in OpenAI response usage",
+    ("kind",)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "openai_cache_requests_total",
+    "Completion requests answered from (hit) or missing in (miss) the response cache",
+    ("result",)
+)
+POSTS = REGISTRY.counter(
+    "bot_posts_total",
+    "Tweets posted and recorded in history",
+    ("context_type",)
+)
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters(config) -> bool:
+    """Start the HTTP endpoint and/or periodic dump configured in METRICS_*
+
+    Safe to call more than once; returns True if an exporter is running.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if not _exporters_started:
+            if config.METRICS_PORT:
+                REGISTRY.start_http_server(config.METRICS_PORT, config.METRICS_HOST)
+                logger.info(f"Serving metrics on http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+            if config.METRICS_DUMP_FILE:
+                REGISTRY.start_dumper(config.METRICS_DUMP_FILE, config.METRICS_DUMP_INTERVAL)
+            _exporters_started = bool(config.METRICS_PORT or config.METRICS_DUMP_FILE)
+        return _exporters_started
@@ -0,0 +1,131 @@
+import re
+from typing import List, Optional, Tuple
+from tweet_text import weighted_length
+
+_NOT_LOOKED_UP = object()
+
+class CandidateRanker:
+    """Scores generated tweet candidates locally so the best of a batch gets posted
+
+    Candidates that touch a topic the persona avoids or nearly duplicate an
+    earlier post are rejected outright, as are over-length ones when threads
+    are off. The rest are scored between 0 and 1 on how well their length
+    fits, how many hashtags they carry and how novel they are against the
+    post history; a candidate that needs a thread scores as a half fit.
+    """
+
+    LENGTH_WEIGHT = 0.3
+    HASHTAG_WEIGHT = 0.2
+    NOVELTY_WEIGHT = 0.5
+
+    HASHTAG_PATTERN = re.compile(r'(?<!\w)#\w+')
+    # Words that describe a topic rather than name it, e.g. "controversial topics"
+    GENERIC_TOPIC_WORDS = {"topic", "topics", "issue", "issues", "content", "stuff", "things"}
+
+    THREAD_LENGTH_SCORE = 0.5
+
+    def __init__(self, max_length: int = 280, target_length: Tuple[int, int] = (120, 240),
+                 max_hashtags: int = 3, topics_to_avoid=(), duplicates=None, allow_threads: bool = True):
+        self.max_length = max_length
+        self.allow_threads = allow_threads
+        self.target_length = target_length
+        self.max_hashtags = max_hashtags
+        self.duplicates = duplicates
+        self.avoid_patterns = []
+        for topic in topics_to_avoid:
+            pattern = self._topic_pattern(topic)
+            if pattern:
+                self.avoid_patterns.append((topic, pattern))
+
+    @classmethod
+    def from_context(cls, user_context: dict, config, duplicates=None) -> "CandidateRanker":
+        """Ranker for a persona's user_context.json and our config"""
+        preferences = user_context.get('posting_preferences', {})
+        return cls(
+            max_length=config.MAX_TWEET_LENGTH,
+            topics_to_avoid=preferences.get('topics_to_avoid', []),
+            duplicates=duplicates,
+            allow_threads=config.MAX_THREAD_PARTS > 1
+        )
+
+    def _topic_pattern(self, topic: str) -> Optional[re.Pattern]:
+        """Regex matching text that mentions every distinctive word of a topic"""
+        words = [w for w in re.findall(r'\w+', topic.lower()) if w not in self.GENERIC_TOPIC_WORDS]
+        if not words:
+            return None
+        lookaheads = []
+        for word in words:
+            # Drop a plural s so "politics" also catches "political"
+            stem = word[:-1] if len(word) > 4 and word.endswith("s") else word
+            lookaheads.append(rf'(?=.*\b{re.escape(stem)})')
+        return re.compile(''.join(lookaheads), re.IGNORECASE | re.DOTALL)
+
+    def rejection(self, text: str, nearest=_NOT_LOOKED_UP) -> Optional[str]:
+        """Why a candidate cannot be posted, or None if it can
+
+        nearest is the candidate's nearest indexed post, if already looked up.
+        """
+        if not text:
+            return "empty"
+        if not self.allow_threads and weighted_length(text) > self.max_length:
+            return "too_long"
+        topic = self.avoided_topic(text)
+        if topic:
+            return f"avoided_topic:{topic}"
+        if self.duplicates is not None:
+            if nearest is _NOT_LOOKED_UP:
+                nearest = self.duplicates.nearest(text)
+            if nearest and nearest[1] >= self.duplicates.threshold:
+                return "near_duplicate"
+        return None
+
+    def avoided_topic(self, text: str) -> Optional[str]:
+        """The avoided topic a text touches, if any"""
+        for topic, pattern in self.avoid_patterns:
+            if pattern.match(text):
+                return topic
+        return None
+
+    def _length_score(self, length: int) -> float:
+        low, high = self.target_length
+        if low <= length <= high:
+            return 1.0
+        if length < low:
+            return length / low
+        if length > self.max_length:
+            return self.THREAD_LENGTH_SCORE
+        return max(self.THREAD_LENGTH_SCORE, 1 - (length - high) / max(1, self.max_length - high))
+
+    def _hashtag_score(self, count: int) -> float:
+        if 1 <= count <= self.max_hashtags:
+            return 1.0
+        if count == 0:
+            return 0.6
+        return max(0.0, 1 - 0.3 * (count - self.max_hashtags))
+
+    def score(self, text: str) -> Optional[float]:
+        """Score of a candidate between 0 and 1, or None if it is rejected"""
+        nearest = self.duplicates.nearest(text) if text and self.duplicates is not None else None
+        if self.rejection(text, nearest):
+            return None
+        novelty = 1.0 - nearest[1] if nearest else 1.0
+        return (
+            self.LENGTH_WEIGHT * self._length_score(weighted_length(text))
+            + self.HASHTAG_WEIGHT * self._hashtag_score(len(self.HASHTAG_PATTERN.findall(text)))
+            + self.NOVELTY_WEIGHT * novelty
+        )
+
+    def rank(self, candidates: List[str]) -> List[Tuple[float, str]]:
+        """Acceptable candidates as (score, text), best first"""
+        scored = []
+        for text in candidates:
+            score = self.score(text)
+            if score is not None:
+                scored.append((score, text))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    def best(self, candidates: List[str]) -> Optional[str]:
+        """Highest scoring acceptable candidate"""
+        ranked = self.rank(candidates)
+        return ranked[0][1] if ranked else None
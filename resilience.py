@@ -0,0 +1,161 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from metrics import FAILURES
+
+logger = logging.getLogger(__name__)
+
+# (now, sleep) used for breaker timing and retry backoff; the simulation swaps in its virtual clock
+_clock = (time.monotonic, time.sleep)
+
+def use_clock(now: Callable[[], float], sleep: Callable[[float], None]) -> tuple:
+    """Time breakers and back off retries on another clock, returning the previous (now, sleep)"""
+    global _clock
+    previous, _clock = _clock, (now, sleep)
+    return previous
+
+class CircuitOpen(Exception):
+    """The provider's circuit breaker is open, so the call was not attempted"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fails fast while a provider keeps failing
+
+    After failure_threshold consecutive transient failures the circuit opens
+    and calls raise CircuitOpen without touching the network. Once
+    recovery_timeout seconds have passed a single probe call is let through:
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out now"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = _clock[0]() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.recovery_timeout:
+                # Let exactly one probe through
+                self.state = self.HALF_OPEN
+                return
+            retry_after = max(0.0, self.recovery_timeout - elapsed)
+            raise CircuitOpen(self.name, retry_after)
+
+    def retry_after(self) -> float:
+        """Seconds until a call may go out again, 0 unless the circuit is open"""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (_clock[0]() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.name} circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = _clock[0]()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 1.0, max_delay: float = 20.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int) -> float:
+        """Seconds to wait before retry number `retry` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide circuit breaker for a provider, shared by every client"""
+    with _breakers_lock:
+        if name not in _breakers:
+            from config import Config
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=Config.BREAKER_RECOVERY_SECONDS
+            )
+        return _breakers[name]
+
+def default_policy() -> RetryPolicy:
+    """Retry policy from the configuration"""
+    from config import Config
+    return RetryPolicy(
+        attempts=Config.RETRY_ATTEMPTS,
+        base_delay=Config.RETRY_BASE_DELAY,
+        max_delay=Config.RETRY_MAX_DELAY
+    )
+
+def call_with_retries(func: Callable, *, breaker: CircuitBreaker, is_retryable: Callable[[Exception], bool],
+                      policy: RetryPolicy = None, before_retry: Callable[[Exception], Optional[object]] = None):
+    """Call func with backoff retries on transient errors behind a circuit breaker
+
+    Only exceptions for which is_retryable returns True are retried and count
+    against the breaker; anything else is raised straight away. before_retry,
+    if given, runs after the backoff and before each retry with the last
+    error; a non-None return value is used as the result instead of retrying,
+    which lets callers check whether a timed-out write actually went through.
+    """
+    policy = policy or default_policy()
+    last_error = None
+
+    for attempt in range(policy.attempts):
+        if attempt:
+            _clock[1](policy.delay(attempt))
+            if before_retry:
+                recovered = before_retry(last_error)
+                if recovered is not None:
+                    breaker.record_success()
+                    return recovered
+
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_retryable(e):
+                # The provider answered, it just refused this request
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            FAILURES.inc(stage=f"{breaker.name}_attempt", cause=type(e).__name__)
+            last_error = e
+            logger.warning(f"{breaker.name} call failed (attempt {attempt + 1}/{policy.attempts}): {e}")
+            continue
+
+        breaker.record_success()
+        return result
+
+    raise last_error
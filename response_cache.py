@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+class ResponseCache:
+    """On-disk LRU/TTL cache of OpenAI completions, keyed by the request itself
+
+    The key is a SHA-256 of the model, messages and sampling parameters, so
+    any change to the persona, prompt or settings is a miss. Entries expire
+    after ttl seconds and the least recently used ones are evicted beyond
+    max_entries. Hit and miss counts are kept in the same SQLite file, so the
+    statistics cover every run that shared it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS completions (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions (last_used);
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = 'response_cache.db', ttl: float = 86400, max_entries: int = 500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def key(request: dict) -> str:
+        """Content address of a completion request"""
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _count(self, name: str):
+        self.conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Cached completions for a key, or None on a miss"""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            self.conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, completions: List[str]):
+        """Store completions, evicting the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(completions), now, now)
+            )
+            self.conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        """Entry count and hit/miss statistics"""
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """Drop every cached completion and reset the statistics"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM completions")
+            self.conn.execute("DELETE FROM stats")
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
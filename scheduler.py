@@ -1,79 +1,183 @@
-import schedule
-import time
+import functools
+import logging
+import random
 import threading
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 from bot import TwitterBot
-from config import Config
+from content_buffer import ContentBuffer
+from job_queue import DEFAULT_ACCOUNT, POST_JOB, get_job_queue
+from timer_scheduler import TimerScheduler
 
 class BotScheduler:
-    def __init__(self):
-        self.bot = TwitterBot()
-        self.config = Config()
+    def __init__(self, bot: TwitterBot = None, clock=time.time):
+        self.bot = bot or TwitterBot()
+        self.config = self.bot.config
         self.running = False
-        self.thread = None
+        self.timer = TimerScheduler(max_workers=self.config.SCHEDULER_WORKERS, clock=clock)
+        # With the job queue, slots are only enqueued here and workers do the generating
+        self.queue = None
+        if self.config.JOB_QUEUE_ENABLED:
+            self.queue = get_job_queue(self.config)
+        self.buffer = ContentBuffer(self.bot) if self.config.CONTENT_BUFFER_ENABLED and not self.queue else None
+        self.responder = None
+        self.responder_thread = None
+        if self.config.MENTIONS_ENABLED:
+            from mentions import MentionResponder
+            self.responder = MentionResponder(self.bot)
+        self.logger = logging.getLogger(__name__)
         
     def setup_schedule(self):
         """Setup posting schedule based on configuration"""
         posting_times = self.config.POSTING_SCHEDULE.split(',')
         
+        warm_up = self.config.WARMUP_MINUTES_BEFORE_SLOT
+        
         for time_str in posting_times:
             time_str = time_str.strip()
-            print(f"Scheduling daily post at {time_str}")
-            schedule.every().day.at(time_str).do(self.scheduled_post)
+            self.logger.info(f"Scheduling daily post at {time_str}")
+            if self.queue:
+                # Enqueued ahead of the slot, so workers can warm up before it is due
+                self.timer.every_day_at(
+                    functools.partial(self.scheduled_post, time_str),
+                    self._minutes_before(time_str, warm_up),
+                    tz=self.config.POSTING_TIMEZONE,
+                    tags=("post",),
+                    name="scheduled_post"
+                )
+                continue
+            if warm_up:
+                self.timer.every_day_at(
+                    self.bot.warm_up,
+                    self._minutes_before(time_str, warm_up),
+                    tz=self.config.POSTING_TIMEZONE,
+                    tags=("warm_up",),
+                    name="warm_up"
+                )
+            self.timer.every_day_at(
+                self.scheduled_post,
+                time_str,
+                tz=self.config.POSTING_TIMEZONE,
+                jitter=self.config.POSTING_JITTER_SECONDS,
+                tags=("post",),
+                name="scheduled_post"
+            )
+    
+    @staticmethod
+    def _minutes_before(at: str, minutes: int) -> str:
+        """HH:MM time of day the given number of minutes before another"""
+        hour, minute = (int(part) for part in at.split(':'))
+        total = (hour * 60 + minute - minutes) % (24 * 60)
+        return f"{total // 60:02d}:{total % 60:02d}"
+    
+    def enqueue_post(self, slot: str) -> bool:
+        """Enqueue the post for the nearest occurrence of a HH:MM slot, returning False if it already was
+        
+        The job becomes due at the slot (plus jitter), or straight away if
+        that has passed. The slot's date and time make up the job's dedupe
+        key, so a standby scheduler enqueueing the same slot does not cause
+        a second post, and the account goes in the payload so only its own
+        workers claim the job.
+        """
+        tz = ZoneInfo(self.config.POSTING_TIMEZONE) if self.config.POSTING_TIMEZONE else None
+        now = datetime.now(tz)
+        hour, minute = (int(part) for part in slot.split(':'))
+        slot_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if slot_time - now > timedelta(hours=12):
+            slot_time -= timedelta(days=1)
+        elif now - slot_time > timedelta(hours=12):
+            slot_time += timedelta(days=1)
+        run_at = slot_time.timestamp() + random.uniform(0, self.config.POSTING_JITTER_SECONDS)
+        
+        account = self.bot.name or DEFAULT_ACCOUNT
+        key = f"post:{account}:{slot_time.date().isoformat()}T{hour:02d}:{minute:02d}"
+        job_id = self.queue.enqueue(POST_JOB, {"slot": slot, "account": account},
+                                    run_at=max(run_at, now.timestamp()),
+                                    dedupe_key=key, max_attempts=self.config.JOB_MAX_ATTEMPTS)
+        if job_id is None:
+            self.logger.info(f"Post for {key} was already enqueued")
+            return False
+        self.logger.info(f"Enqueued job {job_id} for {key}")
+        return True
     
-    def scheduled_post(self):
-        """Execute a scheduled post"""
-        print(f"Executing scheduled post at {datetime.now()}")
+    def scheduled_post(self, slot: str = None):
+        """Execute a scheduled post, or enqueue it for a worker when the job queue is on"""
+        if self.queue and slot:
+            self.enqueue_post(slot)
+            return
+        
+        self.logger.info(f"Executing scheduled post at {datetime.now()}")
         try:
-            result = self.bot.generate_and_post()
+            item = self._pop_buffered() if self.buffer else None
+            if item:
+                result = self._post_buffered(*item)
+            else:
+                result = self.bot.generate_and_post()
             if result:
-                print(f"Scheduled post successful: {result.get('url', 'N/A')}")
+                self.logger.info(f"Scheduled post successful: {result.get('url', 'N/A')}", extra={"tweet_id": result.get("id")})
             else:
-                print("Scheduled post failed")
+                self.logger.error("Scheduled post failed")
         except Exception as e:
-            print(f"Error in scheduled post: {e}")
+            self.logger.error(f"Error in scheduled post: {e}")
+    
+    def _pop_buffered(self):
+        """Pop the next buffered draft that is not a near-duplicate of a recent post"""
+        while True:
+            item = self.buffer.pop()
+            if not item or not self.bot.is_duplicate(item[1]):
+                return item
+            self.logger.warning(f"Dropping buffered {item[0]} draft that duplicates an earlier post")
+    
+    def _post_buffered(self, context_type: str, content: str, created_at: str):
+        """Post a pre-generated tweet, keeping it for the next slot if posting fails"""
+        result = self.bot.post_content(content, context_type)
+        if not result:
+            self.buffer.push(context_type, content, front=True, created_at=created_at)
+        return result
     
     def start(self):
         """Start the scheduler in a separate thread"""
         if self.running:
-            print("Scheduler is already running")
+            self.logger.warning("Scheduler is already running")
             return
         
         self.setup_schedule()
         self.running = True
+        self.timer.start()
+        self.logger.info("Bot scheduler started...")
         
-        def run_scheduler():
-            print("Bot scheduler started...")
-            while self.running:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+        if self.buffer:
+            self.buffer.start()
+            self.logger.info("Content buffer producer started")
         
-        self.thread = threading.Thread(target=run_scheduler, daemon=True)
-        self.thread.start()
-        print("Scheduler thread started")
+        if self.responder:
+            self.responder_thread = threading.Thread(target=self.responder.run, name="mentions", daemon=True)
+            self.responder_thread.start()
+            self.logger.info("Mention responder started")
     
     def stop(self):
         """Stop the scheduler"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
-        print("Scheduler stopped")
+        self.timer.stop()
+        self.timer.clear()
+        if self.buffer:
+            self.buffer.stop()
+        if self.responder:
+            self.responder.stop()
+        self.logger.info("Scheduler stopped")
     
     def next_run_time(self):
         """Get the next scheduled run time"""
-        jobs = schedule.jobs
-        if jobs:
-            next_job = min(jobs, key=lambda job: job.next_run)
-            return next_job.next_run
-        return None
+        return self.timer.next_run()
     
     def list_scheduled_jobs(self):
         """List all scheduled jobs"""
         jobs = []
-        for job in schedule.jobs:
+        for job in self.timer.jobs:
             jobs.append({
                 "job": str(job),
                 "next_run": job.next_run,
                 "tags": job.tags
             })
-        return jobs 
\ No newline at end of file
+        return jobs
\ No newline at end of file
@@ -74,6 +74,7 @@ def main():
     
     # Check dependencies
     try:
+        import numpy
         import openai
         import tweepy
         print("✅ Dependencies already installed")
@@ -0,0 +1,400 @@
+import logging
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Tuple
+from zoneinfo import ZoneInfo
+from config import Config
+from dispatcher import RateLimited
+from log_setup import setup_logging
+from resilience import CircuitOpen, call_with_retries, get_breaker, use_clock
+from tweet_text import split_thread
+
+# Stubbed completions are drawn from a vocabulary wide enough that they rarely look like near-duplicates
+WORDS = (
+    "shipping building founders scaling agents embedded latency prototype users feedback demo launch "
+    "evals retrieval sensors firmware pipeline startup coffee whiteboard roadmap benchmark refactor "
+    "deploy hackathon mentor investor seed dataset inference tokens campus robotics notebook debugging "
+    "compiler kernel database cache schema migration release weekend lecture professor internship "
+    "interview offer runway pitch market customer onboarding pricing analytics dashboard metrics "
+    "monitoring incident outage postmortem oncall testing fixtures mocks staging production rollout "
+    "rollback feature flag experiment hypothesis paper arxiv reading writing thread meetup community "
+    "library framework runtime garbage collector memory allocator profiler flamegraph vector embedding "
+    "transformer attention finetuning distillation quantization gpu cluster scheduler queue worker "
+    "lease retry backoff breaker timeout socket protocol parser lexer grammar terminal editor keyboard"
+).split()
+
+class VirtualClock:
+    """Epoch seconds that only move when the simulation says so
+
+    sleep() advances the clock instead of blocking, so a stubbed request
+    that "takes" five seconds costs nothing in wall time.
+    """
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+    def set(self, now: float):
+        self.now = now
+
+
+class Outage:
+    """A window of virtual time in which one provider fails every request"""
+
+    def __init__(self, provider: str, start: float, end: float):
+        self.provider = provider
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, spec: str, tz: ZoneInfo = None) -> "Outage":
+        """Parse provider:START/HOURS, e.g. openai:2025-03-04T08:00/6"""
+        provider, _, window = spec.partition(':')
+        start, _, hours = window.partition('/')
+        if provider not in ("openai", "twitter") or not start:
+            raise ValueError(f"Invalid outage {spec!r}, expected openai|twitter:START/HOURS")
+        begin = datetime.fromisoformat(start)
+        if begin.tzinfo is None:
+            begin = begin.replace(tzinfo=tz)
+        return cls(provider, begin.timestamp(), begin.timestamp() + float(hours or 1) * 3600)
+
+    def covers(self, now: float) -> bool:
+        return self.start <= now < self.end
+
+
+class SimulatedOpenAI:
+    """Just enough of the OpenAI client for ContentGenerator, answering on the virtual clock
+
+    Latency is log-normal around latency_median; a request slower than the
+    timeout, one that hits error_rate, or one made during an outage raises
+    the same exceptions the real client would, so retries and the circuit
+    breaker behave as in production.
+    """
+
+    def __init__(self, clock: VirtualClock, rng: random.Random, latency_median: float = 5.0,
+                 latency_sigma: float = 0.35, error_rate: float = 0.0, timeout: float = 20.0,
+                 outages: List[Outage] = ()):
+        self.clock = clock
+        self.rng = rng
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.timeout = timeout
+        self.outages = list(outages)
+        self.requests = 0
+        self.failures = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(retrieve=self._retrieve)
+
+    def _error(self, error_class):
+        from http_pool import openai_http_library
+        self.failures += 1
+        # The request type of whichever HTTP library the installed SDK raises its errors with
+        request = openai_http_library().Request("POST", "https://api.openai.com/v1/chat/completions")
+        return error_class(request=request)
+
+    def _create(self, **request):
+        import openai
+        self.requests += 1
+        if any(outage.covers(self.clock.time()) for outage in self.outages):
+            self.clock.sleep(1.0)
+            raise self._error(openai.APIConnectionError)
+        latency = self.rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        if latency > self.timeout or self.rng.random() < self.error_rate:
+            self.clock.sleep(min(latency, self.timeout))
+            raise self._error(openai.APITimeoutError)
+        self.clock.sleep(latency)
+
+        choices = []
+        for index in range(request.get("n", 1)):
+            text = " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(12, 24)))
+            choices.append(SimpleNamespace(index=index, finish_reason="stop",
+                                           message=SimpleNamespace(content=text.capitalize() + ".")))
+        usage = SimpleNamespace(prompt_tokens=400, completion_tokens=40 * len(choices), prompt_tokens_details=None)
+        return SimpleNamespace(choices=choices, usage=usage)
+
+    def _retrieve(self, model: str):
+        self.clock.sleep(0.1)
+        return SimpleNamespace(id=model)
+
+
+class SimulatedTwitterClient:
+    """Stands in for TwitterClient on the virtual clock, with a posting quota and outages
+
+    Tweets (each part of a thread counts) are limited to quota per fixed
+    window of quota_window seconds, like Twitter's per-user posting caps. A
+    post that would wait longer than RATE_LIMIT_MAX_WAIT for the window to
+    reset fails with RateLimited, as it does through the real dispatcher.
+    """
+
+    def __init__(self, config: Config, clock: VirtualClock, rng: random.Random, latency: float = 0.3,
+                 quota: int = 0, quota_window: float = 86400, outages: List[Outage] = ()):
+        self.config = config
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.quota = quota
+        self.quota_window = quota_window
+        self.outages = list(outages)
+        self.user_id = 1000
+        self.breaker = get_breaker("twitter")
+        self.posted: List[Tuple[float, str]] = []  # (virtual time, tweet id)
+        self.window_usage = {}  # window index -> tweets posted in it
+        self.rate_limited = 0
+        self.failures = 0
+        self.ids = iter(range(1900000000000000000, 2 ** 63))
+        self.logger = logging.getLogger(__name__)
+
+    def warm_up(self):
+        self.clock.sleep(self.latency)
+
+    def get_recent_tweets(self, count: int = 5) -> list:
+        return []
+
+    def post_tweet(self, content: str, in_reply_to_tweet_id: str = None, media_ids: List[str] = None) -> dict:
+        """Post content, as a thread if it is too long for one tweet"""
+        parts = split_thread(content, self.config.MAX_TWEET_LENGTH, max_parts=self.config.MAX_THREAD_PARTS)
+        head = None
+        for part in parts:
+            try:
+                tweet_id = call_with_retries(
+                    self._create_tweet,
+                    breaker=self.breaker,
+                    is_retryable=lambda error: isinstance(error, ConnectionError)
+                )
+            except RateLimited as e:
+                self.rate_limited += 1
+                self.logger.warning(f"Tweet not posted: {e}")
+                break
+            except (CircuitOpen, ConnectionError) as e:
+                self.failures += 1
+                self.logger.warning(f"Tweet not posted: {e}")
+                break
+            head = head or {"id": tweet_id, "text": content, "url": f"https://twitter.com/user/status/{tweet_id}"}
+        return head
+
+    def _create_tweet(self) -> str:
+        now = self.clock.time()
+        if any(outage.covers(now) for outage in self.outages):
+            self.clock.sleep(self.latency)
+            raise ConnectionError("Twitter is unavailable")
+        if self.quota:
+            window = int(now // self.quota_window)
+            if self.window_usage.get(window, 0) >= self.quota:
+                wait = (window + 1) * self.quota_window - now
+                if wait > self.config.RATE_LIMIT_MAX_WAIT:
+                    raise RateLimited("create_tweet", wait)
+                self.clock.sleep(wait)
+        self.clock.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        now = self.clock.time()
+        self.window_usage[int(now // self.quota_window)] = self.window_usage.get(int(now // self.quota_window), 0) + 1
+        tweet_id = str(next(self.ids))
+        self.posted.append((now, tweet_id))
+        return tweet_id
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+class Simulation:
+    """Runs BotScheduler and TwitterBot for days of virtual time against stubbed clients
+
+    The real scheduler, generator, dedupe and history code runs; only the
+    OpenAI and Twitter clients are stubbed, and every timer, request latency,
+    retry backoff and breaker timeout runs on a VirtualClock. Due jobs take
+    the first free of SCHEDULER_WORKERS virtual workers, so a slow post makes
+    the next one wait only when every worker is busy, as on the real thread
+    pool. Every random choice is seeded, so a run is repeatable.
+    """
+
+    # Never used, but TwitterBot validates that they are set
+    CREDENTIALS = (
+        "OPENAI_API_KEY", "TWITTER_BEARER_TOKEN", "TWITTER_CONSUMER_KEY",
+        "TWITTER_CONSUMER_SECRET", "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_TOKEN_SECRET"
+    )
+
+    def __init__(self, config: Config = None, days: float = 30, start: datetime = None, slots: int = 0,
+                 quota: int = 0, quota_window: float = 86400, outages: List[Outage] = (),
+                 openai_latency: float = 5.0, openai_error_rate: float = 0.0, twitter_latency: float = 0.3,
+                 context_path: str = 'user_context.json', seed: int = 0, log_level: int = logging.CRITICAL):
+        base = config or Config()
+        overrides = dict.fromkeys(self.CREDENTIALS, "simulation")
+        overrides.update(
+            OPENAI_STREAMING=False,  # The stubbed client answers whole completions
+            OPENAI_MODELS=base.OPENAI_MODELS.split(',')[0],  # Hedges race on threads, not the virtual clock
+            CONTENT_BUFFER_ENABLED=False,
+            JOB_QUEUE_ENABLED=False,
+            MENTIONS_ENABLED=False,
+            CONTEXT_SELECTION="fixed",  # The bandit samples from an unseeded generator
+            POSTING_SCHEDULE=self.spread_slots(slots) if slots else base.POSTING_SCHEDULE,
+            POSTING_TIMEZONE=base.POSTING_TIMEZONE,
+            POSTING_JITTER_SECONDS=base.POSTING_JITTER_SECONDS
+        )
+        self.config = Config(**overrides)
+        tz = ZoneInfo(self.config.POSTING_TIMEZONE) if self.config.POSTING_TIMEZONE else None
+        self.start = start or datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.days = days
+        self.quota = quota
+        self.quota_window = quota_window
+        self.outages = list(outages)
+        self.openai_latency = openai_latency
+        self.openai_error_rate = openai_error_rate
+        self.twitter_latency = twitter_latency
+        self.context_path = os.path.abspath(context_path)
+        self.seed = seed
+        self.log_level = log_level
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def spread_slots(count: int) -> str:
+        """POSTING_SCHEDULE with count slots spread evenly over the day"""
+        minutes = [i * 1440 // count for i in range(count)]
+        return ",".join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in minutes)
+
+    def run(self) -> dict:
+        """Simulate the configured days and report slots, latencies and quota usage"""
+        from bot import TwitterBot
+        from scheduler import BotScheduler
+
+        random.seed(self.seed)
+        rng = random.Random(self.seed)
+        clock = VirtualClock(self.start.timestamp())
+        end = clock.time() + self.days * 86400
+        workdir = tempfile.mkdtemp(prefix="bot-simulation-")
+        previous_clock = use_clock(clock.time, clock.sleep)
+        wall_start = time.perf_counter()
+        try:
+            with self._virtual_logging(clock):
+                openai = SimulatedOpenAI(
+                    clock, rng, latency_median=self.openai_latency, error_rate=self.openai_error_rate,
+                    timeout=self.config.OPENAI_TIMEOUT,
+                    outages=[outage for outage in self.outages if outage.provider == "openai"]
+                )
+                bot = TwitterBot(self.config, context_path=self.context_path,
+                                 history_path=os.path.join(workdir, "post_history.db"),
+                                 name="simulation", openai_client=openai)
+                twitter = bot.twitter_client = SimulatedTwitterClient(
+                    self.config, clock, rng, latency=self.twitter_latency, quota=self.quota,
+                    quota_window=self.quota_window,
+                    outages=[outage for outage in self.outages if outage.provider == "twitter"]
+                )
+                scheduler = BotScheduler(bot=bot, clock=clock.time)
+                scheduler.setup_schedule()
+
+                free_at = [clock.time()] * max(1, self.config.SCHEDULER_WORKERS)
+                slots = []
+                for job in scheduler.timer.jobs:
+                    job.func = self._on_worker(job, job.func, clock, free_at, slots, openai, twitter)
+
+                while True:
+                    next_run = scheduler.timer.next_run()
+                    if next_run is None or next_run.timestamp() >= end:
+                        break
+                    clock.set(next_run.timestamp())
+                    scheduler.timer.run_pending()
+            bot.history.close()
+        finally:
+            use_clock(*previous_clock)
+            shutil.rmtree(workdir, ignore_errors=True)
+        return self._report(slots, openai, twitter, time.perf_counter() - wall_start)
+
+    def _on_worker(self, job, func, clock: VirtualClock, free_at: List[float], slots: List[dict],
+                   openai: SimulatedOpenAI, twitter: SimulatedTwitterClient):
+        """Wrap a job to run on the first free virtual worker, recording how each post slot went"""
+        def run():
+            due = clock.time()
+            worker = min(range(len(free_at)), key=free_at.__getitem__)
+            started = max(due, free_at[worker])
+            clock.set(started)
+            before = (len(twitter.posted), twitter.rate_limited, twitter.failures, openai.failures)
+            func()
+            free_at[worker] = clock.time()
+            clock.set(due)
+            if "post" not in job.tags:
+                return
+
+            slot = {"due": due, "queued": started - due}
+            if len(twitter.posted) > before[0]:
+                slot["latency"] = twitter.posted[before[0]][0] - due
+            elif twitter.rate_limited > before[1]:
+                slot["missed"] = "rate_limited"
+            elif twitter.failures > before[2]:
+                slot["missed"] = "twitter_error"
+            elif openai.failures > before[3]:
+                slot["missed"] = "openai_error"
+            else:
+                slot["missed"] = "rejected"
+            slots.append(slot)
+        return run
+
+    @contextmanager
+    def _virtual_logging(self, clock: VirtualClock):
+        """Stamp log records with virtual time and keep a month of posts out of the log"""
+        def stamp(record: logging.LogRecord) -> bool:
+            record.created = clock.time()
+            record.msecs = (record.created % 1) * 1000
+            return True
+
+        setup_logging(self.config)
+        root = logging.getLogger()
+        level = root.level
+        root.setLevel(self.log_level)
+        for handler in root.handlers:
+            handler.addFilter(stamp)
+        try:
+            yield
+        finally:
+            for handler in root.handlers:
+                handler.removeFilter(stamp)
+            root.setLevel(level)
+
+    def _report(self, slots: List[dict], openai: SimulatedOpenAI, twitter: SimulatedTwitterClient,
+                wall_seconds: float) -> dict:
+        latencies = [slot["latency"] for slot in slots if "latency" in slot]
+        missed = {}
+        for slot in slots:
+            if "missed" in slot:
+                missed[slot["missed"]] = missed.get(slot["missed"], 0) + 1
+        usage = list(twitter.window_usage.values())
+        return {
+            "days": self.days,
+            "start": self.start.isoformat(),
+            "schedule": self.config.POSTING_SCHEDULE if len(self.config.POSTING_SCHEDULE) < 80
+                        else f"{self.config.POSTING_SCHEDULE.count(',') + 1} slots per day",
+            "slots": len(slots),
+            "posted": len(latencies),
+            "missed": missed,
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "latency_p99": _percentile(latencies, 99),
+            "latency_max": max(latencies, default=0.0),
+            "queued_slots": sum(slot["queued"] > 0 for slot in slots),
+            "queued_max": max((slot["queued"] for slot in slots), default=0.0),
+            "tweets": len(twitter.posted),
+            "quota": self.quota,
+            "quota_window_hours": self.quota_window / 3600,
+            "quota_peak": max(usage, default=0),
+            "quota_exhausted_windows": sum(used >= self.quota for used in usage) if self.quota else 0,
+            "rate_limited": twitter.rate_limited,
+            "openai_requests": openai.requests,
+            "openai_failures": openai.failures,
+            "wall_seconds": wall_seconds,
+            "speedup": self.days * 86400 / max(wall_seconds, 1e-9)
+        }
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+class TimelineStore:
+    """Local copy of the account's own timeline with engagement metrics
+
+    Filled incrementally by TwitterClient.sync_timeline: the newest tweet id
+    of the last completed sync is the since_id of the next one, so refreshes
+    only fetch what is new. A sync that stops partway keeps its pagination
+    token, and the next one resumes from there before moving since_id on, so
+    older pages are never skipped. Backed by SQLite in WAL mode like the post
+    history.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tweets (
+            tweet_id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            created_at TEXT,
+            retweet_count INTEGER DEFAULT 0,
+            reply_count INTEGER DEFAULT 0,
+            like_count INTEGER DEFAULT 0,
+            quote_count INTEGER DEFAULT 0,
+            impression_count INTEGER DEFAULT 0,
+            synced_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tweets_created_at ON tweets (created_at);
+        CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    METRICS = ["retweet_count", "reply_count", "like_count", "quote_count", "impression_count"]
+
+    def __init__(self, path: str = 'timeline.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def sync_cursor(self) -> dict:
+        """Where the next sync starts: since_id, plus the pagination token and newest id of an unfinished one"""
+        with self.lock:
+            state = dict(self.conn.execute("SELECT name, value FROM sync_state").fetchall())
+            if "since_id" not in state:
+                # Stores from before sync state was kept
+                latest = self.conn.execute("SELECT MAX(tweet_id) FROM tweets").fetchone()[0]
+                state["since_id"] = str(latest) if latest else None
+        return {
+            "since_id": int(state["since_id"]) if state.get("since_id") else None,
+            "pagination_token": state.get("pagination_token"),
+            "newest_id": int(state["newest_id"]) if state.get("newest_id") else None
+        }
+
+    def save_sync_progress(self, since_id: Optional[int], pagination_token: str, newest_id: Optional[int]):
+        """Remember the since_id and next page of a sync in progress and the newest tweet it has seen"""
+        self._set_sync_state(since_id=since_id, pagination_token=pagination_token, newest_id=newest_id)
+
+    def finish_sync(self, newest_id: Optional[int]):
+        """Move since_id up to newest_id once every page of a sync is stored"""
+        since_id = max(filter(None, [newest_id, self.sync_cursor()["since_id"]]), default=None)
+        self._set_sync_state(since_id=since_id, pagination_token=None, newest_id=None)
+
+    def _set_sync_state(self, **values):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)",
+                [(name, None if value is None else str(value)) for name, value in values.items()]
+            )
+
+    def upsert(self, tweets: List[dict]):
+        """Insert tweets or update the metrics of ones already stored"""
+        synced_at = datetime.now().isoformat()
+        rows = [
+            {
+                "tweet_id": int(tweet["id"]),
+                "text": tweet["text"],
+                "created_at": tweet.get("created_at"),  # UTC ISO timestamp
+                "synced_at": synced_at,
+                **{metric: tweet.get("public_metrics", {}).get(metric, 0) for metric in self.METRICS}
+            }
+            for tweet in tweets
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO tweets (tweet_id, text, created_at, retweet_count, reply_count, like_count, "
+                "quote_count, impression_count, synced_at) VALUES (:tweet_id, :text, :created_at, "
+                ":retweet_count, :reply_count, :like_count, :quote_count, :impression_count, :synced_at) "
+                "ON CONFLICT (tweet_id) DO UPDATE SET retweet_count = excluded.retweet_count, "
+                "reply_count = excluded.reply_count, like_count = excluded.like_count, "
+                "quote_count = excluded.quote_count, impression_count = excluded.impression_count, "
+                "synced_at = excluded.synced_at",
+                rows
+            )
+
+    def ids_since(self, days: int) -> List[int]:
+        """Ids of stored tweets created in the last `days` days"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT tweet_id FROM tweets WHERE created_at >= ? ORDER BY tweet_id DESC", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def recent(self, limit: int = 10) -> List[dict]:
+        """Newest stored tweets with their metrics"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM tweets ORDER BY tweet_id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        """Number of stored tweets"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+class Job:
+    """A job that runs every day at a wall-clock time in a given time zone"""
+
+    def __init__(self, func, at: str, tz: str = None, jitter: float = 0, tags=(), name: str = None):
+        hour, minute = (int(part) for part in at.split(':'))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid time of day: {at}")
+        self.func = func
+        self.at = at
+        self.hour = hour
+        self.minute = minute
+        self.tz = ZoneInfo(tz) if tz else None
+        self.jitter = jitter
+        self.tags = set(tags)
+        self.name = name or getattr(func, "__name__", "job")
+        self.cancelled = False
+        self.next_run: Optional[datetime] = None
+        self.last_run: Optional[datetime] = None
+
+    def schedule_next(self, now: float) -> float:
+        """Set next_run to the first occurrence after `now` (epoch seconds), plus jitter"""
+        current = datetime.fromtimestamp(now, self.tz) if self.tz else datetime.fromtimestamp(now)
+        slot = current.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if slot.timestamp() <= now:
+            slot = (slot.replace(tzinfo=None) + timedelta(days=1)).replace(tzinfo=self.tz)
+        if self.jitter:
+            slot += timedelta(seconds=random.uniform(0, self.jitter))
+        self.next_run = slot
+        return slot.timestamp()
+
+    def __repr__(self):
+        zone = f" {self.tz.key}" if self.tz else ""
+        return f"Job({self.name} daily at {self.at}{zone}, next run {self.next_run})"
+
+
+class TimerScheduler:
+    """Heap-based scheduler that sleeps exactly until the next due job
+
+    Jobs sit in a min-heap keyed by their next run time. The timer thread waits
+    on a condition until the earliest one is due, and is woken straight away
+    when jobs are added or cancelled or the scheduler stops, so nothing polls
+    and thousands of jobs cost nothing while idle. Due jobs run on a small
+    thread pool so a slow post never delays the next job.
+    """
+
+    def __init__(self, max_workers: int = 4, clock=time.time):
+        self.clock = clock
+        self.heap: List[tuple] = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.max_workers = max_workers
+        self.executor = None
+        self.running = False
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def every_day_at(self, func, at: str, tz: str = None, jitter: float = 0, tags=(), name: str = None) -> Job:
+        """Schedule func to run daily at HH:MM in time zone tz (local time by default)"""
+        job = Job(func, at, tz=tz, jitter=jitter, tags=tags, name=name)
+        with self.condition:
+            self._push(job, job.schedule_next(self.clock()))
+            self.condition.notify()
+        return job
+
+    def _push(self, job: Job, run_at: float):
+        heapq.heappush(self.heap, (run_at, next(self.sequence), job))
+
+    def cancel(self, job: Job):
+        """Cancel a job; it is dropped from the heap lazily"""
+        with self.condition:
+            job.cancelled = True
+            self.condition.notify()
+
+    def clear(self, tag: str = None):
+        """Cancel every job, or only the jobs carrying a tag"""
+        with self.condition:
+            for _, _, job in self.heap:
+                if tag is None or tag in job.tags:
+                    job.cancelled = True
+            self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.condition.notify()
+
+    @property
+    def jobs(self) -> List[Job]:
+        """Active jobs ordered by next run"""
+        with self.condition:
+            return [job for _, _, job in sorted(self.heap) if not job.cancelled]
+
+    def next_run(self) -> Optional[datetime]:
+        """When the earliest active job runs next"""
+        with self.condition:
+            self._drop_cancelled()
+            return self.heap[0][2].next_run if self.heap else None
+
+    def _drop_cancelled(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+    def _pop_due(self, now: float) -> List[Job]:
+        """Remove due jobs from the heap and reschedule them (caller holds the condition)"""
+        due = []
+        while self.heap:
+            run_at, _, job = self.heap[0]
+            if job.cancelled:
+                heapq.heappop(self.heap)
+                continue
+            if run_at > now:
+                break
+            heapq.heappop(self.heap)
+            due.append(job)
+            job.last_run = job.next_run
+            self._push(job, job.schedule_next(max(now, run_at)))
+        return due
+
+    def _run_job(self, job: Job):
+        try:
+            job.func()
+        except Exception as e:
+            self.logger.error(f"Error running {job.name}: {e}")
+
+    def run_pending(self) -> int:
+        """Run every due job in the calling thread, returning how many ran"""
+        with self.condition:
+            due = self._pop_due(self.clock())
+        for job in due:
+            self._run_job(job)
+        return len(due)
+
+    def start(self):
+        """Start the timer thread"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scheduler")
+        self.thread = threading.Thread(target=self._timer_loop, daemon=True)
+        self.thread.start()
+
+    def _timer_loop(self):
+        with self.condition:
+            while self.running:
+                now = self.clock()
+                for job in self._pop_due(now):
+                    self.executor.submit(self._run_job, job)
+                self._drop_cancelled()
+                timeout = max(0.0, self.heap[0][0] - self.clock()) if self.heap else None
+                self.condition.wait(timeout)
+
+    def stop(self, wait: bool = False):
+        """Stop the timer thread immediately, optionally waiting for running jobs"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+        if self.executor:
+            self.executor.shutdown(wait=wait)
@@ -0,0 +1,154 @@
+import re
+import unicodedata
+from typing import List
+
+# Twitter's weighted length (twitter-text v3): code points in these ranges
+# count 1, everything else (CJK, most emoji) counts 2, and every URL counts
+# 23 no matter how long it is
+LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+URL_LENGTH = 23
+MAX_WEIGHTED_LENGTH = 280
+
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+# An emoji sequence counts as one emoji however many code points it takes: a
+# flag, or a character with its variation selector, skin tone, tag or keycap
+# marks and every emoji joined on with a ZWJ
+EMOJI_SEQUENCE = re.compile(
+    '[\U0001F1E6-\U0001F1FF]{2}'
+    '|\\S(?:[\ufe0f\u20e3\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]|\u200d[^\u0000-\u10ff])+'
+)
+EMOJI_WEIGHT = 2
+# Stray joiners, variation selectors, skin tones and tag characters add nothing
+EMOJI_MODIFIERS = re.compile('[\u200d\ufe0e\ufe0f\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]')
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|\n+')
+# "1/ ... 2/ ..." style threads the model sometimes writes itself
+THREAD_MARKER = re.compile(r'(?:^|\s+)(?=\d{1,2}/\s)')
+THREAD_NUMBER = re.compile(r'(\d{1,2})/\s')
+
+def _char_weight(char: str) -> int:
+    code = ord(char)
+    for low, high in LIGHT_RANGES:
+        if low <= code <= high:
+            return 1
+    return 2
+
+def weighted_length(text: str) -> int:
+    """Length of a tweet the way Twitter counts it against the 280 limit"""
+    text = unicodedata.normalize('NFC', text)
+    if text.isascii() and '://' not in text and 'www.' not in text.lower():
+        return len(text)
+
+    length = 0
+    position = 0
+    for match in URL_PATTERN.finditer(text):
+        length += _text_weight(text[position:match.start()]) + URL_LENGTH
+        position = match.end()
+    return length + _text_weight(text[position:])
+
+def _text_weight(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    length = 0
+    position = 0
+    for match in EMOJI_SEQUENCE.finditer(text):
+        length += _plain_weight(text[position:match.start()]) + EMOJI_WEIGHT
+        position = match.end()
+    return length + _plain_weight(text[position:])
+
+def _plain_weight(text: str) -> int:
+    return sum(_char_weight(char) for char in EMOJI_MODIFIERS.sub('', text))
+
+def fits(text: str, max_length: int = MAX_WEIGHTED_LENGTH) -> bool:
+    """Whether text fits in a single tweet"""
+    return weighted_length(text) <= max_length
+
+def sentence_prefix(text: str, max_length: int = MAX_WEIGHTED_LENGTH) -> str:
+    """The most whole sentences from the start of text that fit max_length, or "" if not even one does"""
+    prefix = ""
+    for match in SENTENCE_END.finditer(text):
+        candidate = text[:match.start()].strip()
+        if not fits(candidate, max_length):
+            break
+        prefix = candidate
+    return prefix
+
+def _numbered_parts(text: str) -> List[str]:
+    """The model's own "1/ ... 2/ ..." thread parts, or [] if it did not write one"""
+    parts = [part.strip() for part in THREAD_MARKER.split(text) if part.strip()]
+    numbers = [THREAD_NUMBER.match(part) for part in parts]
+    if len(parts) > 1 and all(numbers) and [int(m.group(1)) for m in numbers] == list(range(1, len(parts) + 1)):
+        return parts
+    return []
+
+def _sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence.strip()]
+
+def _split_long(piece: str, budget: int) -> List[str]:
+    """Break one over-long sentence on word boundaries (or hard, for a single huge word)"""
+    parts, current = [], ""
+    for word in piece.split():
+        candidate = f"{current} {word}" if current else word
+        if weighted_length(candidate) <= budget:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        while weighted_length(word) > budget:
+            cut = budget
+            while weighted_length(word[:cut]) > budget:
+                cut -= 1
+            parts.append(word[:cut])
+            word = word[cut:]
+        current = word
+    if current:
+        parts.append(current)
+    return parts
+
+def split_thread(text: str, max_length: int = MAX_WEIGHTED_LENGTH, max_parts: int = None) -> List[str]:
+    """Split text into tweets that each fit, on sentence boundaries
+
+    Text that already fits comes back as a single part. Longer text is packed
+    sentence by sentence into as few tweets as possible; a numbered " i/n"
+    suffix is added unless the model already numbered its own thread in
+    parts that each fit. With max_parts, anything beyond that many tweets is
+    dropped.
+    """
+    text = text.strip()
+    if fits(text, max_length):
+        return [text]
+
+    pieces = _numbered_parts(text)
+    if not all(fits(piece, max_length) for piece in pieces):
+        # Splitting one of the model's parts would leave the rest unnumbered, so number the thread afresh
+        text = " ".join(piece[THREAD_NUMBER.match(piece).end():] for piece in pieces)
+        pieces = []
+    already_numbered = bool(pieces)
+    if not already_numbered:
+        pieces = _sentences(text)
+    # Room for a " 10/10" suffix keeps the packing the same once numbers are added
+    budget = max_length if already_numbered else max_length - 6
+
+    parts, current = [], ""
+    for piece in pieces:
+        if already_numbered:
+            parts.append(piece)
+            continue
+        candidate = f"{current} {piece}" if current else piece
+        if fits(candidate, budget):
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        if fits(piece, budget):
+            current = piece
+        else:
+            *full, current = _split_long(piece, budget)
+            parts.extend(full)
+    if current:
+        parts.append(current)
+
+    if max_parts:
+        parts = parts[:max_parts]
+    if not already_numbered and len(parts) > 1:
+        parts = [f"{part} {i}/{len(parts)}" for i, part in enumerate(parts, 1)]
+    return parts
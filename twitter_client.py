@@ -1,14 +1,44 @@
-import tweepy
-from typing import Optional
+import hashlib
+import html
+import logging
+import re
+import time
+from typing import List, Optional
 from config import Config
+from dispatcher import RateLimited, get_dispatcher
+from http_pool import twitter_adapter
+from metrics import FAILURES, STAGE_SECONDS
+from resilience import CircuitOpen, call_with_retries, get_breaker
+from tweet_text import fits, split_thread, weighted_length
 
 class TwitterClient:
-    def __init__(self):
-        self.config = Config()
-        self.client = self._authenticate()
+    DEFAULT_API_HOST = "https://api.twitter.com"
     
-    def _authenticate(self) -> tweepy.Client:
+    def __init__(self, config: Config = None, dispatcher=None):
+        self.config = config or Config()
+        self.dispatcher = dispatcher or get_dispatcher()
+        self.logger = logging.getLogger(__name__)
+        self._client = None
+        self._user_id = None
+        self._media_uploader = None
+        
+        # Rate limits are per user, so endpoints are tracked per access token; so is the
+        # breaker, so one account's failures never stop the others from posting
+        token = (self.config.TWITTER_ACCESS_TOKEN or "").encode()
+        self.rate_limit_key = hashlib.sha1(token).hexdigest()[:8]
+        self.breaker = get_breaker(f"twitter:{self.rate_limit_key}")
+    
+    @property
+    def client(self):
+        """Authenticated tweepy client, created on first API use"""
+        if self._client is None:
+            self._client = self._authenticate()
+        return self._client
+    
+    def _authenticate(self):
         """Authenticate with Twitter API v2"""
+        import tweepy
+        
         try:
             # Use API v2 Client with OAuth 1.0a for posting
             client = tweepy.Client(
@@ -17,30 +47,129 @@ class TwitterClient:
                 consumer_secret=self.config.TWITTER_CONSUMER_SECRET,
                 access_token=self.config.TWITTER_ACCESS_TOKEN,
                 access_token_secret=self.config.TWITTER_ACCESS_TOKEN_SECRET,
-                wait_on_rate_limit=True
+                # The dispatcher queues calls against each endpoint's budget
+                # instead of letting tweepy sleep in the calling thread
+                wait_on_rate_limit=False
+            )
+            client.session.hooks['response'].append(
+                lambda response, *args, **kwargs: self.dispatcher.record_response(response)
             )
+            self._patch_session(client.session)
+            adapter = twitter_adapter(self.config)
+            client.session.mount('https://', adapter)
+            client.session.mount('http://', adapter)
             
             # Test authentication by getting user info
-            me = client.get_me()
-            print(f"Twitter authentication successful! Logged in as: @{me.data.username}")
+            me = self._call('get_me', client.get_me)
+            self._user_id = me.data.id
+            self.logger.info(f"Twitter authentication successful! Logged in as: @{me.data.username}")
             return client
             
         except Exception as e:
-            print(f"Twitter authentication failed: {e}")
+            self.logger.error(f"Twitter authentication failed: {e}")
             raise
     
-    def post_tweet(self, content: str) -> Optional[dict]:
-        """Post a tweet using API v2"""
+    def warm_up(self):
+        """Authenticate, or re-check the credentials, over a pooled connection ahead of a post"""
+        if self._client is None:
+            self.client
+            return
+        me = self._call('get_me', self.client.get_me)
+        self._user_id = me.data.id
+    
+    def _patch_session(self, session):
+        """Give every tweepy request our timeout and, if configured, another API host
+        
+        tweepy sends requests without a timeout and always to api.twitter.com;
+        TWITTER_API_BASE_URL points it at a local stand-in server instead.
+        """
+        send = session.request
+        base_url = self.config.TWITTER_API_BASE_URL
+        timeout = self.config.TWITTER_TIMEOUT
+        
+        def request(method, url, **kwargs):
+            if base_url:
+                url = url.replace(self.DEFAULT_API_HOST, base_url.rstrip('/'), 1)
+            kwargs.setdefault('timeout', timeout)
+            return send(method, url, **kwargs)
+        
+        session.request = request
+    
+    def _call(self, endpoint: str, func, *args, **kwargs):
+        """Send a call through the rate-limit dispatcher
+        
+        Raises RateLimited instead of waiting when the endpoint's budget would
+        not free up within RATE_LIMIT_MAX_WAIT seconds.
+        """
+        return self.dispatcher.call(
+            f"{self.rate_limit_key}:{endpoint}",
+            func,
+            *args,
+            max_wait=self.config.RATE_LIMIT_MAX_WAIT,
+            **kwargs
+        )
+    
+    def rate_limit_status(self) -> dict:
+        """Budget and expected wait of this account's endpoints"""
+        prefix = f"{self.rate_limit_key}:"
+        return {
+            endpoint[len(prefix):]: status
+            for endpoint, status in self.dispatcher.status().items()
+            if endpoint.startswith(prefix)
+        }
+    
+    @property
+    def user_id(self) -> int:
+        """Id of the authenticated user, looked up once per client"""
+        if self._user_id is None:
+            self._client = self._authenticate()
+        return self._user_id
+    
+    @property
+    def media_uploader(self):
+        """Chunked media uploader for this account, created on first use"""
+        if self._media_uploader is None:
+            from media import MediaUploader
+            self._media_uploader = MediaUploader(self)
+        return self._media_uploader
+    
+    def upload_media(self, paths: List[str]) -> List[str]:
+        """Upload a tweet's attachments in parallel, returning their media ids"""
+        return self.media_uploader.upload_all(paths)
+    
+    def post_tweet(self, content: str, in_reply_to_tweet_id: str = None,
+                   media_ids: List[str] = None) -> Optional[dict]:
+        """Post a tweet using API v2, as a reply thread if it is too long for one"""
+        parts = split_thread(content, self.config.MAX_TWEET_LENGTH, max_parts=self.config.MAX_THREAD_PARTS)
+        if len(parts) > 1:
+            return self.post_thread(parts, in_reply_to_tweet_id, media_ids=media_ids)
+        content = parts[0]
+        
+        import tweepy
+        
+        start = time.perf_counter()
         try:
-            if len(content) > Config.MAX_TWEET_LENGTH:
-                print(f"Tweet too long: {len(content)} characters")
+            if not fits(content, self.config.MAX_TWEET_LENGTH):
+                FAILURES.inc(stage="twitter_post", cause="too_long")
+                self.logger.error(f"Tweet too long: {weighted_length(content)} characters")
                 return None
             
-            # Post the tweet using API v2
-            response = self.client.create_tweet(text=content)
+            # Post the tweet using API v2. A timed-out attempt may still have
+            # gone through, so check the timeline before every retry
+            try:
+                tweet_id = call_with_retries(
+                    lambda: self._create_tweet(content, in_reply_to_tweet_id, media_ids),
+                    breaker=self.breaker,
+                    is_retryable=self._is_retryable,
+                    before_retry=lambda error: self._find_posted(content)
+                )
+            except tweepy.Forbidden as e:
+                # An earlier attempt we could not confirm did post the tweet
+                tweet_id = self._find_posted(content) if "duplicate" in str(e).lower() else None
+                if not tweet_id:
+                    raise
             
-            if response.data:
-                tweet_id = response.data['id']
+            if tweet_id:
                 result = {
                     "id": tweet_id,
                     "text": content,
@@ -48,35 +177,170 @@ class TwitterClient:
                     "url": f"https://twitter.com/user/status/{tweet_id}"
                 }
                 
-                print(f"Tweet posted successfully: {result['url']}")
+                self.logger.info(
+                    f"Tweet posted successfully: {result['url']}",
+                    extra={"tweet_id": tweet_id, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+                )
                 return result
             else:
-                print("Tweet posting failed - no response data")
+                FAILURES.inc(stage="twitter_post", cause="no_data")
+                self.logger.error("Tweet posting failed - no response data")
                 return None
             
+        except (RateLimited, CircuitOpen) as e:
+            FAILURES.inc(stage="twitter_post", cause=type(e).__name__)
+            self.logger.warning(f"Tweet not posted: {e}")
+            return None
         except tweepy.TweepyException as e:
-            print(f"Error posting tweet: {e}")
+            FAILURES.inc(stage="twitter_post", cause=type(e).__name__)
+            self.logger.error(f"Error posting tweet: {e}")
             if "403" in str(e):
-                print("💡 This looks like an API access issue. You may need:")
-                print("   1. Elevated access from Twitter Developer Portal")
-                print("   2. Or upgrade to a paid Twitter API plan")
-                print("   3. See: https://developer.twitter.com/en/portal/product")
+                self.logger.error(
+                    "💡 This looks like an API access issue. You may need elevated access from the "
+                    "Twitter Developer Portal or a paid Twitter API plan, "
+                    "see https://developer.twitter.com/en/portal/product"
+                )
             return None
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            FAILURES.inc(stage="twitter_post", cause=type(e).__name__)
+            self.logger.exception(f"Unexpected error: {e}")
+            return None
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="twitter_post")
+    
+    def post_thread(self, parts: List[str], in_reply_to_tweet_id: str = None,
+                    media_ids: List[str] = None) -> Optional[dict]:
+        """Post parts as a reply chain, returning the first tweet with every posted id
+        
+        Media is attached to the first tweet. If a later part fails the tweets
+        already posted stay up; the result then has thread_complete set to False.
+        """
+        head = None
+        thread_ids = []
+        for part in parts:
+            result = self.post_tweet(
+                part,
+                in_reply_to_tweet_id=thread_ids[-1] if thread_ids else in_reply_to_tweet_id,
+                media_ids=None if thread_ids else media_ids
+            )
+            if not result:
+                break
+            head = head or result
+            thread_ids.append(result["id"])
+        
+        if head is None:
             return None
+        if len(thread_ids) < len(parts):
+            FAILURES.inc(stage="twitter_post", cause="thread_incomplete")
+            self.logger.warning(f"Thread stopped after {len(thread_ids)} of {len(parts)} tweets")
+        return dict(head, thread_ids=thread_ids, thread_complete=len(thread_ids) == len(parts))
+    
+    def _create_tweet(self, content: str, in_reply_to_tweet_id: str = None,
+                      media_ids: List[str] = None) -> Optional[str]:
+        """Send one create_tweet request, returning the new tweet id"""
+        response = self._call(
+            'create_tweet',
+            self.client.create_tweet,
+            text=content,
+            in_reply_to_tweet_id=in_reply_to_tweet_id,
+            media_ids=media_ids or None
+        )
+        return response.data['id'] if response.data else None
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Timeouts, connection errors and 5xx responses are worth retrying"""
+        import requests
+        import tweepy
+        return isinstance(error, (
+            tweepy.TwitterServerError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError
+        ))
+    
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        """Compare tweets the way Twitter stores them: links shortened, entities escaped"""
+        text = re.sub(r'https?://\S+', '', html.unescape(text))
+        return ' '.join(text.split())
+    
+    def find_posted(self, content: str) -> Optional[str]:
+        """Id of a recent tweet of ours, or of a thread's first tweet, carrying this content"""
+        parts = split_thread(content, self.config.MAX_TWEET_LENGTH, max_parts=self.config.MAX_THREAD_PARTS)
+        return self._find_posted(parts[0])
+    
+    def _find_posted(self, content: str) -> Optional[str]:
+        """Id of a recent tweet of ours with this content, if one exists"""
+        try:
+            response = self._call(
+                'get_users_tweets',
+                self.client.get_users_tweets,
+                id=self.user_id,
+                max_results=5
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not check whether the tweet was posted: {e}")
+            return None
+        
+        wanted = self._normalize_text(content)
+        for tweet in response.data or []:
+            if self._normalize_text(tweet.text) == wanted:
+                self.logger.info(
+                    f"Found tweet {tweet.id} from an earlier attempt, not posting again",
+                    extra={"tweet_id": str(tweet.id)}
+                )
+                return str(tweet.id)
+        return None
+    
+    def get_mentions(self, since_id: str = None, max_pages: int = 5) -> List[dict]:
+        """Tweets mentioning us that are newer than since_id, oldest first, with their authors
+        
+        Pages through at most max_pages pages of 100; anything older is
+        picked up by the next call, since its since_id comes from the
+        newest mention returned here.
+        """
+        mentions = []
+        pagination_token = None
+        for _ in range(max_pages):
+            response = self._call(
+                'get_users_mentions',
+                self.client.get_users_mentions,
+                id=self.user_id,
+                since_id=since_id,
+                pagination_token=pagination_token,
+                max_results=100,
+                tweet_fields=['created_at', 'author_id', 'conversation_id', 'referenced_tweets'],
+                expansions=['author_id'],
+                user_fields=['username', 'public_metrics']
+            )
+            users = {str(user.id): user for user in (response.includes or {}).get('users', [])}
+            for tweet in response.data or []:
+                author = users.get(str(tweet.author_id))
+                mentions.append({
+                    "id": str(tweet.id),
+                    "text": tweet.text,
+                    "author_id": str(tweet.author_id),
+                    "username": author.username if author else None,
+                    "followers": ((author.public_metrics or {}).get('followers_count', 0) if author else 0),
+                    "conversation_id": str(tweet.conversation_id or tweet.id),
+                    "created_at": tweet.created_at.isoformat() if tweet.created_at else None,
+                    "is_retweet": any(ref.type == 'retweeted' for ref in tweet.referenced_tweets or [])
+                })
+            pagination_token = (response.meta or {}).get('next_token')
+            if not pagination_token:
+                break
+        mentions.sort(key=lambda mention: int(mention["id"]))
+        return mentions
     
     def get_recent_tweets(self, count: int = 5) -> list:
         """Get recent tweets from authenticated user using API v2"""
         try:
-            # Get authenticated user first
-            me = self.client.get_me()
-            user_id = me.data.id
-            
             # Get user's tweets (API v2 requires min 5, max 100)
-            tweets = self.client.get_users_tweets(
-                id=user_id, 
-                max_results=max(5, min(count, 10)),  # API v2 requires minimum 5
+            tweets = self._call(
+                'get_users_tweets',
+                self.client.get_users_tweets,
+                id=self.user_id, 
+                max_results=max(5, min(count, 100)),  # API v2 requires minimum 5
                 tweet_fields=['created_at', 'public_metrics']
             )
             
@@ -92,7 +356,98 @@ class TwitterClient:
                     "favorite_count": tweet.public_metrics.get('like_count', 0)
                 }
                 for tweet in tweets.data
-            ]
+            ][:count]
         except Exception as e:
-            print(f"Error fetching recent tweets: {e}")
-            return [] 
\ No newline at end of file
+            self.logger.error(f"Error fetching recent tweets: {e}")
+            return []
+    
+    @staticmethod
+    def _tweet_record(tweet) -> dict:
+        """Plain dict of a tweepy Tweet for the timeline store"""
+        return {
+            "id": tweet.id,
+            "text": tweet.text,
+            "created_at": tweet.created_at.isoformat() if tweet.created_at else None,
+            "public_metrics": tweet.public_metrics or {}
+        }
+    
+    def sync_timeline(self, store, refresh_days: int = None, engagement=None) -> dict:
+        """Incrementally copy our own timeline into a TimelineStore
+        
+        Only tweets newer than the last completed sync are fetched (since_id),
+        paging with next_token, so after the first sync a refresh is usually a
+        single request. Progress is saved after every page and since_id only
+        moves on once the last page is stored, so a sync cut short by a rate
+        limit or an error resumes where it stopped next time. Metrics of tweets from the last `refresh_days` days are
+        then refreshed in batches of 100 ids. With an EngagementStore, every
+        tweet seen also gets a metrics snapshot appended there.
+        """
+        if refresh_days is None:
+            refresh_days = self.config.TIMELINE_METRICS_REFRESH_DAYS
+        
+        import tweepy
+        
+        cursor = store.sync_cursor()
+        since_id = cursor["since_id"]
+        pagination_token = cursor["pagination_token"]
+        newest_id = cursor["newest_id"]
+        resumed = bool(pagination_token)
+        if resumed:
+            self.logger.info("Resuming an unfinished timeline sync")
+        fetched_ids = set()
+        requests = 0
+        
+        while True:
+            try:
+                response = self._call(
+                    'get_users_tweets',
+                    self.client.get_users_tweets,
+                    id=self.user_id,
+                    since_id=since_id,
+                    pagination_token=pagination_token,
+                    max_results=100,
+                    tweet_fields=['created_at', 'public_metrics']
+                )
+            except tweepy.BadRequest:
+                if not (resumed and requests == 0):
+                    raise
+                # The saved token has expired; walk the pages since since_id again
+                self.logger.warning("Saved pagination token was rejected, restarting the timeline sync")
+                pagination_token, resumed = None, False
+                continue
+            requests += 1
+            
+            if response.data:
+                records = [self._tweet_record(tweet) for tweet in response.data]
+                store.upsert(records)
+                if engagement is not None:
+                    engagement.append(records)
+                fetched_ids.update(tweet.id for tweet in response.data)
+                newest_id = max(filter(None, [newest_id] + [int(tweet.id) for tweet in response.data]))
+            
+            pagination_token = (response.meta or {}).get('next_token')
+            if not pagination_token:
+                break
+            store.save_sync_progress(since_id, pagination_token, newest_id)
+        store.finish_sync(newest_id)
+        
+        refreshed = 0
+        if refresh_days:
+            # Tweets fetched just now already carry fresh metrics
+            ids = [tweet_id for tweet_id in store.ids_since(refresh_days) if tweet_id not in fetched_ids]
+            for start in range(0, len(ids), 100):
+                response = self._call(
+                    'get_tweets',
+                    self.client.get_tweets,
+                    ids=ids[start:start + 100],
+                    tweet_fields=['created_at', 'public_metrics']
+                )
+                requests += 1
+                if response.data:
+                    records = [self._tweet_record(tweet) for tweet in response.data]
+                    store.upsert(records)
+                    if engagement is not None:
+                        engagement.append(records)
+                    refreshed += len(response.data)
+        
+        return {"new": len(fetched_ids), "refreshed": refreshed, "requests": requests}
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from job_queue import DEFAULT_ACCOUNT, POST_JOB, Job, JobQueue
+from log_setup import log_context
+from metrics import FAILURES
+
+class QueueWorker:
+    """Claims the bot's account's jobs from the shared JobQueue and runs them
+
+    Run as many of these as you like, in as many processes as you like; the
+    queue hands each job to one of them at a time. While a job runs its lease
+    is renewed in the background. The generated text is checkpointed before
+    posting, so when a crashed worker's job is re-leased the next worker
+    posts that same text, or just records the tweet if it already went out.
+    """
+
+    def __init__(self, bot, queue: JobQueue, lease_seconds: float = None,
+                 poll_interval: float = None, worker_id: str = None):
+        self.bot = bot
+        self.queue = queue
+        self.lease_seconds = lease_seconds or bot.config.JOB_LEASE_SECONDS
+        self.poll_interval = poll_interval or bot.config.WORKER_POLL_INTERVAL
+        self.worker_id = worker_id or JobQueue.worker_id()
+        self.account = bot.name or DEFAULT_ACCOUNT
+        self.warm_up_seconds = bot.config.WARMUP_MINUTES_BEFORE_SLOT * 60
+        self._warmed_for = None
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def run(self):
+        """Process jobs until stop() is called"""
+        self.logger.info(f"Worker {self.worker_id} polling {self.queue.path}")
+        while not self.stopped.is_set():
+            if self.run_once():
+                continue
+            next_run_at = self.queue.next_run_at(self.account)
+            if next_run_at is None:
+                self.stopped.wait(self.poll_interval)
+                continue
+            if next_run_at != self._warmed_for and next_run_at - time.time() <= self.warm_up_seconds:
+                # Open connections and refresh auth once per upcoming job
+                self._warmed_for = next_run_at
+                self.bot.warm_up()
+            self.stopped.wait(min(self.poll_interval, max(0, next_run_at - time.time())))
+
+    def stop(self):
+        """Finish the current job and stop"""
+        self.stopped.set()
+
+    def run_once(self) -> bool:
+        """Claim and run one due job, returning False if there was none"""
+        job = self.queue.claim(self.worker_id, self.lease_seconds, kinds=(POST_JOB,), account=self.account)
+        if job is None:
+            return False
+
+        heartbeat = threading.Event()
+        renewer = threading.Thread(target=self._renew_lease, args=(job, heartbeat), daemon=True)
+        renewer.start()
+        try:
+            with log_context(job_id=job.id):
+                self.logger.info(f"Claimed {job}")
+                self._run_post(job)
+        except Exception as e:
+            FAILURES.inc(stage="job", cause=type(e).__name__)
+            self.logger.exception(f"Error running {job}: {e}")
+            self.queue.fail(job.id, self.worker_id, str(e))
+        finally:
+            heartbeat.set()
+            renewer.join()
+        return True
+
+    def _renew_lease(self, job: Job, done: threading.Event):
+        """Extend the lease every third of its length until the job finishes"""
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.extend(job.id, self.worker_id, self.lease_seconds):
+                self.logger.warning(f"Lost the lease on {job}")
+                return
+
+    def _run_post(self, job: Job):
+        """Generate (unless resuming) and post one scheduled tweet"""
+        checkpoint = job.checkpoint or {}
+        context_type = (checkpoint.get("context_type") or job.payload.get("context_type")
+                        or self.bot.content_generator.get_random_context_type())
+        content = checkpoint.get("content") or job.payload.get("content")
+
+        with log_context(account=self.bot.name, context_type=context_type):
+            if checkpoint:
+                tweet_id = self.bot.twitter_client.find_posted(content)
+                if tweet_id:
+                    result = {"id": tweet_id, "url": f"https://twitter.com/user/status/{tweet_id}"}
+                    # The crashed worker may not have recorded it; history ignores a tweet id it already has
+                    self.bot._log_post(content, result, context_type)
+                    self._complete(job, result)
+                    return
+            elif not content:
+                content = self.bot.generate_content(context_type)
+                if not content:
+                    FAILURES.inc(stage="job", cause="no_content")
+                    self.queue.fail(job.id, self.worker_id, "no content generated")
+                    return
+
+            if not self.queue.save_checkpoint(job.id, self.worker_id, {"context_type": context_type, "content": content}):
+                FAILURES.inc(stage="job", cause="lease_lost")
+                self.logger.warning(f"Lost the lease on {job} before posting, leaving it to its new owner")
+                return
+
+            result = self.bot.post_content(content, context_type)
+            if result:
+                self._complete(job, result)
+            else:
+                FAILURES.inc(stage="job", cause="post_failed")
+                self.queue.fail(job.id, self.worker_id, "post failed")
+
+    def _complete(self, job: Job, result: dict):
+        completed = self.queue.complete(job.id, self.worker_id, {"id": result["id"], "url": result.get("url")})
+        if completed:
+            self.logger.info(f"Completed {job}: {result.get('url')}", extra={"tweet_id": result["id"]})
+        else:
+            self.logger.warning(f"Posted {job} after its lease expired", extra={"tweet_id": result["id"]})
+